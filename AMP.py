@@ -25,6 +25,7 @@ from __future__ import annotations
 
 import json
 import logging
+import re
 import sys
 import threading
 import time
@@ -366,6 +367,18 @@ class AMPInstance():
 
         return super().__getattribute__(__name)
 
+    @property
+    def ADS_Running(self) -> bool:
+        return self._ADS_Running
+
+    @ADS_Running.setter
+    def ADS_Running(self, value: bool):
+        # Anything showing the Server's state (eg. Banners) is told when it flips.
+        changed = '_ADS_Running' in self.__dict__ and self._ADS_Running != value
+        self._ADS_Running = value
+        if changed and self.InstanceID != 0:
+            self.AMPHandler.notify_state_change(self, 'ads')
+
     def _setDBattr(self):
         """This is used to set/update the DB attributes for the AMP server"""
         self.DB_Server = self.DB.GetServer(InstanceID=self.InstanceID)
@@ -385,6 +398,8 @@ class AMPInstance():
         self.Avatar_url = self.DB_Server.Avatar_url
         self.Hidden = self.DB_Server.Hidden
         self.background_banner_path = self.DB_Server.getBanner().background_path
+        self.AMPHandler.channel_index_update(self)
+        self.AMPHandler.notify_state_change(self, 'settings')
 
     def Login(self) -> bool:
         if self.SessionID == 0:
@@ -555,9 +570,14 @@ class AMPInstance():
                     for amp_instance in self.AMPHandler.AMP_Instances:
                         # This should be the <AMP Instance Object> comparing to the Instance Objects we got from `getInstances()`
                         if self.AMPHandler.AMP_Instances[amp_instance].InstanceID == instance['InstanceID']:
+                            server = self.AMPHandler.AMP_Instances[amp_instance]
+                            running = server.__dict__.get('Running')
                             # This gets all the dictionary values tied to AMP and makes them attributes of self.
                             for entry in instance:
-                                setattr(self.AMPHandler.AMP_Instances[amp_instance], entry, instance[entry])
+                                setattr(server, entry, instance[entry])
+
+                            if 'Running' in instance and running != instance['Running']:
+                                self.AMPHandler.notify_state_change(server, 'running')
                             break
 
         self.Last_Update_Time = time.time()
@@ -579,6 +599,10 @@ class AMPInstance():
                     if not server.Console.console_thread.is_alive():
                         server.Console.console_thread.start()
 
+            # Keeps `ADS_Running` a usable cached snapshot for anything that can't afford an API call.
+            if not server.Running:
+                server.ADS_Running = False
+
             if not server.Running or server.Running and not server.ADS_Running:
                 if server.Console.console_thread_running == True:
                     self.logger.error(f'{server.FriendlyName}: Shutting down Console Thread, Instance Online: {server.Running}, ADS Online: {server.ADS_Running}.')
@@ -599,14 +623,31 @@ class AMPInstance():
         result = self.CallAPI('Core/GetUpdates', parameters)
         return result
 
-    def ConsoleMessage_withUpdate(self, msg: str) -> dict:
-        """This will call Console Update after sending the Console Message (Use this for Commands that require feedback)"""
-        self.Login()
-        parameters = {'message': msg}
-        self.CallAPI('Core/SendConsoleMessage', parameters)
-        time.sleep(.2)
-        update = self.ConsoleUpdate()
-        return update
+    def ConsoleMessage_withUpdate(self, msg: str, pattern: str | None = None, terminator: str | None = None, timeout: float = 5) -> dict:
+        """Sends the Console Message and returns the Console Entries that followed it (Use this for Commands that require feedback)\n
+        `pattern` - Regex, only return entries whose Contents match.\n
+        `terminator` - Regex, stop waiting once an entry matches; otherwise returns after the first poll with a matching entry.\n
+        `timeout` - Max seconds to wait for a response.\n
+        Returns `{'ConsoleEntries': [...]}`"""
+        console = getattr(self, 'Console', None)
+        if console == None or not console.console_thread_running or not console.console_thread.is_alive():
+            # No Console Thread polling `Core/GetUpdates`; so it's safe to read the updates ourselves.
+            self.ConsoleMessage(msg)
+            time.sleep(.2)
+            update = self.ConsoleUpdate()
+            if pattern != None and isinstance(update, dict) and 'ConsoleEntries' in update:
+                update['ConsoleEntries'] = [entry for entry in update['ConsoleEntries'] if re.search(pattern, entry['Contents']) != None]
+            return update
+
+        waiter = console.console_waiter_register(pattern, terminator)
+        try:
+            self.ConsoleMessage(msg)
+            console.console_wakeup.set()
+            entries = waiter.wait(timeout)
+        finally:
+            console.console_waiter_remove(waiter)
+
+        return {'ConsoleEntries': entries}
 
     def ConsoleMessage(self, msg: str):
         """Basic Console Message"""
@@ -706,17 +747,17 @@ class AMPInstance():
             Users = (str(result['Metrics']['Active Users']['RawValue']), str(result['Metrics']['Active Users']['MaxValue']))
             return Users
 
-    def getUserList(self) -> list[str]:
-        """Returns a List of connected users."""
+    def getUsers(self) -> dict[str, str]:
+        """Returns the connected users as `{user id: name}`; for Minecraft the ID is the player's UUID."""
         self.Login()
         parameters = {}
         result = self.CallAPI('Core/GetUserList', parameters)
-        user_list = []
-        for user in result:
-            # for user in result['result']:
-            # user_list.append(result['result'][user])
-            user_list.append(result[user])
-        return user_list
+        # return result['result']
+        return dict(result) if isinstance(result, dict) else {}
+
+    def getUserList(self) -> list[str]:
+        """Returns a List of connected users."""
+        return list(self.getUsers().values())
 
     def getSchedule(self) -> dict:
         self.Login()
@@ -1012,6 +1053,12 @@ class AMPInstance():
         """Base Function for Discord Chat Messages to AMP ADS"""
         return
 
+    def Chat_Messages(self, messages: list[dict[str, str | None]]):
+        """Sends a batch of Discord Chat Messages, each entry is the keyword arguments for `Chat_Message()`.\n
+        Modules that can fit several messages into one console command should override this."""
+        for message in messages:
+            self.Chat_Message(**message)
+
     def Chat_Message_Formatter(self, message: str):
         """Base Function for Server Chat Message Formatter"""
         return message
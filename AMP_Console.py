@@ -23,6 +23,8 @@ from typing import TYPE_CHECKING
 import threading
 import logging
 import time
+import sys
+from collections import deque
 from datetime import datetime, timezone
 import re
 import traceback
@@ -33,6 +35,41 @@ if TYPE_CHECKING:
     from AMP import AMPInstance
 
 
+class ConsoleWaiter:
+    """Collects Console Entries for a caller waiting on a Console Command response.
+
+    `pattern` - Only entries whose Contents match are collected, `None` collects everything.
+
+    `terminator` - Finishes the wait once an entry matches, otherwise finishes after the first poll that collected an entry."""
+
+    def __init__(self, pattern: str | None = None, terminator: str | None = None):
+        self.pattern = re.compile(pattern) if pattern != None else None
+        self.terminator = re.compile(terminator) if terminator != None else None
+        self.entries = []
+        self.done = threading.Event()
+
+    def feed(self, entry: dict):
+        """Called by the Console Thread for every new Console Entry."""
+        if self.done.is_set():
+            return
+
+        if self.pattern == None or self.pattern.search(entry['Contents']) != None:
+            self.entries.append(entry)
+
+        if self.terminator != None and self.terminator.search(entry['Contents']) != None:
+            self.done.set()
+
+    def poll_finished(self):
+        """Called by the Console Thread after each `Core/GetUpdates` poll."""
+        if self.terminator == None and len(self.entries):
+            self.done.set()
+
+    def wait(self, timeout: float) -> list[dict]:
+        """Blocks until the waiter is finished or `timeout` seconds pass; returns the collected entries."""
+        self.done.wait(timeout)
+        return self.entries
+
+
 class AMPConsole:
     FILTER_TYPE_CONSOLE = 0
     FILTER_TYPE_EVENT = 1
@@ -64,6 +101,18 @@ class AMPConsole:
         self.console_event_messages = []
         self.console_event_message_lock = threading.Lock()
 
+        # Fixed size history of recent Console Entries; used for `/server console tail`
+        self.console_history = deque(maxlen=self.console_history_size())
+        self.console_history_lock = threading.Lock()
+
+        # Callers waiting on Console Command responses; fed by the Console Thread so nobody else calls `Core/GetUpdates`.
+        self.console_waiters = []
+        self.console_waiter_lock = threading.Lock()
+        self.console_wakeup = threading.Event()
+
+        # (State, Active Users) from the last `Core/GetUpdates`; tells the AMPHandler State Listeners when it changes.
+        self.console_status = None
+
         self.logger.dev(f'**SUCCESS** Setting up {self.AMPInstance.FriendlyName} Console')
         self.console_init()
 
@@ -99,7 +148,9 @@ class AMPConsole:
         time.sleep(5)
         last_entry_time = 0
         while (1):
-            time.sleep(1)
+            # Poll faster while someone is waiting on a Console Command response.
+            self.console_wakeup.wait(0.25 if len(self.console_waiters) else 1)
+            self.console_wakeup.clear()
 
             if not self.console_thread_running:
                 time.sleep(10)
@@ -120,6 +171,8 @@ class AMPConsole:
                 self.AMPInstance._ADScheck()
                 continue
 
+            self.console_status_update(console.get('Status'))
+
             for entry in console['ConsoleEntries']:
                 # This prevents old messages from getting handled again and spamming on restart.
                 entry_time = datetime.fromtimestamp(float(entry['Timestamp'][6:-2]) / 1000, tz=timezone.utc)
@@ -131,6 +184,9 @@ class AMPConsole:
                     last_entry_time = entry_time
                     continue
 
+                self.console_history_add(entry_time, entry)
+                self.console_waiters_feed(entry)
+
                 self.logger.dev(f'Name: {self.AMPInstance.FriendlyName} | DisplayImageSource: {self.AMPInstance.DisplayImageSource} | Console Channel: {self.AMPInstance.Discord_Console_Channel}\n Console Entry: {entry}')
                 # This will add the Servers Discord_Chat_Prefix to the beginning of any of the messages.
                 # Its done down here to prevent breaking of any exisiting filtering.
@@ -190,9 +246,98 @@ class AMPConsole:
                     self.logger.debug(self.AMPInstance.FriendlyName + bulkentry[:-1])
 
             self.console_message_list = []
+            self.console_waiters_poll_finished()
 
         self.logger.warning(f'{self.AMPInstance.FriendlyName} Thread Loop is Ending')
 
+    def console_history_size(self) -> int:
+        """Returns the `Console_History_Size` setting, the max number of Console Entries kept per Instance."""
+        size = self.DBConfig.GetSetting('Console_History_Size')
+        if not isinstance(size, int) or size < 0:
+            size = 250
+        return size
+
+    def console_history_add(self, entry_time: datetime, entry: dict):
+        """Adds a Console Entry to the History Buffer as `(datetime, Source, Contents)`"""
+        self.console_history_lock.acquire()
+        self.console_history.append((entry_time, entry['Source'], entry['Contents']))
+        self.console_history_lock.release()
+
+    def console_history_resize(self, size: int):
+        """Resizes the History Buffer, keeping the most recent entries."""
+        self.console_history_lock.acquire()
+        self.console_history = deque(self.console_history, maxlen=size)
+        self.console_history_lock.release()
+
+    def console_tail(self, lines: int = 50) -> list[str]:
+        """Returns the last `lines` Console Entries from the History Buffer formatted as `[HH:MM:SS] Source: Contents`"""
+        self.console_history_lock.acquire()
+        history = list(self.console_history)
+        self.console_history_lock.release()
+
+        if lines <= 0:
+            return []
+        return [f'[{entry_time.strftime("%H:%M:%S")}] {source}: {contents}' for entry_time, source, contents in history[-lines:]]
+
+    def console_history_memory(self) -> int:
+        """Returns an estimate in bytes of the memory used by the History Buffer."""
+        self.console_history_lock.acquire()
+        size = sys.getsizeof(self.console_history)
+        for entry in self.console_history:
+            size += sys.getsizeof(entry) + sum(sys.getsizeof(value) for value in entry)
+        self.console_history_lock.release()
+        return size
+
+    def console_status_update(self, status: dict | None):
+        """Compares the Status sent along with the Console Entries to the last one; a change in State or players notifies the AMPHandler."""
+        if not isinstance(status, dict):
+            return
+
+        try:
+            current = (status.get('State'), status['Metrics']['Active Users']['RawValue'])
+        except (KeyError, TypeError):
+            current = (status.get('State'), None)
+
+        previous = self.console_status
+        self.console_status = current
+        if previous == None or previous == current:
+            return
+
+        self.AMPHandler.notify_state_change(self.AMPInstance, 'status' if previous[0] != current[0] else 'players')
+
+    def console_waiter_register(self, pattern: str | None = None, terminator: str | None = None) -> ConsoleWaiter:
+        """Registers a `ConsoleWaiter`, register it before sending the Console Command so no response lines are missed."""
+        waiter = ConsoleWaiter(pattern, terminator)
+        self.console_waiter_lock.acquire()
+        self.console_waiters.append(waiter)
+        self.console_waiter_lock.release()
+        return waiter
+
+    def console_waiter_remove(self, waiter: ConsoleWaiter):
+        self.console_waiter_lock.acquire()
+        if waiter in self.console_waiters:
+            self.console_waiters.remove(waiter)
+        self.console_waiter_lock.release()
+
+    def console_waiters_feed(self, entry: dict):
+        """Passes a copy of the Console Entry to every registered waiter."""
+        if not len(self.console_waiters):
+            return
+
+        self.console_waiter_lock.acquire()
+        for waiter in self.console_waiters:
+            waiter.feed(dict(entry))
+        self.console_waiter_lock.release()
+
+    def console_waiters_poll_finished(self):
+        if not len(self.console_waiters):
+            return
+
+        self.console_waiter_lock.acquire()
+        for waiter in self.console_waiters:
+            waiter.poll_finished()
+        self.console_waiter_lock.release()
+
     def console_filter(self, message):
         """Controls what will be sent to the Discord Console Channel via AMP Console. \n
         Return `True` to Continue, `False` to Return Message"""
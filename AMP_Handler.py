@@ -26,9 +26,11 @@ import os
 import pathlib
 import re
 import sys
+import threading
 import time
 import traceback
 from argparse import Namespace
+from typing import Callable
 
 import AMP
 import DB
@@ -76,6 +78,15 @@ class AMPHandler():
         self.AMP_Console_Modules = {}
         self.AMP_Console_Threads = {}
 
+        # Discord Channel ID -> [(AMPInstance, 'console' | 'chat')]; kept up to date by `AMPInstance._setDBattr()`
+        self.Channel_Index: dict[int, list[tuple[AMP.AMPInstance, str]]] = {}
+        self.Channel_Index_Lock = threading.Lock()
+        # Increments whenever the Channel Index changes; lets anything built from it know when to rebuild.
+        self.Channel_Index_Version = 0
+
+        # Called as `listener(AMPInstance, reason)` whenever an Instance's displayed state changes; see `notify_state_change()`.
+        self.State_Listeners: list[Callable[[AMP.AMPInstance, str], None]] = []
+
         self.SuccessfulConnection = False
         # self.InstancesFound = False
 
@@ -122,6 +133,62 @@ class AMPHandler():
 
         return AMP_Instances_Names
 
+    def channel_index_update(self, amp_server: AMP.AMPInstance):
+        """Updates the Discord Channel Index entries for the AMP Instance from its current Console/Chat Channels."""
+        routes = [(int(channel_id), role) for channel_id, role in [(amp_server.Discord_Console_Channel, 'console'), (amp_server.Discord_Chat_Channel, 'chat')] if channel_id not in [None, 'None']]
+
+        self.Channel_Index_Lock.acquire()
+        if sorted(routes, key=lambda route: route[1]) != self._channel_index_routes(amp_server):
+            self._channel_index_remove(amp_server)
+            for channel_id, role in routes:
+                self.Channel_Index.setdefault(channel_id, []).append((amp_server, role))
+            self.Channel_Index_Version += 1
+        self.Channel_Index_Lock.release()
+
+    def channel_index_remove(self, amp_server: AMP.AMPInstance):
+        """Removes every Discord Channel Index entry for the AMP Instance."""
+        self.Channel_Index_Lock.acquire()
+        self._channel_index_remove(amp_server)
+        self.Channel_Index_Lock.release()
+
+    def _channel_index_routes(self, amp_server: AMP.AMPInstance) -> list[tuple[int, str]]:
+        routes = [(channel_id, route[1]) for channel_id in self.Channel_Index for route in self.Channel_Index[channel_id] if route[0].InstanceID == amp_server.InstanceID]
+        return sorted(routes, key=lambda route: route[1])
+
+    def _channel_index_remove(self, amp_server: AMP.AMPInstance):
+        if len(self._channel_index_routes(amp_server)):
+            self.Channel_Index_Version += 1
+
+        for channel_id in list(self.Channel_Index):
+            routes = [route for route in self.Channel_Index[channel_id] if route[0].InstanceID != amp_server.InstanceID]
+            if len(routes):
+                self.Channel_Index[channel_id] = routes
+            else:
+                self.Channel_Index.pop(channel_id)
+
+    def get_channel_routes(self, channel_id: int) -> list[tuple[AMP.AMPInstance, str]]:
+        """Returns the `(AMPInstance, 'console' | 'chat')` entries using the Discord Channel, an empty list if none."""
+        return self.Channel_Index.get(channel_id, [])
+
+    def add_state_listener(self, listener: Callable[[AMP.AMPInstance, str], None]):
+        """Registers `listener(AMPInstance, reason)` for Instance state changes.\n
+        **Note** Listeners are called from the Console and Instance threads; they must be quick and thread safe."""
+        if listener not in self.State_Listeners:
+            self.State_Listeners.append(listener)
+
+    def remove_state_listener(self, listener: Callable[[AMP.AMPInstance, str], None]):
+        if listener in self.State_Listeners:
+            self.State_Listeners.remove(listener)
+
+    def notify_state_change(self, amp_server: AMP.AMPInstance, reason: str):
+        """Tells every State Listener that `amp_server` changed.\n
+        `reason` - `running`, `ads`, `status`, `players`, `settings` or `banner`."""
+        for listener in list(self.State_Listeners):
+            try:
+                listener(amp_server, reason)
+            except Exception as e:
+                self.logger.error(f'State Listener {listener} failed for {amp_server.FriendlyName}: {e}')
+
     # Checks for Errors in Config
     def val_settings(self):
         """Validates the tokens.py settings and 2FA."""
@@ -247,6 +314,7 @@ class AMPHandler():
                 self.logger.warning(f'Found the AMP Instance {amp_server.InstanceName} that no longer exists.')
                 self.logger.warning(f'Removing {amp_server.InstanceName} from `Gatekeepers` available Instance list.')
                 self.AMP_Instances.pop(instanceID)
+                self.channel_index_remove(amp_server)
 
 
 def getAMPHandler(args: Namespace = False) -> AMPHandler:
@@ -43,7 +43,7 @@ def dump_to_json(data):
 
 Handler = None
 #!DB Version
-DB_Version = 3.0
+DB_Version = 3.7
 
 
 class DBHandler():
@@ -249,6 +249,22 @@ class Database:
         self._AddConfig("Donator_role_id", None)
         # Prevent Server being removed from Banner Group
         self._AddConfig("Auto_BG_Remove", False)
+        # Number of Console Entries kept in memory per Instance
+        self._AddConfig('Console_History_Size', 250)
+        # Durable outbound message spool; see `utils_spool.py`
+        self._AddConfig('Message_Spool', False)
+        self._AddConfig('Message_Spool_Limit', 10000)
+        # JSON progress of a running `/server rolling` operation; lets it resume after a restart
+        self._AddConfig('Orchestrator_State', None)
+        # Worker processes used to render Banners; 0 renders them on threads instead
+        self._AddConfig('Banner_Render_Workers', 2)
+        # How Banner Images are encoded for upload; see `BANNER_ENCODINGS` in `modules/banner_creator.py`
+        self._AddConfig('Banner_Encoding', 'png')
+        # Banners stacked into each Banner Group image; 1 sends one image per Server
+        self._AddConfig('Banner_Atlas_Size', 1)
+        # Player Head images for Banners and Chat avatars; see `utils_heads.py`
+        self._AddConfig('Player_Head_URL', 'https://mc-heads.net/avatar/{uuid}/{size}')
+        self._AddConfig('Player_Head_Cache_Size', 8)
 
     def _execute(self, SQL, params):
         Retry = 0
@@ -140,6 +140,50 @@ class DB_Update:
             self.add_bannergroupmessages_table()
             self.DBConfig.SetSetting('DB_Version', '3.0')
 
+        if 3.1 > Version:
+            """Adds the Console History Buffer size setting."""
+            self.logger.info('**ATTENTION** Updating DB to Version 3.1')
+            self.DBConfig.AddSetting('Console_History_Size', 250)
+            self.DBConfig.SetSetting('DB_Version', '3.1')
+
+        if 3.2 > Version:
+            """Adds the Message Spool settings."""
+            self.logger.info('**ATTENTION** Updating DB to Version 3.2')
+            self.DBConfig.AddSetting('Message_Spool', False)
+            self.DBConfig.AddSetting('Message_Spool_Limit', 10000)
+            self.DBConfig.SetSetting('DB_Version', '3.2')
+
+        if 3.3 > Version:
+            """Adds the Orchestrator State setting."""
+            self.logger.info('**ATTENTION** Updating DB to Version 3.3')
+            self.DBConfig.AddSetting('Orchestrator_State', None)
+            self.DBConfig.SetSetting('DB_Version', '3.3')
+
+        if 3.4 > Version:
+            """Adds the Banner Render Workers setting."""
+            self.logger.info('**ATTENTION** Updating DB to Version 3.4')
+            self.DBConfig.AddSetting('Banner_Render_Workers', 2)
+            self.DBConfig.SetSetting('DB_Version', '3.4')
+
+        if 3.5 > Version:
+            """Adds the Banner Encoding setting."""
+            self.logger.info('**ATTENTION** Updating DB to Version 3.5')
+            self.DBConfig.AddSetting('Banner_Encoding', 'png')
+            self.DBConfig.SetSetting('DB_Version', '3.5')
+
+        if 3.6 > Version:
+            """Adds the Banner Atlas Size setting."""
+            self.logger.info('**ATTENTION** Updating DB to Version 3.6')
+            self.DBConfig.AddSetting('Banner_Atlas_Size', 1)
+            self.DBConfig.SetSetting('DB_Version', '3.6')
+
+        if 3.7 > Version:
+            """Adds the Player Head Cache settings."""
+            self.logger.info('**ATTENTION** Updating DB to Version 3.7')
+            self.DBConfig.AddSetting('Player_Head_URL', 'https://mc-heads.net/avatar/{uuid}/{size}')
+            self.DBConfig.AddSetting('Player_Head_Cache_Size', 8)
+            self.DBConfig.SetSetting('DB_Version', '3.7')
+
 
     def user_roles(self):
         try:
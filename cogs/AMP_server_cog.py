@@ -36,6 +36,7 @@ import DB
 import utils
 import utils_ui
 import utils_embeds
+import utils_executor
 import modules.banner_creator as BC
 
 # This is used to force cog order to prevent missing methods.
@@ -60,6 +61,7 @@ class AMP_Server(commands.Cog):
         self.dBot = utils.discordBot(client)
         self.uiBot = utils_ui
         self.eBot = utils_embeds.botEmbeds(client)
+        self.executor = utils_executor.getCommandExecutor()
         self.BC = BC
 
         self.logger.info(f'**SUCCESS** Initializing {self.name.title().replace("Amp", "AMP")}')
@@ -112,14 +114,25 @@ class AMP_Server(commands.Cog):
     async def amp_server_broadcast(self, context: commands.Context, prefix: Choice[str], message: str):
         """This sends a message to every online AMP Server"""
         self.logger.command(f'{context.author.name} used AMP Server Broadcast')
-        discord_message = await context.send('Sending Broadcast...', ephemeral=True)
-        for amp_server in self.AMPInstances:
-            if self.AMPInstances[amp_server].Running:
-                if self.AMPInstances[amp_server]._ADScheck():
-                    self.AMPInstances[amp_server].Broadcast_Message(message, prefix=prefix.value)
+        await self.executor.defer(context)
 
-        await discord_message.edit(content=f'{prefix.value} Sent!')
-        await discord_message.delete(delay=self._client.Message_Timeout)
+        def broadcast(amp_server: AMP_Handler.AMP.AMPInstance) -> bool:
+            """Returns `False` if the Instance's ADS is offline."""
+            if not amp_server._ADScheck():
+                return False
+            amp_server.Broadcast_Message(message, prefix=prefix.value)
+            return True
+
+        result = await self.executor.fan_out([amp_server for amp_server in self.AMPInstances.values() if amp_server.Running], broadcast, name='Server Broadcast', timeout=15)
+
+        sent = [amp_server.FriendlyName if amp_server.FriendlyName != None else amp_server.InstanceName for amp_server, online in result.succeeded if online]
+        offline = [amp_server.FriendlyName if amp_server.FriendlyName != None else amp_server.InstanceName for amp_server, online in result.succeeded if not online]
+        content = f'{prefix.value} Sent to **{len(sent)}** Servers: {", ".join(sent) if len(sent) else "None"}'
+        if len(offline):
+            content += f'\n**Offline**: {", ".join(offline)}'
+        if len(result.failed) or len(result.timed_out):
+            content += f'\n**Failed**: {", ".join(result.names("failed") + result.names("timed_out"))}'
+        await context.send(content[:2000], ephemeral=True, delete_after=self._client.Message_Timeout)
 
 
 # This section is AMP Server Commands ----------------------------------------------------------------------------------------------------------------------------------------------------------------
@@ -131,15 +144,25 @@ class AMP_Server(commands.Cog):
     async def amp_server_start(self, context: commands.Context, server):
         """Starts the AMP Instance"""
         self.logger.command(f'{context.author.name} used AMP Server Started...')
-        await context.defer(ephemeral=True)
+        await self.executor.defer(context)
 
         amp_server = self.uBot.serverparse(server, context, context.guild.id)
 
-        if not amp_server._ADScheck():
+        def start():
+            """Returns `True` if the Instance was started, `None` if it was already running."""
+            if amp_server._ADScheck():
+                return None
             amp_server.StartInstance()
             amp_server.ADS_Running = True
+            return True
+
+        started = await self.executor.execute(context, start, name='Server Start')
+        if started is utils_executor.FAILED:
+            return
+
+        if started:
             await context.send(f'Starting the AMP Dedicated Server **{amp_server.InstanceName}**', ephemeral=True, delete_after=self._client.Message_Timeout)
-        else:
+        elif started == None:
             return await context.send(f'Hmm it appears the server is already `Running..`', ephemeral=True, delete_after=self._client.Message_Timeout)
 
     @server.command(name='stop')
@@ -148,11 +171,10 @@ class AMP_Server(commands.Cog):
     async def amp_server_stop(self, context: commands.Context, server):
         """Stops the AMP Instance"""
         self.logger.command(f'{context.author.name} used AMP Server Stopped...')
-        await context.defer(ephemeral=True)
+        await self.executor.defer(context)
 
         amp_server = await self.uBot._serverCheck(context, server)
-        if amp_server:
-            amp_server.StopInstance()
+        if amp_server and await self.executor.execute(context, amp_server.StopInstance, name='Server Stop') is not utils_executor.FAILED:
             amp_server.ADS_Running = False
             await context.send(f'Stopping the AMP Dedicated Server **{amp_server.InstanceName}**', ephemeral=True, delete_after=self._client.Message_Timeout)
 
@@ -162,11 +184,10 @@ class AMP_Server(commands.Cog):
     async def amp_server_restart(self, context: commands.Context, server):
         """Restarts the AMP Instance"""
         self.logger.command(f'{context.author.name} used AMP Server Restart...')
-        await context.defer(ephemeral=True)
+        await self.executor.defer(context)
 
         amp_server = await self.uBot._serverCheck(context, server)
-        if amp_server:
-            amp_server.RestartInstance()
+        if amp_server and await self.executor.execute(context, amp_server.RestartInstance, name='Server Restart') is not utils_executor.FAILED:
             amp_server.ADS_Running = True
             await context.send(f'Restarting the AMP Dedicated Server **{amp_server.InstanceName}**', ephemeral=True, delete_after=self._client.Message_Timeout)
 
@@ -176,11 +197,10 @@ class AMP_Server(commands.Cog):
     async def amp_server_kill(self, context: commands.Context, server):
         """Kills the AMP Instance"""
         self.logger.command(f'{context.author.name} used AMP Server Kill...')
-        await context.defer(ephemeral=True)
+        await self.executor.defer(context)
 
         amp_server = await self.uBot._serverCheck(context, server)
-        if amp_server:
-            amp_server.KillInstance()
+        if amp_server and await self.executor.execute(context, amp_server.KillInstance, name='Server Kill') is not utils_executor.FAILED:
             amp_server.ADS_Running = False
             await context.send(f'Killing the AMP Dedicated Server **{amp_server.InstanceName}**', ephemeral=True, delete_after=self._client.Message_Timeout)
 
@@ -190,11 +210,11 @@ class AMP_Server(commands.Cog):
     async def amp_server_message(self, context: commands.Context, server, message: str):
         """Sends a message to the Console, can be anything the Server Console supports.(Commands/Messages)"""
         self.logger.command(f'{context.author.name} used AMP Server Message...')
+        await self.executor.defer(context)
 
         amp_server = await self.uBot._serverCheck(context, server)
-        if amp_server:
-            amp_server.ConsoleMessage(message)
-        await context.send(f'Sent {message} to {amp_server.InstanceName}', ephemeral=True, delete_after=self._client.Message_Timeout)
+        if amp_server and await self.executor.execute(context, amp_server.ConsoleMessage, message, name='Server Message') is not utils_executor.FAILED:
+            await context.send(f'Sent {message} to {amp_server.InstanceName}', ephemeral=True, delete_after=self._client.Message_Timeout)
 
     @server.command(name='backup')
     @utils.role_check()
@@ -202,6 +222,7 @@ class AMP_Server(commands.Cog):
     async def amp_server_backup(self, context: commands.Context, server):
         """Creates a Backup of the Server in its current state, setting the title to the Users display name."""
         self.logger.command(f'{context.author.name} used AMP Server Backup...')
+        await self.executor.defer(context)
 
         amp_server = await self.uBot._serverCheck(context, server)
         if amp_server:
@@ -209,8 +230,8 @@ class AMP_Server(commands.Cog):
             time = str(datetime.now(tz=timezone.utc))
             description = f"Created at {time} by {context.author.display_name}"
             display_description = f'Created at **{str(datetime.now(tz=timezone.utc).strftime("%Y-%m-%d %H:%M"))}**(utc) by **{context.author.display_name}**'
-            await context.send(f'Creating a backup of **{server.InstanceName}**  // **Description**: {display_description}', ephemeral=True, delete_after=self._client.Message_Timeout)
-            amp_server.takeBackup(title, description)
+            if await self.executor.execute(context, amp_server.takeBackup, title, description, name='Server Backup', timeout=60) is not utils_executor.FAILED:
+                await context.send(f'Creating a backup of **{amp_server.InstanceName}**  // **Description**: {display_description}', ephemeral=True, delete_after=self._client.Message_Timeout)
 
     @server.command(name='status')
     @utils.role_check()
@@ -218,18 +239,28 @@ class AMP_Server(commands.Cog):
     async def amp_server_status(self, context: commands.Context, server):
         """AMP Instance Status(TPS, Player Count, CPU Usage, Memory Usage and Online Players)"""
         self.logger.command(f'{context.author.name} used AMP Server Status...')
-        await context.defer(ephemeral=True)
+        await self.executor.defer(context)
 
         amp_server = self.uBot.serverparse(server, context, context.guild.id)
         if amp_server == None:
-            return await context.send(f"Hey, we uhh can't find the server **{amp_server.InstanceName}**. Please try your command again <3.", ephemeral=True, delete_after=self._client.Message_Timeout)
+            return await context.send(f"Hey, we uhh can't find the server **{server}**. Please try your command again <3.", ephemeral=True, delete_after=self._client.Message_Timeout)
 
         if amp_server.Running == False:
             await context.send(f'Well this is awkward, it appears the **{amp_server.InstanceName}** is `Offline`.', ephemeral=True, delete_after=self._client.Message_Timeout)
 
-        if amp_server._ADScheck():
-            tps, Users, cpu, Memory, Uptime = amp_server.getMetrics()
-            Users_online = ', '.join(amp_server.getUserList())
+        def status():
+            """Returns the Instance Metrics and User List, or `None` if its ADS is offline."""
+            if not amp_server._ADScheck():
+                return None
+            return amp_server.getMetrics(), amp_server.getUserList()
+
+        status = await self.executor.execute(context, status, name='Server Status')
+        if status is utils_executor.FAILED:
+            return
+
+        if status != None:
+            (tps, Users, cpu, Memory, Uptime), users = status
+            Users_online = ', '.join(users)
             if len(Users_online) == 0:
                 Users_online = 'None'
             server_embed = await self.eBot.server_status_embed(context, amp_server, tps, Users, cpu, Memory, Uptime, Users_online)
@@ -255,10 +286,15 @@ class AMP_Server(commands.Cog):
     async def amp_server_users_list(self, context: commands.Context, server):
         """Shows a list of the currently connected Users to the Server."""
         self.logger.command(f'{context.author.name} used AMP Server Connected Users...')
+        await self.executor.defer(context)
 
         amp_server = await self.uBot._serverCheck(context, server)
         if amp_server:
-            cur_users = (', ').join(amp_server.getUserList())
+            cur_users = await self.executor.execute(context, amp_server.getUserList, name='Server Users')
+            if cur_users is utils_executor.FAILED:
+                return
+
+            cur_users = (', ').join(cur_users)
             if len(cur_users) != 0:
                 await context.send("**Server Users**" + '\n' + cur_users, ephemeral=True, delete_after=self._client.Message_Timeout)
             else:
@@ -434,6 +470,49 @@ class AMP_Server(commands.Cog):
             amp_server._setDBattr()  # This will update the AMPConsole Attributes
             return await context.send(f'Set **{amp_server.InstanceName}** Console Filtering to `{flag.name}` using `{filter_type.name}` filtering.', ephemeral=True, delete_after=self._client.Message_Timeout)
 
+    @amp_server_console_settings.command(name='tail')
+    @utils.role_check()
+    @app_commands.autocomplete(server=utils.autocomplete_servers)
+    @app_commands.describe(lines='Default is 50 lines')
+    async def amp_server_console_tail(self, context: commands.Context, server, lines: app_commands.Range[int, 1, 500] = 50):
+        """Displays the most recent Console lines for the provided Server"""
+        self.logger.command(f'{context.author.name} used AMP Server Console Tail...')
+
+        amp_server = await self.uBot._serverCheck(context, server, False)
+        if amp_server:
+            console_lines = amp_server.Console.console_tail(lines)
+            if len(console_lines) == 0:
+                return await context.send(f'There are no Console lines stored for **{amp_server.InstanceName}** yet.', ephemeral=True, delete_after=self._client.Message_Timeout)
+
+            # Discord messages are limited to 2000 characters; so split the lines across multiple code blocks.
+            content = ''
+            for line in console_lines:
+                line = line.replace('```', '`\u200b``')[:1900]
+                if len(content) + len(line) > 1900:
+                    await context.send(f'```\n{content}```', ephemeral=True, delete_after=self._client.Message_Timeout)
+                    content = ''
+                content += line + '\n'
+
+            await context.send(f'```\n{content}```', ephemeral=True, delete_after=self._client.Message_Timeout)
+
+    @amp_server_console_settings.command(name='buffer')
+    @utils.role_check()
+    @app_commands.describe(size='Number of Console lines kept in memory per Server, Default is 250')
+    async def amp_server_console_buffer(self, context: commands.Context, size: app_commands.Range[int, 0, 5000] | None = None):
+        """Sets the Console History size for every Server and displays its current memory usage"""
+        self.logger.command(f'{context.author.name} used AMP Server Console Buffer...')
+
+        if size != None:
+            self.DBConfig.SetSetting('Console_History_Size', size)
+
+        memory = 0
+        for instance in self.AMPInstances.values():
+            if size != None:
+                instance.Console.console_history_resize(size)
+            memory += instance.Console.console_history_memory()
+
+        await context.send(f'Console History size is **{self.DBConfig.GetSetting("Console_History_Size")}** lines per Server, currently using **{memory / 1024:.1f} KB** across **{len(self.AMPInstances)}** Servers.', ephemeral=True, delete_after=self._client.Message_Timeout)
+
 # This section is AMP Server Chat Specific Settings -------------------------------------------------------------------------------------------------------------------------------------------------
     @server.group(name='chat')
     @utils.role_check()
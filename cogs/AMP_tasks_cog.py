@@ -30,6 +30,8 @@ from discord.ext import commands, tasks
 import AMP_Handler
 import DB
 import utils
+import utils_chat
+import utils_webhooks
 from AMP import AMPInstance
 
 if TYPE_CHECKING:
@@ -54,6 +56,10 @@ class AMP_Tasks(commands.Cog):
         self.DBConfig = self.DBHandler.DBConfig
 
         self.bPerms = utils.get_botPerms()
+        self.delivery = utils_webhooks.getWebhookDelivery(client)
+        self.chat = utils_chat.getChatDispatcher()
+        self.authors = utils_chat.getAuthorResolver(client)
+        self.relay = utils_chat.getRelayGraph()
 
         self.uBot = utils.botUtils(client)
         self.logger.info(f'**SUCCESS** Initializing {self.name.title().replace("Amp", "AMP")}')
@@ -72,234 +78,151 @@ class AMP_Tasks(commands.Cog):
 
     @commands.Cog.listener('on_message')
     async def on_message(self, message: discord.Message):
-        context = await self._client.get_context(message)
         # Force the Tasks to ignore any "prefix" commands.
         if message.author == self._client.user:
             return
 
-        for amp_server in self.AMPInstances:
-            self.AMPServer = self.AMPInstances[amp_server]
-            if not self.AMPServer.Running:
-                continue
-            self.AMPServer._ADScheck()
+        # Makes sure we are not responding to a webhook message (ourselves/bots/etc)
+        if message.webhook_id != None:
+            return
 
-            # Check and see if our Discord Console Channel matches the current message.id
-            if self.AMPServer.Discord_Console_Channel == message.channel.id:
+        # Most messages are not in a Console or Chat channel; this lets us ignore them without touching AMP.
+        routes = self.AMPHandler.get_channel_routes(message.channel.id)
+        if not len(routes):
+            return
 
-                # Makes sure we are not responding to a webhook message (ourselves/bots/etc)
-                if message.webhook_id == None:
-                    # This checks user permissions. Just in case.
-                    if await utils.async_rolecheck(context=context, perm_node='server.console.interact'):
-                        # Since Integrations hijacks any commands with a `/` in front of it. We are now going to be using a `.` in front of any command to bypass.
-                        if message.content.startswith('.'):
-                            # Remove the prefix char.
-                            message.content = message.content[1:]
+        context = await self._client.get_context(message)
+        for AMPServer, role in routes:
+            # `ADS_Running` is kept current by the Instance Thread Manager and Console Thread; no need for an API call here.
+            if not AMPServer.ADS_Running:
+                continue
 
-                        self.AMPServer.ConsoleMessage(message.content)
-                        return
+            # Check and see if our Discord Console Channel matches the current message.id
+            if role == 'console':
+                # This checks user permissions. Just in case.
+                if await utils.async_rolecheck(context=context, perm_node='server.console.interact'):
+                    # Since Integrations hijacks any commands with a `/` in front of it. We are now going to be using a `.` in front of any command to bypass.
+                    if message.content.startswith('.'):
+                        # Remove the prefix char.
+                        message.content = message.content[1:]
+
+                    AMPServer.ConsoleMessage(message.content)
+                    return
 
             # Check and see if our Discord Chat channel matches the message.id
-            if self.AMPServer.Discord_Chat_Channel == message.channel.id:
-                if message.author == self._client.user:
-                    self.logger.dev('AMP_Tasks_Cog Found my own Message, oops')
-                    return
-                # If its NOT a webhook (eg a bot/outside source uses webhooks) send the message as normal. This is usually a USER sending a message..
-                if message.webhook_id == None:
-                    # This fetch's a users prefix from the bot_perms.json file.
-                    author_prefix = await self.bPerms.get_role_prefix(str(message.author.id))
+            if role == 'chat':
+                if self.relay.seen(f'{AMPServer.InstanceID}:{message.id}'):
+                    continue
 
-                    # This calls the generic AMP Function; each server will handle this differently
-                    self.AMPServer.Chat_Message(message.content, author=message.author.name, author_prefix=author_prefix)
+                # This fetch's a users prefix from the bot_perms.json file.
+                author_prefix = await self.bPerms.get_role_prefix(str(message.author.id))
+
+                # This queues the generic AMP Function; each server will handle this differently
+                self.relay.send(AMPServer, message.content, author=message.author.name, author_prefix=author_prefix, user_id=message.author.id)
 
         return message
 
     @tasks.loop(seconds=1)
     async def amp_server_console_messages_send(self):
-        """This handles AMP Console messages and sends them to discord."""
+        """This handles AMP Console messages and queues them for delivery to discord."""
         if self._client.is_ready():
-            Sent_Data = True
-            while (Sent_Data):
-                Sent_Data = False
-                for amp_server in self.AMPInstances:
-                    AMPServer = self.AMPInstances[amp_server]
-                    AMP_Server_Console = AMPServer.Console
-
-                    if AMPServer.Discord_Console_Channel == None:
-                        continue
+            for amp_server in self.AMPInstances:
+                AMPServer = self.AMPInstances[amp_server]
+                AMP_Server_Console = AMPServer.Console
 
-                    channel = self._client.get_channel(AMPServer.Discord_Console_Channel)
-                    if channel == None:
-                        continue
+                if AMPServer.Discord_Console_Channel == None:
+                    continue
 
-                    if not len(AMP_Server_Console.console_messages):
-                        continue
+                channel = self._client.get_channel(AMPServer.Discord_Console_Channel)
+                if channel == None:
+                    continue
+
+                if not len(AMP_Server_Console.console_messages):
+                    continue
+
+                AMP_Server_Console.console_message_lock.acquire()
+                messages = AMP_Server_Console.console_messages
+                AMP_Server_Console.console_messages = []
+                AMP_Server_Console.console_message_lock.release()
 
-                    Sent_Data = True
-                    AMP_Server_Console.console_message_lock.acquire()
-                    message = AMP_Server_Console.console_messages.pop(0)
-                    AMP_Server_Console.console_message_lock.release()
-
-                    # This setup is for getting/used old webhooks and allowing custom avatar names per message.
-                    webhook_list = await channel.webhooks()
-                    self.logger.debug(f'*AMP Console Message* webhooks {webhook_list}')
-                    console_webhook = None
-                    for webhook in webhook_list:
-                        if webhook.name == f"{AMPServer.FriendlyName} Console":
-                            self.logger.debug(f'*AMP Console Message* found an old webhook, validating {AMPServer.FriendlyName} webhook')
-                            if webhook.channel_id == AMPServer.Discord_Console_Channel:
-                                console_webhook = webhook
-                            else:
-                                await webhook.edit(channel=channel)
-                                self.logger.dev(f'**Editing Console Webhook for {AMPServer.FriendlyName} // ID: {webhook.id} // Channel: {webhook.channel_id}')
-                                console_webhook = webhook
-                            break
-
-                    if console_webhook == None:
-                        self.logger.dev(f'*AMP Console Message* creating a new webhook for {AMPServer.FriendlyName}')
-                        console_webhook = await channel.create_webhook(name=f'{AMPServer.FriendlyName} Console')
-
-                    if AMPServer.DisplayName is not None:  # Lets check for a Display name and use that instead.
-                        self.logger.dev('*AMP Console Message* sending a message with displayname')
-                        await console_webhook.send(message, username=AMPServer.DisplayName, avatar_url=AMPServer.Avatar_url)
-                    else:
-                        self.logger.dev('*AMP Console Message* sending a message with friendlyname')
-                        await console_webhook.send(message, username=AMPServer.FriendlyName, avatar_url=AMPServer.Avatar_url)
+                # Lets check for a Display name and use that instead.
+                name = AMPServer.DisplayName if AMPServer.DisplayName is not None else AMPServer.FriendlyName
+                for message in messages:
+                    self.delivery.queue(channel, AMPServer, 'console', message, username=name, avatar_url=AMPServer.Avatar_url)
+
+    @amp_server_console_messages_send.before_loop
+    async def before_amp_server_console_messages_send(self):
+        """Replays any messages left in the Message Spool from before a restart."""
+        await self._client.wait_until_ready()
+        self.delivery.replay()
+        self.chat.replay()
 
     @tasks.loop(seconds=1)
     async def amp_server_console_event_messages_send(self):
-        """This handles AMP Console Event messages and sends them to discord."""
+        """This handles AMP Console Event messages and queues them for delivery to discord."""
         if self._client.is_ready():
-            Sent_Data = True
-            while (Sent_Data):
-                Sent_Data = False
-                for amp_server in self.AMPInstances:
-                    AMPServer_Event = self.AMPInstances[amp_server]
-                    AMP_Server_Console_Event = AMPServer_Event.Console
-
-                    if AMPServer_Event.Discord_Event_Channel == None:
-                        continue
+            for amp_server in self.AMPInstances:
+                AMPServer_Event = self.AMPInstances[amp_server]
+                AMP_Server_Console_Event = AMPServer_Event.Console
 
-                    channel = self._client.get_channel(AMPServer_Event.Discord_Event_Channel)
-                    if channel == None:
-                        continue
+                if AMPServer_Event.Discord_Event_Channel == None:
+                    continue
 
-                    if not len(AMP_Server_Console_Event.console_event_messages):
-                        continue
+                channel = self._client.get_channel(AMPServer_Event.Discord_Event_Channel)
+                if channel == None:
+                    continue
+
+                if not len(AMP_Server_Console_Event.console_event_messages):
+                    continue
 
-                    Sent_Data = True
-                    AMP_Server_Console_Event.console_event_message_lock.acquire()
-                    message = AMP_Server_Console_Event.console_event_messages.pop(0)
-                    AMP_Server_Console_Event.console_event_message_lock.release()
-
-                    # This setup is for getting/used old webhooks and allowing custom avatar names per message.
-                    webhook_list = await channel.webhooks()
-                    self.logger.debug(f'*AMP Event Message* webhooks {webhook_list}')
-                    console_webhook = None
-                    for webhook in webhook_list:
-                        if webhook.name == f"{AMPServer_Event.FriendlyName} Events":
-                            self.logger.debug(f'*AMP Event Message* found an old webhook, reusing it {AMPServer_Event.FriendlyName}')
-                            if webhook.channel_id == AMPServer_Event.Discord_Event_Channel:
-                                console_webhook = webhook
-                            else:
-                                await webhook.edit(channel=channel)
-                                self.logger.dev(f'**Editing Event Webhook for {AMPServer_Event.FriendlyName} ID: {webhook.id} Channel: {webhook.channel_id}')
-                                console_webhook = webhook
-                            break
-
-                    if console_webhook == None:
-                        self.logger.dev(f'*AMP Event Message* creating a new webhook for {AMPServer_Event.FriendlyName}')
-                        console_webhook = await channel.create_webhook(name=f'{AMPServer_Event.FriendlyName} Events')
-
-                    if AMPServer_Event .DisplayName is not None:  # Lets check for a Display name and use that instead.
-                        self.logger.dev('*AMP Event Message* sending a message with displayname')
-                        await console_webhook.send(message, username=AMPServer_Event.DisplayName, avatar_url=AMPServer_Event.Avatar_url)
-                    else:
-                        self.logger.dev('*AMP Event Message* sending a message with friendlyname')
-                        await console_webhook.send(message, username=AMPServer_Event.FriendlyName, avatar_url=AMPServer_Event.Avatar_url)
+                AMP_Server_Console_Event.console_event_message_lock.acquire()
+                messages = AMP_Server_Console_Event.console_event_messages
+                AMP_Server_Console_Event.console_event_messages = []
+                AMP_Server_Console_Event.console_event_message_lock.release()
+
+                # Lets check for a Display name and use that instead.
+                name = AMPServer_Event.DisplayName if AMPServer_Event.DisplayName is not None else AMPServer_Event.FriendlyName
+                for message in messages:
+                    self.delivery.queue(channel, AMPServer_Event, 'event', message, username=name, avatar_url=AMPServer_Event.Avatar_url)
 
     @tasks.loop(seconds=1)
     async def amp_server_console_chat_messages_send(self):
-        """This handles IN game chat messages and sends them to discord."""
+        """This handles IN game chat messages and queues them for delivery to discord."""
         if self._client.is_ready():
-            AMPChatChannels: dict[str | int, list[AMPInstance | AMPMinecraft]] = {}
             for amp_server in self.AMPInstances:
-                AMPServer = self.AMPInstances[amp_server]
+                AMPServer_Chat: AMPMinecraft | AMPInstance = self.AMPInstances[amp_server]
+                AMP_Server_Console_Chat = AMPServer_Chat.Console
 
-                if AMPServer.Discord_Chat_Channel == None:
+                if AMPServer_Chat.Discord_Chat_Channel == None:
                     continue
 
-                if AMPServer.Discord_Chat_Channel not in AMPChatChannels:
-                    AMPChatChannels[AMPServer.Discord_Chat_Channel] = []
-                AMPChatChannels[AMPServer.Discord_Chat_Channel].append(AMPServer)
-
-            Sent_Data = True
-            while (Sent_Data):
-                Sent_Data = False
-                for amp_server in self.AMPInstances:
-                    AMPServer_Chat: AMPMinecraft | AMPInstance = self.AMPInstances[amp_server]
-                    AMP_Server_Console_Chat = AMPServer_Chat.Console
+                channel = self._client.get_channel(AMPServer_Chat.Discord_Chat_Channel)
+                if channel == None:
+                    continue
 
-                    if AMPServer_Chat.Discord_Chat_Channel == None:
-                        continue
+                if not len(AMP_Server_Console_Chat.console_chat_messages):
+                    continue
 
-                    channel = self._client.get_channel(AMPServer_Chat.Discord_Chat_Channel)
-                    if channel == None:
-                        continue
+                AMP_Server_Console_Chat.console_chat_message_lock.acquire()
+                messages = AMP_Server_Console_Chat.console_chat_messages
+                AMP_Server_Console_Chat.console_chat_messages = []
+                AMP_Server_Console_Chat.console_chat_message_lock.release()
 
-                    if not len(AMP_Server_Console_Chat.console_chat_messages):
+                for message in messages:
+                    # Skip anything we already handled, or that is just the server echoing a message we sent into it.
+                    if self.relay.seen(self.relay.message_id(AMPServer_Chat, message)) or self.relay.is_echo(AMPServer_Chat, message['Contents'], message['Source']):
                         continue
 
-                    Sent_Data = True
-                    AMP_Server_Console_Chat.console_chat_message_lock.acquire()
-                    message = AMP_Server_Console_Chat.console_chat_messages.pop(0)
-                    AMP_Server_Console_Chat.console_chat_message_lock.release()
-
-                    # This setup is for getting/used old webhooks and allowing custom avatar names per message.
-                    webhook_list = await channel.webhooks()
-                    self.logger.debug(f'*AMP Chat Message* webhooks {webhook_list}')
-                    chat_webhook = None
-                    for webhook in webhook_list:
-                        if webhook.name == f"{AMPServer_Chat.FriendlyName} Chat":
-                            self.logger.debug(f'*AMP Chat Message* found an old webhook, reusing it {AMPServer_Chat.FriendlyName}')
-                            if webhook.channel_id == AMPServer_Chat.Discord_Chat_Channel:
-                                chat_webhook = webhook
-                            else:
-                                await webhook.edit(channel=channel)
-                                self.logger.dev(f'**Editing Chat Webhook for {AMPServer_Chat.FriendlyName} ID: {webhook.id} Channel: {webhook.channel_id}')
-                                chat_webhook = webhook
-                            break
-
-                    if chat_webhook == None:
-                        self.logger.dev(f'*AMP Chat Message* creating a new webhook for {AMPServer_Chat.FriendlyName}')
-                        chat_webhook = await channel.create_webhook(name=f'{AMPServer_Chat.FriendlyName} Chat')
-
                     # This is the person who wrote the In-Game Message
                     author = message['Source']
-                    author_prefix = None
 
                     message_contents = message['Contents'].replace('\n', ' ')
                     server_prefix = AMPServer_Chat.Discord_Chat_Prefix
 
-                    db_author: None | DB.DBUser = self.DB.GetUser(author)
-                    if db_author != None:
-                        author_prefix = await self.bPerms.get_role_prefix(db_author.DiscordID)
-
-                        if AMPServer_Chat.get_IGN_Avatar(db_user=db_author):
-                            self.logger.dev('Using AMP Server Information')
-                            name, avatar = AMPServer_Chat.get_IGN_Avatar(db_user=db_author)
-
-                        else:
-                            discord_user = self._client.get_user(int(db_author.DiscordID))
-                            if discord_user != None:
-                                self.logger.dev('Using Discord Server Information')
-                                name, avatar = discord_user.name, discord_user.avatar
-
-                    #!TODO! Test these changes.
-                    if db_author == None and AMPServer_Chat.get_IGN_Avatar(user=author):
-                        self.logger.dev('Using Message Information')
-                        name, avatar = AMPServer_Chat.get_IGN_Avatar(user=author)
-                    else:
-                        name, avatar = author, AMPServer_Chat.Avatar_url
+                    identity = await self.authors.resolve(AMPServer_Chat, author)
+                    author_prefix = identity['author_prefix']
+                    name = identity['name']
+                    avatar = identity['avatar'] if identity['avatar'] != None else AMPServer_Chat.Avatar_url
 
                     if author_prefix != None:
                         self.logger.dev('Adding Author Prefix to Name')
@@ -309,19 +232,10 @@ class AMP_Tasks(commands.Cog):
                         self.logger.dev('Adding Server Prefix to Name')
                         name = f'[{server_prefix}] - ' + name
 
-                    await chat_webhook.send(content=message_contents, username=name, avatar_url=avatar)
+                    self.delivery.queue(channel, AMPServer_Chat, 'chat', message_contents, username=name, avatar_url=avatar)
 
                     # This is the Chat Relay to separate AMP Servers.
-                    if chat_webhook.channel is not None and chat_webhook.channel.id in AMPChatChannels:
-                        self.logger.dev('Found another Server Chat Channel Listening to this Discord channel.')
-                        for Server in AMPChatChannels[chat_webhook.channel.id]:
-
-                            # Dont re-send the Console Chat message we sent to Discord to the same server.
-                            if AMPServer_Chat == Server:
-                                continue
-
-                            self.logger.dev(f'Sending the Mesage from {AMPServer_Chat.FriendlyName} to Other Server: {Server.FriendlyName}')
-                            Server.Chat_Message(message=message_contents, author_prefix=author_prefix, author=author, server_prefix=AMPServer_Chat.Discord_Chat_Prefix)
+                    self.relay.relay(AMPServer_Chat, message_contents, author=author, author_prefix=author_prefix)
 
 
 async def setup(client: commands.Bot):
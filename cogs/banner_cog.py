@@ -22,11 +22,15 @@
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import io
+import json
 import logging
 import math
 import os
 import pathlib
 import sqlite3
+import time
 from datetime import datetime
 from importlib.resources import is_resource
 
@@ -34,13 +38,15 @@ import discord
 from discord import MessageType, app_commands
 from discord.app_commands import Choice
 from discord.ext import commands, tasks
-from PIL import Image
 
 import AMP_Handler
 import DB as DB
 import modules.banner_creator as BC
 import utils
 import utils_embeds
+import utils_executor
+import utils_ratelimit
+import utils_render
 import utils_ui
 from utils_dev.banner_editor.ui.view import Banner_Editor_View
 
@@ -49,6 +55,10 @@ Dependencies = ["AMP_server_cog.py"]
 
 
 class Banner(commands.Cog):
+    # Seconds to collect Server state changes before refreshing, and the least seconds between edits of one Banner Group's messages.
+    BANNER_DEBOUNCE = 5
+    BANNER_MIN_INTERVAL = 30
+
     def __init__(self, client: commands.Bot):
         self._client = client
         self.name = os.path.basename(__file__)
@@ -67,6 +77,18 @@ class Banner(commands.Cog):
         self.uiBot = utils_ui
         self.dBot = utils.discordBot(client)
         self.BC = BC
+        self.budget = utils_ratelimit.getRESTBudget()
+        self.render_pool = utils_render.getBannerRenderPool()
+
+        # Event driven refreshes, see `_state_refresh()`.
+        self._banner_dirty: set[str] = set()
+        self._banner_dirty_groups: set[int] = set()
+        self._banner_refreshed: dict[int, float] = {}
+        self._banner_locks: dict[int, asyncio.Lock] = {}
+        self._banner_refresh_task = None
+        # Discord Message ID -> hash of the Banner Image/Embeds it shows, so unchanged messages are not edited again.
+        self._banner_hashes: dict[int, str] = {}
+        self.AMPHandler.add_state_listener(self._state_changed)
 
         self.uBot.sub_command_handler('server', self.amp_banner)  # This adds server specific amp_banner commands to the `/server` parent command.
         self.uBot.sub_command_handler('bot', self.banner_settings)
@@ -79,6 +101,10 @@ class Banner(commands.Cog):
 
         self.logger.info(f'**SUCCESS** Loading Module **{self.name.title()}**')
 
+    async def cog_unload(self):
+        self.AMPHandler.remove_state_listener(self._state_changed)
+        self.render_pool.shutdown()
+
     @property
     def _Message_Timeout(self):
         return self.DBConfig.Message_timeout
@@ -93,6 +119,7 @@ class Banner(commands.Cog):
 
         self.logger.dev(f'{self.name.title()} `on_message_delete` event fired.. attempting to remove the message from the DB.')
         self.DB.Remove_Message_from_BannerGroup(messageid=message.id)
+        self._banner_hashes.pop(message.id, None)
 
     @commands.Cog.listener('on_guild_channel_delete')
     async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel):
@@ -136,8 +163,22 @@ class Banner(commands.Cog):
 
         # Create my View first
         editor_view = Banner_Editor_View(amp_handler=self.AMPHandler, db_banner=db_server_banner, amp_server=amp_server, banner_message=sent_msg)
-        banner_file = self.uiBot.banner_file_handler(self.BC.Banner_Generator(amp_server, db_server.getBanner())._image_())
-        await sent_msg.edit(content='**Banner Editor**', attachments=[banner_file], view=editor_view)
+        # The editor works on reduced size previews; the full size Banner is rendered when it is saved.
+        banner_bytes = await self.render_pool.preview(amp_server, db_server.getBanner())
+        await sent_msg.edit(content='**Banner Editor**', attachments=[discord.File(fp=io.BytesIO(banner_bytes), filename=BC.banner_filename(BC.PREVIEW_ENCODING))], view=editor_view)
+
+    def _content_changed(self, message_id: int, digest: str) -> bool:
+        """Returns `True` if `digest` differs from what the message was last edited with."""
+        return self._banner_hashes.get(message_id) != digest
+
+    def _embed_digest(self, embeds: list[discord.Embed]) -> str:
+        """Hashes the Embeds minus their footer, which only holds the time they were rendered."""
+        payload = []
+        for embed in embeds:
+            embed = embed.to_dict()
+            embed.pop('footer', None)
+            payload.append(embed)
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
 
     async def _embed_generator(self, banner_name: str, server_list: list[str], message_list: list[discord.Message], discord_guild: discord.Guild, discord_channel: discord.TextChannel):
         embed_list = await self.eBot.server_display_embed(server_list=server_list, guild=discord_guild, banner_name=banner_name)
@@ -151,6 +192,8 @@ class Banner(commands.Cog):
         if len(message_list) > ratio:
             for message in message_list[ratio:]:
                 self.DB.Remove_Message_from_BannerGroup(messageid=message.id)
+                self._banner_hashes.pop(message.id, None)
+                await self.budget.acquire(self.budget.CLEANUP, discord_channel.id)
                 await message.delete()
 
         # We have no Message IDs in the Database; so lets send new messages and store the IDs.
@@ -161,18 +204,29 @@ class Banner(commands.Cog):
             if len(message_list):
                 for message in message_list:
                     self.DB.Remove_Message_from_BannerGroup(messageid=message.id)
+                    self._banner_hashes.pop(message.id, None)
+                    await self.budget.acquire(self.budget.CLEANUP, discord_channel.id)
                     await message.delete()
 
             for curpos in range(0, len(embed_list), 10):
-                cur_message = await discord_channel.send(embeds=embed_list[curpos:(curpos + 9)])
+                await self.budget.acquire(self.budget.BANNER, discord_channel.id)
+                cur_message = await discord_channel.send(embeds=embed_list[curpos:(curpos + 10)])
                 self.DB.Add_Message_to_BannerGroup(banner_groupname=banner_name, channelid=discord_channel.id, messageid=cur_message.id)
+                self._banner_hashes[cur_message.id] = self._embed_digest(embed_list[curpos:(curpos + 10)])
 
         elif len(message_list) == ratio:
             for curpos in range(0, len(message_list)):
+                # 0*10 = 0 : (0+1)*10 = 10 / 1*10 = 10 : (1+1)*10 = 20 / 2 *10 = 20 : (2+1)*10 = 30
+                embeds = embed_list[curpos * 10:(curpos + 1) * 10]
+                digest = self._embed_digest(embeds)
+                if not self._content_changed(message_list[curpos].id, digest):
+                    continue
+
                 try:
-                    # 0*10 = 0 : (0+1)*10 = 10 / 1*10 = 10 : (1+1)*10 = 20 / 2 *10 = 20 : (2+1)*10 = 30
+                    await self.budget.acquire(self.budget.BANNER, discord_channel.id)
                     # await message_list[curpos].edit(content= f"*Edited at {discord.utils.utcnow().strftime('%Y-%m-%d | %H:%M')}*", embeds=embed_list[curpos*10:(curpos+1)*10], attachments= [])
-                    await message_list[curpos].edit(embeds=embed_list[curpos * 10:(curpos + 1) * 10], attachments=[])
+                    await message_list[curpos].edit(embeds=embeds, attachments=[])
+                    self._banner_hashes[message_list[curpos].id] = digest
 
                 except discord.errors.Forbidden:
                     self.logger.error(f'{self._client.user.name} lacks permissions to edit messages in {discord_channel.name}, removing the Channel from {banner_name}.')
@@ -183,10 +237,8 @@ class Banner(commands.Cog):
                     self.logger.error(f'{self._client.user.name} is unable to find the messages for {banner_name}, removing its messages.')
                     self.DB.Remove_Message_from_BannerGroup(messageid=message_list[curpos].id)
 
-                await asyncio.sleep(2)
-
     async def _banner_generator(self, banner_name: str, server_list: list[str], message_list: list[discord.Message], discord_guild: discord.Guild, discord_channel: discord.TextChannel):
-        banner_image_list = []
+        banners = []
 
         for db_server in server_list:
 
@@ -202,12 +254,20 @@ class Banner(commands.Cog):
             except:
                 if self.DBConfig.GetSetting("Auto_BG_Remove") == True:
                     self.DB.Remove_Server_from_BannerGroup(banner_groupname=banner_name, instanceID=db_server.InstanceID)
-                else:
-                    continue
+                continue
+
+            banners.append((amp_server, db_server.getBanner()))
+
+        # Every Banner in the group renders at once in the Banner Render worker processes.
+        # With `Banner_Atlas_Size` above 1 several Banners are stacked into each image; so each message holds several Servers.
+        atlas_size = self.DBConfig.GetSetting('Banner_Atlas_Size')
+        if isinstance(atlas_size, int) and atlas_size > 1:
+            rendered = await self.render_pool.render_atlas_group(banners, atlas_size)
+        else:
+            rendered = await self.render_pool.render_group(banners)
 
-            banner_file = self.uiBot.banner_file_handler(self.BC.Banner_Generator(amp_server, db_server.getBanner())._image_())
-            # Store all the images as a `discord.File` for ease of iterations.
-            banner_image_list.append(banner_file)
+        # Store the encoded images with their hash; the `discord.File` is only made for messages that need it.
+        banner_image_list = [(banner_bytes, hashlib.sha256(banner_bytes).hexdigest()) for banner_bytes in rendered if banner_bytes != None]
 
         if not len(banner_image_list):
             self.logger.warn('We failed to find any Banners for your Instances.')
@@ -216,10 +276,12 @@ class Banner(commands.Cog):
         # If we have too many messages; well we need to remove the remaining messages.
         # We also remove the discord Messages too.
         if len(message_list) > len(banner_image_list):
-            # Since Banner Images are 1 image per 1 message; we can use the len of our banner_image_list as our index
+            # Since Banner Images (or atlases) are 1 image per 1 message; we can use the len of our banner_image_list as our index
             old_messages = message_list[len(banner_image_list):]
             for message in old_messages:
                 self.DB.Remove_Message_from_BannerGroup(messageid=message.id)
+                self._banner_hashes.pop(message.id, None)
+                await self.budget.acquire(self.budget.CLEANUP, discord_channel.id)
                 await message.delete()
                 message_list.remove(message)
 
@@ -230,24 +292,33 @@ class Banner(commands.Cog):
             if len(message_list):
                 for message in message_list:
                     try:
+                        await self.budget.acquire(self.budget.CLEANUP, discord_channel.id)
                         await message.delete()  # Remove any extra messages or existing messages.
                     except:
                         self.logger.error('Failed to find discord.Message object; removing Message from bannergroup.')
                     self.DB.Remove_Message_from_BannerGroup(messageid=message.id)
+                    self._banner_hashes.pop(message.id, None)
 
-            for curpos in range(0, len(banner_image_list)):
-                cur_message = await discord_channel.send(file=banner_image_list[curpos])
+            for banner_bytes, digest in banner_image_list:
+                await self.budget.acquire(self.budget.BANNER, discord_channel.id)
+                cur_message = await discord_channel.send(file=discord.File(fp=io.BytesIO(banner_bytes), filename=self.render_pool.filename()))
                 self.DB.Add_Message_to_BannerGroup(banner_groupname=banner_name, channelid=discord_channel.id, messageid=cur_message.id)
+                self._banner_hashes[cur_message.id] = digest
 
         elif len(message_list) == len(banner_image_list):
-            first_msg = True
             for curpos in range(0, len(message_list)):
+                banner_bytes, digest = banner_image_list[curpos]
+                if not self._content_changed(message_list[curpos].id, digest):
+                    continue
+
                 try:
-                    if first_msg:
-                        await message_list[curpos].edit(content=f"*Edited at {discord.utils.utcnow().strftime('%Y-%m-%d | %H:%M')}*", attachments=[banner_image_list[curpos]], embed=None)
-                        first_msg = False
+                    await self.budget.acquire(self.budget.BANNER, discord_channel.id)
+                    banner_file = discord.File(fp=io.BytesIO(banner_bytes), filename=self.render_pool.filename())
+                    if curpos == 0:
+                        await message_list[curpos].edit(content=f"*Edited at {discord.utils.utcnow().strftime('%Y-%m-%d | %H:%M')}*", attachments=[banner_file], embed=None)
                     else:
-                        await message_list[curpos].edit(attachments=[banner_image_list[curpos]], embed=None)
+                        await message_list[curpos].edit(attachments=[banner_file], embed=None)
+                    self._banner_hashes[message_list[curpos].id] = digest
 
                 except discord.errors.Forbidden:
                     self.logger.error(f'{self._client.user.name} lacks permissions to edit messages in {discord_channel.name}, removing the Channel from {banner_name}.')
@@ -257,15 +328,12 @@ class Banner(commands.Cog):
                     self.logger.error(f'{self._client.user.name} is unable to find the messages for {banner_name}, removing its messages.')
                     self.DB.Remove_Message_from_BannerGroup(messageid=message_list[curpos].id)
 
-                await asyncio.sleep(2)
-
     @tasks.loop(minutes=1)
     async def banner_loop_time_control(self):
         """Dynamically adjusts the `server_display_update` loop time."""
-        base_time = 60  # seconds
-        # for each message we have in the DB; lets add to our base_time so we can *hopefully* avoid API ratelimit from discord.
-        num_messages = self.DB.get_all_bannergroup_messages()
-        base_time += (num_messages * 10)
+        # Spread each channel's Banner edits over whatever Chat/Console delivery left of that channel's rate limit.
+        channels = {channel_id: len([message for message in info['messages'] if message != None]) for channel_id, info in self.DB.Get_All_BannerGroup_Info().items()}
+        base_time = self.budget.banner_interval(channels)
 
         if self.server_display_update.seconds == base_time:
             return
@@ -275,7 +343,8 @@ class Banner(commands.Cog):
 
     @tasks.loop(seconds=60)
     async def server_display_update(self):
-        """This will handle the constant updating of Server Display Messages"""
+        """This will handle the constant updating of Server Display Messages\n
+        State changes are picked up by `_state_refresh()` as they happen; this is the safety net for anything it missed."""
         if not self._client.is_ready():
             return
 
@@ -287,9 +356,15 @@ class Banner(commands.Cog):
         Banners = self.DB.Get_All_BannerGroup_Info()
         # Banners structure = {916195413839712277: {'name': 'TestBannerGroup', 'guild_id': 602285328320954378, 'servers': [1], 'messages': [1079236992145051668]}}
         for key, value in Banners.items():
+            await self._banner_group_update(key, value)
+
+    async def _banner_group_update(self, channel_id: int, value: dict):
+        """Re-renders one Banner Group's messages in `channel_id`; `value` is its entry from `Get_All_BannerGroup_Info()`."""
+        lock = self._banner_locks.setdefault(channel_id, asyncio.Lock())
+        async with lock:
             self.logger.dev(f'Getting the Banner Group: {value["name"]} from the DB')
             discord_guild = self._client.get_guild(value['guild_id'])
-            discord_channel = discord_guild.get_channel(key)
+            discord_channel = discord_guild.get_channel(channel_id)
 
             # This should create a list of DBServer Objects.
             if len(value['servers']):
@@ -311,6 +386,59 @@ class Banner(commands.Cog):
             else:
                 await self._embed_generator(banner_name=value['name'], server_list=servers, message_list=messages, discord_channel=discord_channel, discord_guild=discord_guild)
 
+            self._banner_refreshed[channel_id] = time.monotonic()
+
+    def _state_changed(self, amp_server: AMP_Handler.AMP.AMPInstance, reason: str):
+        """AMPHandler State Listener; called from the Console/Instance threads so it only hands the change to the event loop."""
+        try:
+            self._client.loop.call_soon_threadsafe(self._mark_dirty, amp_server.InstanceID)
+        except (AttributeError, RuntimeError):
+            # The client is not running yet, or is shutting down.
+            return
+
+    def _mark_dirty(self, instance_id: str):
+        if not self.DBConfig.GetSetting('Banner_Auto_Update'):
+            return
+
+        self._banner_dirty.add(instance_id)
+        if self._banner_refresh_task == None or self._banner_refresh_task.done():
+            self._banner_refresh_task = asyncio.create_task(self._state_refresh(), name='Banner State Refresh')
+
+    async def _state_refresh(self):
+        """Refreshes only the Banner Groups showing a Server whose state changed.\n
+        Changes are collected for `BANNER_DEBOUNCE` seconds and each Banner Group's messages are edited at most once every `BANNER_MIN_INTERVAL` seconds."""
+        while len(self._banner_dirty) or len(self._banner_dirty_groups):
+            await asyncio.sleep(self.BANNER_DEBOUNCE)
+            if not self._client.is_ready():
+                continue
+
+            Banners = self.DB.Get_All_BannerGroup_Info()
+            if len(self._banner_dirty):
+                dirty = set()
+                for instance_id in self._banner_dirty:
+                    db_server = self.DB.GetServer(InstanceID=instance_id)
+                    if db_server != None:
+                        dirty.add(db_server.ID)
+                self._banner_dirty.clear()
+
+                for key, value in Banners.items():
+                    if dirty.intersection(value['servers']):
+                        self._banner_dirty_groups.add(key)
+
+            # Groups held back by the minimum interval stay dirty for the next pass.
+            now = time.monotonic()
+            for key in list(self._banner_dirty_groups):
+                if key not in Banners:
+                    self._banner_dirty_groups.discard(key)
+                    continue
+
+                if now - self._banner_refreshed.get(key, 0) < self.BANNER_MIN_INTERVAL:
+                    continue
+
+                self._banner_dirty_groups.discard(key)
+                self.logger.dev(f'Refreshing Banner Group {Banners[key]["name"]} after a Server state change.')
+                await self._banner_group_update(key, Banners[key])
+
     @commands.hybrid_group(name='bannergroup')
     async def banner_group_group(self, context: commands.Context):
         if context.invoked_subcommand is None:
@@ -473,7 +601,10 @@ class Banner(commands.Cog):
         image_path = pathlib.Path.cwd().joinpath('resources/banners').as_posix() + '/' + image
         banner.background_path = image_path
         amp_server._setDBattr()
-        my_image = Image.open(image_path)
+        # Normalizes the background into the asset store now so the next render of this Banner reuses it.
+        my_image = await self.render_pool.executor.execute(context, BC.load_background, image_path, banner.blur_background_amount, name='Banner Background')
+        if my_image is utils_executor.FAILED:
+            return
         await context.send(content=f'Set **{amp_server.FriendlyName}** Banner Image to', file=self.uiBot.banner_file_handler(my_image), ephemeral=True, delete_after=self._client.Message_Timeout)
 
     @amp_banner.command(name='settings')
@@ -536,6 +667,52 @@ class Banner(commands.Cog):
             self.DBConfig.SetSetting('Banner_Type', 1)
             return await context.send('Looks like we are going to be using **Custom Banner Images**! Oooooh yea~', ephemeral=True, delete_after=self._client.Message_Timeout)
 
+    @banner_settings.command(name='encoding')
+    @utils.role_check()
+    @app_commands.choices(encoding=[Choice(name='PNG', value='png'), Choice(name='Optimized PNG', value='png_optimized'), Choice(name='Palette PNG (256 colors)', value='png_palette'),
+                                    Choice(name='Lossless WebP', value='webp_lossless'), Choice(name='WebP', value='webp')])
+    async def banner_encoding(self, context: commands.Context, encoding: Choice[str]):
+        """Selects how Banner Images are encoded before they are uploaded."""
+        self.logger.command(f'{context.author.name} used Bot Banners Encoding...')
+
+        self.DBConfig.SetSetting('Banner_Encoding', encoding.value)
+        self.render_pool.encoding = encoding.value
+        await context.send(f'Banner Images will now be uploaded as **{encoding.name}**.', ephemeral=True, delete_after=self._client.Message_Timeout)
+
+    @banner_settings.command(name='encoding_benchmark')
+    @utils.role_check()
+    @app_commands.autocomplete(server=utils.autocomplete_servers)
+    async def banner_encoding_benchmark(self, context: commands.Context, server):
+        """Encodes the Server's Banner with every encoding and reports the time and size of each."""
+        self.logger.command(f'{context.author.name} used Bot Banners Encoding Benchmark...')
+        amp_server = self.uBot.serverparse(server, context, context.guild.id)
+        if amp_server == None:
+            return await context.send(f"Hey, we uhh can't find the server **{server}**. Please try your command again <3.", ephemeral=True, delete_after=self._client.Message_Timeout)
+
+        await self.render_pool.executor.defer(context)
+        try:
+            results = await self.render_pool.benchmark(amp_server, self.DB.GetServer(amp_server.InstanceID).getBanner())
+        except Exception as e:
+            self.logger.error(f'Banner Encoding Benchmark failed for {amp_server.FriendlyName}: {e}')
+            return await context.send('The Banner Encoding Benchmark failed, please check the logs.', ephemeral=True, delete_after=self._client.Message_Timeout)
+
+        lines = [f'{"Encoding":<15}{"Encode":>10}{"Size":>11}']
+        for encoding, seconds, size in results:
+            current = ' <' if encoding == self.render_pool.encoding else ''
+            lines.append(f'{encoding:<15}{seconds * 1000:>8.1f}ms{size / 1024:>9.1f}KB{current}')
+        await context.send(f'**{amp_server.FriendlyName}** Banner encodings (smallest first):\n```\n' + '\n'.join(lines) + '\n```', ephemeral=True, delete_after=self._client.Message_Timeout)
+
+    @banner_settings.command(name='atlas')
+    @utils.role_check()
+    async def banner_atlas(self, context: commands.Context, size: app_commands.Range[int, 1, 10] = 1):
+        """Stacks up to `size` Custom Banner Images into each Banner Group message; 1 sends one per Server."""
+        self.logger.command(f'{context.author.name} used Bot Banners Atlas...')
+
+        self.DBConfig.SetSetting('Banner_Atlas_Size', size)
+        if size == 1:
+            return await context.send('Back to one **Banner Image** per Server.', ephemeral=True, delete_after=self._client.Message_Timeout)
+        await context.send(f'Banner Groups will now stack up to **{size}** Servers into each **Banner Image**.', ephemeral=True, delete_after=self._client.Message_Timeout)
+
     @banner_settings.command(name='auto_remove')
     @utils.role_check()
     @app_commands.choices(flag=[Choice(name='True', value=1), Choice(name='False', value=0)])
@@ -0,0 +1,349 @@
+'''
+   Copyright (C) 2021-2022 Katelynn Cadwallader.
+
+   This file is part of Gatekeeper, the AMP Minecraft Discord Bot.
+
+   Gatekeeper is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 3, or (at your option)
+   any later version.
+
+   Gatekeeper is distributed in the hope that it will be useful, but WITHOUT
+   ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+   or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public
+   License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with Gatekeeper; see the file COPYING.  If not, write to the Free
+   Software Foundation, 51 Franklin Street - Fifth Floor, Boston, MA
+   02110-1301, USA. 
+
+'''
+from __future__ import annotations
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Union
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import AMP_Handler
+import DB
+import utils
+import utils_executor
+import utils_ratelimit
+
+# This is used to force cog order to prevent missing methods.
+Dependencies = ["AMP_server_cog.py"]
+
+
+class Orchestrator(commands.Cog):
+    """Rolling Restarts and Backups across groups of Servers.\n
+    Servers are grouped by their ADS Target (host node); each Target works through its Servers in waves of `concurrency`,
+    waiting for every Server in a wave to be live again before the next, while different Targets run side by side.
+    The progress is kept in the `Orchestrator_State` setting so an interrupted operation resumes when the bot starts."""
+    OPERATIONS = {'restart': 'Restart', 'backup': 'Backup'}
+    # Seconds after an operation before health checks start; a restarting server can still report itself live for a moment.
+    HEALTH_GRACE = 15
+    HEALTH_INTERVAL = 5
+    PROGRESS_INTERVAL = 3
+
+    def __init__(self, client: discord.Client):
+        self._client = client
+        self.name = os.path.basename(__file__)
+        self.logger = logging.getLogger()
+
+        self.AMPHandler = AMP_Handler.getAMPHandler()
+        self.AMPInstances = self.AMPHandler.AMP_Instances
+
+        self.DBHandler = DB.getDBHandler()
+        self.DB = self.DBHandler.DB
+        self.DBConfig = self.DBHandler.DBConfig
+
+        self.uBot = utils.botUtils(client)
+        self.executor = utils_executor.getCommandExecutor()
+        self.budget = utils_ratelimit.getRESTBudget()
+
+        self._state: Union[dict, None] = None
+        self._task: Union[asyncio.Task, None] = None
+        self._cancelled = False
+
+        self.uBot.sub_command_handler('server', self.rolling)  # This adds the rolling commands to the `/server` parent command.
+        self.logger.info(f'**SUCCESS** Initializing {self.name.capitalize()}')
+
+    async def cog_load(self):
+        asyncio.create_task(self._resume(), name='Orchestrator Resume')
+
+    async def cog_unload(self):
+        # The state is left in the DB; the operation picks up where it left off the next time the cog loads.
+        if self._task != None:
+            self._task.cancel()
+
+    async def autocomplete_modules(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        """Autocomplete for AMP Instance Modules"""
+        choice_list = sorted({amp_server.Module for amp_server in self.AMPInstances.values()})
+        return [app_commands.Choice(name=choice, value=choice) for choice in choice_list if current.lower() in choice.lower()][:25]
+
+    async def autocomplete_targets(self, interaction: discord.Interaction, current: str) -> list[app_commands.Choice[str]]:
+        """Autocomplete for ADS Target Names"""
+        choice_list = sorted({str(amp_server.TargetName) for amp_server in self.AMPInstances.values()})
+        return [app_commands.Choice(name=choice, value=choice) for choice in choice_list if current.lower() in choice.lower()][:25]
+
+    def _name(self, amp_server: AMP_Handler.AMP.AMPInstance) -> str:
+        return amp_server.FriendlyName if amp_server.FriendlyName != None else amp_server.InstanceName
+
+    def _save(self):
+        self.DBConfig.SetSetting('Orchestrator_State', json.dumps(self._state) if self._state != None else None)
+
+    def _load(self) -> Union[dict, None]:
+        state = self.DBConfig.GetSetting('Orchestrator_State')
+        if state in (None, '', 'None'):
+            return None
+        try:
+            return json.loads(state)
+        except json.JSONDecodeError:
+            self.logger.error('Orchestrator State is not valid JSON; discarding it.')
+            return None
+
+    def _set_status(self, amp_server: AMP_Handler.AMP.AMPInstance, status: str, reason: Union[str, None] = None):
+        self._state['status'][amp_server.InstanceID] = status
+        if reason != None:
+            self._state['reasons'][amp_server.InstanceID] = reason
+        self._save()
+
+    def _progress_content(self) -> str:
+        """Renders the live progress message."""
+        state = self._state
+        labels = {'pending': 'Pending', 'running': state['operation'].title() + 'ing', 'health': 'Waiting on Health Check', 'done': 'Done', 'failed': 'Failed', 'skipped': 'Skipped'}
+        counts = {status: list(state['status'].values()).count(status) for status in labels}
+        finished = state.get('finished', False)
+
+        content = f'**Rolling {self.OPERATIONS[state["operation"]]}** started by **{state["author"]}** // Concurrency per Target: `{state["concurrency"]}`\n'
+        content += f'{"**Finished**" if finished else "**In Progress**"} - Done: `{counts["done"]}` Failed: `{counts["failed"]}` Skipped: `{counts["skipped"]}` Remaining: `{counts["pending"] + counts["running"] + counts["health"]}` of `{len(state["status"])}`\n'
+
+        # Servers being worked on and problems first; the Discord message limit cuts off the least interesting lines.
+        order = {'running': 0, 'health': 1, 'failed': 2, 'skipped': 3, 'pending': 4, 'done': 5}
+        for instance_id in sorted(state['status'], key=lambda instance_id: order[state['status'][instance_id]]):
+            status = state['status'][instance_id]
+            amp_server = self.AMPInstances.get(instance_id)
+            line = f'`{labels[status]}` **{self._name(amp_server) if amp_server != None else instance_id}**'
+            if instance_id in state['reasons']:
+                line += f' - {state["reasons"][instance_id]}'
+            if len(content) + len(line) > 1950:
+                content += '...'
+                break
+            content += line + '\n'
+        return content
+
+    async def _update_message(self, message: Union[discord.Message, None], last: str) -> str:
+        """Edits the progress message if its content changed; returns the content shown."""
+        content = self._progress_content()
+        if message == None or content == last:
+            return last
+
+        try:
+            await self.budget.acquire(utils_ratelimit.RESTBudget.BANNER, message.channel.id)
+            await message.edit(content=content)
+        except discord.HTTPException as e:
+            self.logger.warning(f'Orchestrator failed to update its progress message: {e}')
+        return content
+
+    async def _progress(self, message: Union[discord.Message, None]):
+        last = None
+        while (1):
+            last = await self._update_message(message, last)
+            await asyncio.sleep(self.PROGRESS_INTERVAL)
+
+    async def _wait_healthy(self, amp_server: AMP_Handler.AMP.AMPInstance) -> bool:
+        """Waits until `getLiveStatus()` is `True` again or the health timeout passes."""
+        deadline = time.monotonic() + self._state['health_timeout']
+        await asyncio.sleep(self.HEALTH_GRACE)
+        while (1):
+            try:
+                if await self.executor.run(amp_server.getLiveStatus, name='Rolling Health Check', timeout=15):
+                    return True
+            except Exception as e:
+                self.logger.dev(f'Orchestrator health check for {self._name(amp_server)} failed: {e}')
+
+            if time.monotonic() > deadline:
+                return False
+            await asyncio.sleep(self.HEALTH_INTERVAL)
+
+    async def _step(self, amp_server: AMP_Handler.AMP.AMPInstance) -> bool:
+        """Runs the operation on one Server; returns `False` if its Target should stop."""
+        operation = self._state['operation']
+        self._set_status(amp_server, 'running')
+        try:
+            live = await self.executor.run(amp_server.getLiveStatus, name='Rolling Health Check', timeout=15)
+            if operation == 'restart':
+                if not live:
+                    self._set_status(amp_server, 'skipped', 'Offline')
+                    return True
+                await self.executor.run(amp_server.RestartInstance, name='Rolling Restart', timeout=60)
+                amp_server.ADS_Running = True
+
+            elif operation == 'backup':
+                created = datetime.now(tz=timezone.utc)
+                await self.executor.run(amp_server.takeBackup, f'Rolling Backup by {self._state["author"]}', f'Created at {created} by {self._state["author"]}', name='Rolling Backup', timeout=60)
+
+        except asyncio.TimeoutError:
+            self._set_status(amp_server, 'failed', 'AMP did not respond')
+            return False
+        except Exception as e:
+            self.logger.error(f'Rolling {self.OPERATIONS[operation]} failed for {self._name(amp_server)}: {e}')
+            self._set_status(amp_server, 'failed', str(e)[:100])
+            return False
+
+        if live:
+            self._set_status(amp_server, 'health')
+            if not await self._wait_healthy(amp_server):
+                self._set_status(amp_server, 'failed', f'Not live after {self._state["health_timeout"]} seconds')
+                return False
+
+        self._set_status(amp_server, 'done')
+        return True
+
+    async def _run_target(self, servers: list[AMP_Handler.AMP.AMPInstance]):
+        """Works through one Target's Servers in waves, stopping the Target on the first unhealthy Server."""
+        concurrency = self._state['concurrency']
+        for index in range(0, len(servers), concurrency):
+            if self._cancelled:
+                for amp_server in servers[index:]:
+                    self._set_status(amp_server, 'skipped', 'Cancelled')
+                return
+
+            results = await asyncio.gather(*[self._step(amp_server) for amp_server in servers[index:index + concurrency]])
+            if not all(results):
+                for amp_server in servers[index + concurrency:]:
+                    self._set_status(amp_server, 'skipped', 'Halted, another Server on this Target failed')
+                return
+
+    async def _run(self, message: Union[discord.Message, None]):
+        targets: dict[str, list[AMP_Handler.AMP.AMPInstance]] = {}
+        for instance_id, status in self._state['status'].items():
+            if status != 'pending':
+                continue
+            amp_server = self.AMPInstances.get(instance_id)
+            if amp_server == None:
+                self._state['status'][instance_id] = 'skipped'
+                self._state['reasons'][instance_id] = 'Instance no longer exists'
+                continue
+            targets.setdefault(str(amp_server.TargetName), []).append(amp_server)
+        self._save()
+
+        progress = asyncio.create_task(self._progress(message), name='Orchestrator Progress')
+        try:
+            await asyncio.gather(*[self._run_target(servers) for servers in targets.values()])
+        finally:
+            progress.cancel()
+
+        self._state['finished'] = True
+        await self._update_message(message, None)
+        self.logger.info(f'Finished Rolling {self.OPERATIONS[self._state["operation"]]}.')
+        self._state = None
+        self._save()
+
+    def _start(self, message: Union[discord.Message, None]):
+        self._cancelled = False
+        self._task = asyncio.create_task(self._run(message), name='Orchestrator')
+
+    async def _resume(self):
+        """Picks an interrupted operation back up after a restart."""
+        await self._client.wait_until_ready()
+        state = self._load()
+        if state == None or self._task != None:
+            return
+
+        # Anything in flight when the bot stopped is run again.
+        for instance_id, status in state['status'].items():
+            if status in ('running', 'health'):
+                state['status'][instance_id] = 'pending'
+        self._state = state
+
+        message = None
+        channel = self._client.get_channel(state['channel_id'])
+        if channel != None:
+            try:
+                message = await channel.fetch_message(state['message_id'])
+            except discord.HTTPException:
+                message = await channel.send(self._progress_content())
+                state['message_id'] = message.id
+
+        self.logger.warning(f'Resuming Rolling {self.OPERATIONS[state["operation"]]} started by {state["author"]}.')
+        self._start(message)
+
+    async def _begin(self, context: commands.Context, operation: str, module: Union[str, None], target: Union[str, None], concurrency: int, health_timeout: int):
+        if self._task != None and not self._task.done():
+            return await context.send('A Rolling operation is already running, see `/server rolling status` or `/server rolling cancel`.', ephemeral=True, delete_after=self._client.Message_Timeout)
+
+        servers = [amp_server for amp_server in self.AMPInstances.values() if (module == None or amp_server.Module == module) and (target == None or str(amp_server.TargetName) == target)]
+        if not len(servers):
+            return await context.send('No Servers matched the provided Module/Target.', ephemeral=True, delete_after=self._client.Message_Timeout)
+
+        self._state = {'operation': operation,
+                       'author': context.author.display_name,
+                       'concurrency': concurrency,
+                       'health_timeout': health_timeout,
+                       'status': {amp_server.InstanceID: 'pending' for amp_server in servers},
+                       'reasons': {},
+                       'channel_id': context.channel.id,
+                       'message_id': None}
+
+        # Not ephemeral so the message can still be found and edited if the bot restarts part way through.
+        message = await context.send(self._progress_content())
+        self._state['message_id'] = message.id
+        self._save()
+        self._start(message)
+
+    @commands.hybrid_group(name='rolling')
+    @utils.role_check()
+    async def rolling(self, context: commands.Context):
+        if context.invoked_subcommand is None:
+            await context.send('Invalid command passed...', ephemeral=True, delete_after=self._client.Message_Timeout)
+
+    @rolling.command(name='restart')
+    @utils.role_check()
+    @app_commands.autocomplete(module=autocomplete_modules, target=autocomplete_targets)
+    @app_commands.describe(module='Only Servers using this Module', target='Only Servers on this ADS Target', concurrency='Servers restarted at once per Target, Default is 1', health_timeout='Seconds to wait for a Server to be live again, Default is 300')
+    async def rolling_restart(self, context: commands.Context, module: str = None, target: str = None, concurrency: app_commands.Range[int, 1, 10] = 1, health_timeout: app_commands.Range[int, 30, 3600] = 300):
+        """Restarts every matching Server in waves, waiting for each wave to be live again"""
+        self.logger.command(f'{context.author.name} used Server Rolling Restart...')
+        await self._begin(context, 'restart', module, target, concurrency, health_timeout)
+
+    @rolling.command(name='backup')
+    @utils.role_check()
+    @app_commands.autocomplete(module=autocomplete_modules, target=autocomplete_targets)
+    @app_commands.describe(module='Only Servers using this Module', target='Only Servers on this ADS Target', concurrency='Servers backed up at once per Target, Default is 1', health_timeout='Seconds to wait for a Server to be live again, Default is 300')
+    async def rolling_backup(self, context: commands.Context, module: str = None, target: str = None, concurrency: app_commands.Range[int, 1, 10] = 1, health_timeout: app_commands.Range[int, 30, 3600] = 300):
+        """Backs up every matching Server in waves, waiting for each wave to be live again"""
+        self.logger.command(f'{context.author.name} used Server Rolling Backup...')
+        await self._begin(context, 'backup', module, target, concurrency, health_timeout)
+
+    @rolling.command(name='status')
+    @utils.role_check()
+    async def rolling_status(self, context: commands.Context):
+        """Displays the progress of the current Rolling operation"""
+        self.logger.command(f'{context.author.name} used Server Rolling Status...')
+        if self._state == None:
+            return await context.send('There is no Rolling operation running.', ephemeral=True, delete_after=self._client.Message_Timeout)
+        await context.send(self._progress_content(), ephemeral=True, delete_after=self._client.Message_Timeout)
+
+    @rolling.command(name='cancel')
+    @utils.role_check()
+    async def rolling_cancel(self, context: commands.Context):
+        """Stops the current Rolling operation once its running wave finishes"""
+        self.logger.command(f'{context.author.name} used Server Rolling Cancel...')
+        if self._task == None or self._task.done():
+            return await context.send('There is no Rolling operation running.', ephemeral=True, delete_after=self._client.Message_Timeout)
+
+        self._cancelled = True
+        await context.send('Cancelling the Rolling operation once the current wave finishes.', ephemeral=True, delete_after=self._client.Message_Timeout)
+
+
+async def setup(client):
+    await client.add_cog(Orchestrator(client))
@@ -38,6 +38,7 @@ import AMP_Handler
 import DB
 import utils
 import utils_embeds
+import utils_executor
 import utils_ui
 from discordBot import Gatekeeper
 
@@ -129,10 +130,11 @@ class Whitelist(commands.Cog):
 
         db_user: None | DB.DBUser = self.DB.GetUser(value=str(member.id))
         if db_user != None and db_user.MC_IngameName != None:
-            for instance_id, amp_instance in self.AMPHandler.AMP_Instances.items():
-                if amp_instance.Module == 'Minecraft':
-                    self.logger.info(f"Removing {db_user.MC_IngameName} from {amp_instance.FriendlyName} Whitelist.")
-                    amp_instance.removeWhitelist(in_gamename=db_user.MC_IngameName)
+            instances = [amp_instance for amp_instance in self.AMPHandler.AMP_Instances.values() if amp_instance.Module == 'Minecraft']
+            self.logger.info(f"Removing {db_user.MC_IngameName} from {len(instances)} Minecraft Server Whitelists.")
+            result = await utils_executor.getCommandExecutor().fan_out(instances, lambda amp_instance: amp_instance.removeWhitelist(in_gamename=db_user.MC_IngameName), name='Whitelist Remove')
+            if len(result.failed) or len(result.timed_out):
+                self.logger.warning(f'Failed to remove {db_user.MC_IngameName} from the Whitelist of: {", ".join(result.names("failed") + result.names("timed_out"))}')
 
     # Server Whitelist Commands ------------------------------------------------------------
 
@@ -172,6 +174,7 @@ class Whitelist(commands.Cog):
     async def amp_server_whitelist_add(self, context: commands.Context, server, name):
         """Adds User to Servers Whitelist"""
         self.logger.command(f'{context.author.name} used AMP Server Whitelist Add...')
+        await utils_executor.getCommandExecutor().defer(context)
 
         amp_server = await self.uBot._serverCheck(context, server)
         if amp_server:
@@ -190,6 +193,7 @@ class Whitelist(commands.Cog):
     async def amp_server_whitelist_remove(self, context: commands.Context, server, name):
         """Remove a User from the Servers Whitelist"""
         self.logger.command(f'{context.author.name} used AMP Server Whitelist Remove...')
+        await utils_executor.getCommandExecutor().defer(context)
 
         amp_server = await self.uBot._serverCheck(context, server)
         if amp_server:
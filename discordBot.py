@@ -21,6 +21,7 @@
 '''
 from __future__ import annotations
 import sys
+import asyncio
 import logging
 import traceback
 
@@ -33,6 +34,11 @@ from discord.app_commands import Choice
 import utils
 import utils_embeds
 import utils_ui
+import utils_executor
+import utils_heads
+import utils_spool
+import utils_chat
+import utils_webhooks
 import AMP_Handler
 import DB
 from typing import Union
@@ -323,6 +329,70 @@ async def bot_utils_status(context: commands.Context):
     await context.send(f'**AMP Connected**: {client.AMPHandler.SuccessfulConnection} // **SQL Database**: {client.DBHandler.SuccessfulDatabase}', ephemeral=True, delete_after=client.Message_Timeout)
 
 
+@bot_utils.command(name='executor')
+@utils.role_check()
+async def bot_utils_executor(context: commands.Context):
+    """Displays queue wait and execution times for AMP calls made by commands and buttons"""
+    client.logger.command(f'{context.author.name} used Bot Utils Executor Function...')
+
+    executor = utils_executor.getCommandExecutor()
+    queued, active = executor.pending()
+    content = f'**Workers**: {executor.max_workers} // **Active**: {active} // **Queued**: {queued}\n'
+    for name, metric in sorted(executor.metrics().items()):
+        calls = max(1, metric['calls'])
+        content += f'**{name}** - Calls: `{metric["calls"]}` Wait: `{metric["wait"] / calls * 1000:.0f}ms avg / {metric["max_wait"] * 1000:.0f}ms max` Run: `{metric["run"] / calls * 1000:.0f}ms avg / {metric["max_run"] * 1000:.0f}ms max` Errors: `{metric["errors"]}` Timeouts: `{metric["timeouts"]}`\n'
+
+    await context.send(content[:2000], ephemeral=True, delete_after=client.Message_Timeout)
+
+
+@bot_utils.command(name='player_heads')
+@utils.role_check()
+@app_commands.describe(url='Head image URL; `{uuid}` and `{size}` are filled in. Leave empty to only show the cache.')
+async def bot_utils_player_heads(context: commands.Context, url: Union[None, str] = None):
+    """Displays the Player Head Cache and optionally sets where Player Heads are fetched from"""
+    client.logger.command(f'{context.author.name} used Bot Utils Player Heads Function...')
+
+    heads = utils_heads.getPlayerHeadCache()
+    if url != None:
+        if '{uuid}' not in url or not url.startswith(('http://', 'https://')):
+            return await context.send('The URL must start with `http://` or `https://` and contain `{uuid}`.', ephemeral=True, delete_after=client.Message_Timeout)
+        client.DBConfig.SetSetting('Player_Head_URL', url)
+        heads.base_url = url
+
+    stats = heads.stats()
+    await context.send(f'**Player Heads**: `{heads.base_url}`\n**Cached**: {stats["heads"]} // **Size**: {stats["bytes"] / 1024:.0f}KB of {stats["max_bytes"] / 1024 / 1024:.0f}MB // **Fetching**: {stats["fetching"]}', ephemeral=True, delete_after=client.Message_Timeout)
+
+
+@bot_utils.command(name='message_spool')
+@utils.role_check()
+@app_commands.choices(flag=[Choice(name='True', value=1), Choice(name='False', value=0)])
+@app_commands.describe(flag='Keep outbound Console, Chat and Event messages in `spool.db` until they are delivered.', limit='Max messages kept in the spool, the oldest are dropped past this.')
+async def bot_utils_message_spool(context: commands.Context, flag: Union[None, Choice[int]] = None, limit: app_commands.Range[int, 100, 1000000] | None = None):
+    """Displays the Message Spool and optionally turns it ON or OFF or sets its limit"""
+    client.logger.command(f'{context.author.name} used Bot Utils Message Spool Function...')
+
+    if limit != None:
+        client.DBConfig.SetSetting('Message_Spool_Limit', limit)
+        if utils_spool.Message_Spool != None:
+            utils_spool.Message_Spool.limit = limit
+
+    if flag != None:
+        if flag.value == 0 and utils_spool.Message_Spool != None:
+            # Anything still spooled stays in `spool.db` and is replayed once the spool is turned back on.
+            await asyncio.to_thread(utils_spool.Message_Spool.flush)
+        client.DBConfig.SetSetting('Message_Spool', flag.value)
+        if flag.value == 1:
+            utils_webhooks.getWebhookDelivery(client).replay()
+            utils_chat.getChatDispatcher().replay()
+
+    spool = utils_spool.getMessageSpool()
+    if spool == None:
+        return await context.send('**Message Spool** is `Disabled`, outbound messages are only kept in memory.', ephemeral=True, delete_after=client.Message_Timeout)
+
+    count = await asyncio.to_thread(spool.count)
+    await context.send(f'**Message Spool** is `Enabled` // **Waiting**: {count} of {spool.limit} messages', ephemeral=True, delete_after=client.Message_Timeout)
+
+
 @bot_utils.command(name='message_timeout')
 @utils.role_check()
 @app_commands.describe(time='Default is 60 seconds')
@@ -54,7 +54,7 @@ class AMPFactorio(AMP.AMPInstance):
             if self.setAMPRolePermissions(self.AMP_BotRoleID, perm, enabled):
                 self.logger.dev(f'Set {perm} for {self.AMP_BotRoleID} to {enabled}')
 
-    def Chat_Message(self, message: str, author: str = None, prefix: str = None):
+    def Chat_Message(self, message: str, author: str = None, author_prefix: str = None, server_prefix: str = None):
         # See https://wiki.factorio.com/Rich_text
         self.ConsoleMessage(f'[color=blue]"[Discord]"[/color] [color=default]<{author}>: {message}[/color]')
 
@@ -28,6 +28,7 @@ import requests
 
 import AMP
 import AMP_Console
+import utils_heads
 from DB import DBUser
 
 DisplayImageSources = ["internal:MinecraftJava"]
@@ -149,11 +150,10 @@ class AMPMinecraft(AMP.AMPInstance):
 
         return True
 
-    def getHeadbyUUID(self, UUID: str):
-        """Gets a Users Player Head via UUID"""
-        # DOESN'T WORK FOR AVATAR ICONS.. DONT USE IT!
-        MChead = 'https://mc-heads.net/head/' + UUID
-        return MChead
+    def getHeadbyUUID(self, UUID: str) -> str | None:
+        """Gets a Users Player Head URL via UUID from the Player Head Cache. \n
+        Returns `None` when the head server has no head for the UUID."""
+        return utils_heads.getPlayerHeadCache().avatar_url(UUID)
 
     def banUserID(self, ID: str):
         """Bans a User from the Server"""
@@ -164,6 +164,10 @@ class AMPMinecraft(AMP.AMPInstance):
 
     def Chat_Message(self, message: str, author: str | None = None, author_prefix: str | None = None, server_prefix: str | None = None):
         """Sends a customized message via tellraw through the console."""
+        self.Chat_Messages([{'message': message, 'author': author, 'author_prefix': author_prefix, 'server_prefix': server_prefix}])
+
+    def Chat_Messages(self, messages: list[dict[str, str | None]]):
+        """Sends a batch of customized messages via a single tellraw through the console, one line per message."""
         self.Login()
         # Colors:
         # To write colors, you have to use the "color" variable. To write the command, use /tellraw (text){"color":(insert color)}Ex: /tellraw @p {"text":"hi","color":"red"}
@@ -172,15 +176,28 @@ class AMPMinecraft(AMP.AMPInstance):
         # Writing font is fairly simple. Use the basic /tellraw command, and write {"(insert font)":true}. The fonts you can use are:italic, underlined, and bold.
         # How To Use Both:
         # To use both font and color, write a comma between the variables. Ex: /tellraw {"color":"green","bold":"true"}
-        content = 'tellraw @a [{"text":"[Discord]","color":"blue"},'
-        if server_prefix != None:
-            content += f'{{"text":"({server_prefix})","color":"gold"}},'
+        components = []
+        for entry in messages:
+            line = [{"text": "[Discord]", "color": "blue"}]
+            if entry.get('server_prefix') != None:
+                line.append({"text": f"({entry['server_prefix']})", "color": "gold"})
+
+            if entry.get('author_prefix') != None:
+                line.append({"text": f"({entry['author_prefix']})", "color": "yellow"})
+
+            line.append({"text": f"<{entry.get('author')}>: {entry['message']}", "color": "white"})
+
+            # Minecraft commands are limited to 32500 characters; send what we have before we go over.
+            if len(components) and len(json.dumps(components + line)) > 32000:
+                self.ConsoleMessage('tellraw @a ' + json.dumps(components))
+                components = []
 
-        if author_prefix != None:
-            content += f'{{"text":"({author_prefix})","color":"yellow"}},'
+            if len(components):
+                components.append({"text": "\n"})
+            components += line
 
-        content += f'{{"text":"<{author}>: {message}","color":"white"}}]'
-        self.ConsoleMessage(content)
+        if len(components):
+            self.ConsoleMessage('tellraw @a ' + json.dumps(components))
 
     def Chat_Message_Formatter(self, message: str):
         """Formats the message for Discord \n"""
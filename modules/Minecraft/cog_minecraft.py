@@ -26,6 +26,7 @@ import os
 import logging
 
 import utils
+import utils_executor
 import AMP_Handler
 import DB as DB
 
@@ -67,11 +68,11 @@ class Minecraft(commands.Cog):
         self.logger.dev(f'Member Leave {self.name}: {member.name} {member}')
 
         db_user = self.DB.GetUser(str(member.id))
-        if db_user != None and db_user.InGameName != None:
-            for server in self.AMPInstances:
-                if self.AMPInstances[server].Module == 'Minecraft':
-                    if db_user.MC_IngameName != None:
-                        self.AMPInstances[server].removeWhitelist(db_user.MC_IngameName)
+        if db_user != None and db_user.MC_IngameName != None:
+            instances = [amp_server for amp_server in self.AMPInstances.values() if amp_server.Module == 'Minecraft']
+            result = await utils_executor.getCommandExecutor().fan_out(instances, lambda amp_server: amp_server.removeWhitelist(in_gamename=db_user.MC_IngameName), name='Minecraft Whitelist Remove')
+            if len(result.failed) or len(result.timed_out):
+                self.logger.warning(f'Failed to remove {db_user.MC_IngameName} from the Whitelist of: {", ".join(result.names("failed") + result.names("timed_out"))}')
 
         return member
 
@@ -1,12 +1,293 @@
 #Banner Creator
+from __future__ import annotations
 from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageColor
+from collections import OrderedDict
+import functools
+import hashlib
+import io
+import os
 import pathlib
-import random
+import threading
+import time
+from typing import TYPE_CHECKING, Union
 
-import DB
-import AMP_Handler
 import logging
-        
+
+#Only needed for type hints; this module is imported by the Banner Render worker processes and must stay light.
+if TYPE_CHECKING:
+    import DB
+    import AMP_Handler
+
+
+class Banner_Server_Snapshot():
+    """Plain copy of the AMPInstance attributes `Banner_Generator` uses, so a banner can be rendered in another process. \n
+    **Note** Makes AMP API calls; create it off the event loop."""
+    def __init__(self, AMPServer:AMP_Handler.AMP.AMPInstance):
+        self.InstanceName = AMPServer.InstanceName
+        self.FriendlyName = AMPServer.FriendlyName
+        self.DisplayName = AMPServer.DisplayName
+        self.Description = getattr(AMPServer, 'Description', '')
+        self.Host = AMPServer.Host
+        self.Whitelist = AMPServer.Whitelist
+        self.Whitelist_disabled = AMPServer.Whitelist_disabled
+        self.Donator = AMPServer.Donator
+        self.ADS_Running = AMPServer.ADS_Running
+        self.background_banner_path = AMPServer.background_banner_path
+        self.default_background_banner_path = AMPServer.default_background_banner_path
+
+        self._users_online = ('0', '0')
+        self._users = {}
+        #Player Head images by user ID; filled in from the Player Head Cache by the Banner Render pool.
+        self._heads = {}
+        if self.ADS_Running:
+            self._users_online = AMPServer.getUsersOnline() or ('0', '0')
+            self._users = AMPServer.getUsers()
+
+    def getUsersOnline(self) -> tuple[str, str]:
+        return self._users_online
+
+    def getUsers(self) -> dict[str, str]:
+        return self._users
+
+    def getUserList(self) -> list[str]:
+        return list(self._users.values())
+
+    def getHeads(self) -> dict[str, bytes]:
+        return self._heads
+
+
+class Banner_Settings_Snapshot():
+    """Plain copy of a DBBanner's settings; changing it does not write to the DB."""
+    def __init__(self, DBBanner:DB.DBBanner):
+        for key in DBBanner._attr_list:
+            if key.startswith('_'):
+                continue
+            setattr(self, key, getattr(DBBanner, key, None))
+
+
+@functools.lru_cache(maxsize=32)
+def load_font(path:str, size:int) -> ImageFont.FreeTypeFont:
+    """Loads each (font, size) once per process; `ImageFont.truetype` re-reads and parses the TTF every call."""
+    return ImageFont.truetype(path, size)
+
+
+@functools.lru_cache(maxsize=4096)
+def text_length(path:str, size:int, text:str) -> float:
+    """Cached `getlength()`; the same labels and player names are measured on every render."""
+    return load_font(path, size).getlength(text)
+
+
+ELLIPSIS = '...'
+
+
+def _fit(text:str, path:str, size:int, limit:float, suffix:str='') -> str:
+    """Binary searches for the longest prefix of `text` that fits in `limit` with `suffix` appended."""
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if text_length(path, size, text[:mid].rstrip() + suffix) <= limit:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low].rstrip() + suffix
+
+
+def wrap_text(text:str, path:str, size:int, limit:float, sep:str=' ', max_lines:int=None) -> list[str]:
+    """Greedily wraps `text` on `sep` into lines no wider than `limit`. \n
+    Words are measured once each (cached) and added up, so this is linear in the length of `text`; words wider than `limit` are split where they fit.
+    When there are more than `max_lines` lines the last kept line ends with `ELLIPSIS`."""
+    sep_length = text_length(path, size, sep)
+    lines = []
+    line = []
+    width = 0
+    for word in text.split(sep):
+        word_length = text_length(path, size, word)
+        if len(line) and width + sep_length + word_length <= limit:
+            line.append(word)
+            width += sep_length + word_length
+            continue
+
+        if len(line):
+            lines.append(sep.join(line))
+        while word_length > limit:
+            head = _fit(word, path, size, limit) or word[0]
+            lines.append(head)
+            word = word[len(head):]
+            word_length = text_length(path, size, word)
+        line = [word]
+        width = word_length
+
+        #Everything past here would be cut off anyways.
+        if max_lines != None and len(lines) > max_lines:
+            break
+    else:
+        lines.append(sep.join(line))
+
+    if max_lines != None and len(lines) > max_lines:
+        rest = sep.join(lines[max_lines - 1:])
+        last = _fit(rest, path, size, limit, ELLIPSIS)[:-len(ELLIPSIS)]
+        #Prefer cutting at the end of a word over the middle of one.
+        if sep in last and not rest.startswith(last + sep):
+            last = last.rsplit(sep, 1)[0].rstrip()
+        lines = lines[:max_lines - 1] + [last + ELLIPSIS]
+    return lines
+
+
+@functools.lru_cache(maxsize=256)
+def _head_image(data:bytes, size:int) -> Image.Image:
+    """Decodes and scales a Player Head once per process."""
+    with Image.open(io.BytesIO(data)) as head:
+        return head.convert('RGBA').resize((size, size), resample= Image.Resampling.LANCZOS)
+
+
+BANNER_SIZE = (800, 270)
+#Normalized backgrounds shared by the bot and the Banner Render worker processes; outside `resources/banners` so they never show up as a choice.
+BANNER_CACHE_PATH = pathlib.Path('resources/banner_cache')
+BANNER_CACHE_LIMIT = 64
+
+
+def _normalize_background(path:str, blur:int) -> Image.Image:
+    image = Image.open(path)
+    image = image.resize(size=BANNER_SIZE, resample= Image.Resampling.BICUBIC)
+    if image.mode != 'RGBA':
+        image = image.convert(mode= 'RGBA')
+    if blur != 0:
+        image = image.filter(ImageFilter.GaussianBlur(blur))
+    return image
+
+
+def _prune_background_cache():
+    """Keeps the newest `BANNER_CACHE_LIMIT` backgrounds on disk; entries for old mtimes or blur levels age out."""
+    entries = sorted(BANNER_CACHE_PATH.glob('*.png'), key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in entries[BANNER_CACHE_LIMIT:]:
+        entry.unlink(missing_ok=True)
+
+
+@functools.lru_cache(maxsize=16)
+def _background(path:str, mtime:int, blur:int) -> Image.Image:
+    key = hashlib.sha1(f'{path}|{mtime}|{blur}'.encode()).hexdigest()
+    cached = BANNER_CACHE_PATH.joinpath(f'{key}.png')
+    if cached.exists():
+        try:
+            image = Image.open(cached)
+            image.load()
+            if image.size == BANNER_SIZE and image.mode == 'RGBA':
+                return image
+        except Exception as e:
+            logging.getLogger().warning(f'Discarding unreadable cached Banner background {cached.as_posix()}: {e}')
+
+    image = _normalize_background(path, blur)
+    try:
+        BANNER_CACHE_PATH.mkdir(parents=True, exist_ok=True)
+        #Write then rename; another worker process or thread may be reading or writing the same entry.
+        temp = cached.with_suffix(f'.{os.getpid()}.{threading.get_ident()}.tmp')
+        image.save(temp, 'PNG')
+        os.replace(temp, cached)
+        _prune_background_cache()
+    except OSError as e:
+        logging.getLogger().warning(f'Unable to cache the Banner background {path}: {e}')
+    return image
+
+
+def load_background(path:str, blur:int=0) -> Image.Image:
+    """Returns the background at `path` resized to 800x270 RGBA and blurred by `blur`. \n
+    Entries are keyed by path, mtime and blur; held in memory and on disk under `resources/banner_cache` so each background is only processed once. \n
+    Returns a copy; callers are free to draw on it."""
+    return _background(path, os.stat(path).st_mtime_ns, int(blur or 0)).copy()
+
+
+@functools.lru_cache(maxsize=1)
+def _corner_mask(size:tuple[int, int]=BANNER_SIZE) -> Image.Image:
+    mask = Image.new('L', size)
+    ImageDraw.Draw(mask).rounded_rectangle([(0,0), size], radius=40, fill=255)
+    return mask
+
+
+#InstanceName -> (inputs, static layer); see `Banner_Generator._static_layer()`.
+_static_layers:OrderedDict[str, tuple[tuple, Image.Image]] = OrderedDict()
+#Banners render on several threads when `Banner_Render_Workers` is 0.
+_static_layers_lock = threading.Lock()
+STATIC_LAYER_LIMIT = 32
+
+
+#Encoding -> (file extension, `Image.save()` arguments); selected with the `Banner_Encoding` setting.
+BANNER_ENCODINGS = {
+    'png': ('png', {'format': 'PNG'}),
+    'png_optimized': ('png', {'format': 'PNG', 'optimize': True}),
+    #Quantized to 256 colors (alpha included) before saving.
+    'png_palette': ('png', {'format': 'PNG', 'optimize': True}),
+    'webp_lossless': ('webp', {'format': 'WEBP', 'lossless': True, 'quality': 80, 'method': 4}),
+    'webp': ('webp', {'format': 'WEBP', 'quality': 85, 'method': 4}),
+}
+
+
+def banner_filename(encoding:str='png') -> str:
+    """The attachment filename for a Banner encoded with `encoding`; Discord picks the preview type from the extension."""
+    return f'image.{BANNER_ENCODINGS.get(encoding, BANNER_ENCODINGS["png"])[0]}'
+
+
+def encode_banner(image:Image.Image, encoding:str='png') -> bytes:
+    """Encodes the Banner Image; unknown encodings fall back to `png`."""
+    if encoding not in BANNER_ENCODINGS:
+        encoding = 'png'
+
+    if encoding == 'png_palette':
+        image = image.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+
+    with io.BytesIO() as image_binary:
+        image.save(image_binary, **BANNER_ENCODINGS[encoding][1])
+        return image_binary.getvalue()
+
+
+def render_banner(AMPServer:Banner_Server_Snapshot, DBBanner:Banner_Settings_Snapshot, encoding:str='png') -> bytes:
+    """Renders the Banner and returns it encoded with `encoding`; this is what the Banner Render worker processes run."""
+    return encode_banner(Banner_Generator(AMPServer, DBBanner)._image_(), encoding)
+
+
+PREVIEW_REDUCE = 2
+PREVIEW_ENCODING = 'webp'
+
+
+def render_preview(AMPServer:Banner_Server_Snapshot, DBBanner:Banner_Settings_Snapshot) -> bytes:
+    """Renders the Banner at 1/`PREVIEW_REDUCE` size as lossy WebP for the Banner Editor; a fraction of the bytes to encode and upload."""
+    return encode_banner(Banner_Generator(AMPServer, DBBanner)._image_().reduce(PREVIEW_REDUCE), PREVIEW_ENCODING)
+
+
+ATLAS_GAP = 10
+
+
+def render_atlas(banners:list[tuple[Banner_Server_Snapshot, Banner_Settings_Snapshot]], encoding:str='png') -> Union[bytes, None]:
+    """Renders every Banner and stacks them top to bottom into one image, `ATLAS_GAP` pixels apart. \n
+    A Banner that fails to render is left out; returns `None` if none of them rendered."""
+    images = []
+    for AMPServer, DBBanner in banners:
+        try:
+            images.append(Banner_Generator(AMPServer, DBBanner)._image_())
+        except Exception as e:
+            logging.getLogger().error(f'Failed to render the Banner for {AMPServer.FriendlyName}: {e}')
+
+    if not len(images):
+        return None
+
+    atlas = Image.new('RGBA', (BANNER_SIZE[0], len(images) * (BANNER_SIZE[1] + ATLAS_GAP) - ATLAS_GAP))
+    for index, image in enumerate(images):
+        atlas.paste(image, (0, index * (BANNER_SIZE[1] + ATLAS_GAP)))
+    return encode_banner(atlas, encoding)
+
+
+def benchmark_encodings(AMPServer:Banner_Server_Snapshot, DBBanner:Banner_Settings_Snapshot, rounds:int=3) -> list[tuple[str, float, int]]:
+    """Renders the Banner once and encodes it with every encoding. \n
+    Returns `[(encoding, seconds per encode, bytes)]`, smallest first."""
+    image = Banner_Generator(AMPServer, DBBanner)._image_()
+    results = []
+    for encoding in BANNER_ENCODINGS:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            data = encode_banner(image, encoding)
+        results.append((encoding, (time.perf_counter() - start) / rounds, len(data)))
+    return sorted(results, key=lambda result: result[2])
+
+
 class Banner_Generator():
     """Custom Banner Generator for Gatekeeper. """
     def __init__(self, AMPServer:AMP_Handler.AMP.AMPInstance, DBBanner:DB.DBBanner, Banner_path:str=None, blur_background:bool=None):
@@ -14,8 +295,10 @@ class Banner_Generator():
         self._font = pathlib.Path("resources/fonts/ReemKufiFun-Regular.ttf").as_posix()
         self._logger = logging.getLogger()
         self._font_default_size = 12
-        self._font_default = ImageFont.truetype(self._font, self._font_default_size)
+        self._font_default = load_font(self._font, self._font_default_size)
         self._font_drop_shadow_size = (int(self._font_default_size / 5), int(self._font_default_size / 5))
+        #(xy, text, font, fill, drop shadow fill, drop shadow blur); drawn together by `_flush_text()`.
+        self._text_queue = []
 
         if Banner_path == None:
             Banner_path = AMPServer.background_banner_path
@@ -25,13 +308,7 @@ class Banner_Generator():
         self._Server = AMPServer
         self._DBBanner = DBBanner
 
-        self._banner_limit_size_x = 800
-        self._banner_limit_size_y = 270
-        self.banner_image = self._validate_image(pathlib.Path(Banner_path).as_posix())
-
-    
-        if DBBanner.blur_background_amount != 0:
-            self._blur_background(blur_power= DBBanner.blur_background_amount)
+        self._banner_limit_size_x, self._banner_limit_size_y = BANNER_SIZE
 
         self._banner_shadow_box = (int(self._banner_limit_size_x / 3.5),self._banner_limit_size_y) #x,y)
         self._banner_shadow_box_x = int(self._banner_limit_size_x - self._banner_shadow_box[0])
@@ -41,20 +318,20 @@ class Banner_Generator():
         self._font_Header_size = int(self._font_default_size * 5)
         self._font_Header_color =  DBBanner.color_header #Really light Blue
         #self._font_Header_color =  "#85c1e9" #Really light Blue
-        self._font_Header = ImageFont.truetype(self._font, self._font_Header_size)
+        self._font_Header = load_font(self._font, self._font_Header_size)
         self._font_Header_text_height = self._font_Header.getbbox('W')[-1]
 
         self._font_Body_size = int(self._font_default_size * 2)
         self._font_Body_line_offset = 0
         self._font_Body_color = DBBanner.color_body #Off White
         # self._font_Body_color = "#f2f3f4" #Off White
-        self._font_Body = ImageFont.truetype(self._font, self._font_Body_size)
+        self._font_Body = load_font(self._font, self._font_Body_size)
         self._font_Body_text_height = self._font_Body.getbbox('W')[-1]
 
         self._font_Host_color = DBBanner.color_host
         # self._font_IP_color = "#5dade2"
         self._font_Host_size = int(self._font_default_size * 3)
-        self._font_Host = ImageFont.truetype(self._font, self._font_Host_size)
+        self._font_Host = load_font(self._font, self._font_Host_size)
         self._font_Host_text_height = self._font_Host.getbbox('W')[-1]
 
         self._font_Whitelist_size = int(self._font_default_size * 3.5)
@@ -62,18 +339,18 @@ class Banner_Generator():
         self._font_Whitelist_color_closed = DBBanner.color_whitelist_closed
         # self._font_Whitelist_color_open =  "#f7dc6f"
         # self._font_Whitelist_color_closed = "#cb4335"
-        self._font_Whitelist = ImageFont.truetype(self._font, self._font_Whitelist_size)
+        self._font_Whitelist = load_font(self._font, self._font_Whitelist_size)
         self._font_Whitelist_text_height = self._font_Whitelist.getbbox('W')[-1]
 
         self._font_Donator_size = int(self._font_default_size * 3.5)
         self._font_Donator_color = DBBanner.color_donator
         # self._font_Donator_color = "#212f3c"
-        self._font_Donator = ImageFont.truetype(self._font, self._font_Donator_size)
+        self._font_Donator = load_font(self._font, self._font_Donator_size)
         self._font_Donator_text_height = self._font_Donator.getbbox('W')[-1]
 
         
         self._font_Status_size = int(self._font_default_size * 3)
-        self._font_Status = ImageFont.truetype(self._font, self._font_Status_size)
+        self._font_Status = load_font(self._font, self._font_Status_size)
         self._font_Status_text_height = self._font_Status.getbbox('W')[-1]
 
         self._font_Status_color_online = DBBanner.color_status_online
@@ -89,118 +366,116 @@ class Banner_Generator():
         self._font_Player_Limit_color_min = DBBanner.color_player_limit_min
         # self._font_Player_Limit_color_max = "#ba4a00"
         # self._font_Player_Limit_color_min = "#5dade2"
-        self._font_Player_Limit = ImageFont.truetype(self._font, self._font_Player_Limit_size)
+        self._font_Player_Limit = load_font(self._font, self._font_Player_Limit_size)
         self._font_Player_Limit_text_height = self._font_Player_Limit.getbbox('W')[-1]
 
         self._font_Player_Online_size = int(self._font_default_size * 2) 
         self._font_Player_Online_color = DBBanner.color_player_online
         # self._font_Player_Online_color = "#f7dc6f" #white
-        self._font_Player_Online = ImageFont.truetype(self._font, self._font_Player_Online_size)
+        self._font_Player_Online = load_font(self._font, self._font_Player_Online_size)
         self._font_Player_Online_text_height = self._font_Player_Online.getbbox('W')[-1]
-        
-        self._shadow_box()
-        self._Server_Name()
+
+        #Background, Shadowbox, Name, Donator, Description and Host only change when the Server or Banner settings do.
+        self.banner_image = self._static_layer(pathlib.Path(Banner_path).as_posix())
         self._Server_Status()
 
         #If Whitelisting is NOT Disabled display Whitelist Text.
         if not AMPServer.Whitelist_disabled:
             self._Server_Whitelist()
-        
-        #If Donator Only; display the Text
-        if AMPServer.Donator:
-            self._Server_Donator()
 
-        self._Server_Description()
         self._Server_Players_Online()
-        self._Server_Host()
+        self._flush_text()
         #This MUST BE CALLED LAST
         self._round_corners()
 
     def _image_(self):
         return self.banner_image
 
-    def _validate_image(self, path) -> Image.Image:
+    def _static_layer(self, path:str) -> Image.Image:
+        """Returns a copy of the Server's cached static layer; rebuilt when any of its inputs change."""
         try:
-            image = Image.open(path)
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        name = self._Server.DisplayName if self._Server.DisplayName != None else self._Server.FriendlyName
+        inputs = (path, mtime, self._DBBanner.blur_background_amount, name, self._Server.Description, self._Server.Host, bool(self._Server.Donator),
+                  self._font_Header_color, self._font_Body_color, self._font_Host_color, self._font_Donator_color)
+
+        _static_layers_lock.acquire()
+        cached = _static_layers.get(self._Server.InstanceName)
+        if cached != None and cached[0] == inputs:
+            _static_layers.move_to_end(self._Server.InstanceName)
+        else:
+            cached = None
+        _static_layers_lock.release()
+        if cached != None:
+            return cached[1].copy()
+
+        self.banner_image = self._validate_image(path, blur= self._DBBanner.blur_background_amount)
+        self._shadow_box()
+        self._Server_Name()
+
+        #If Donator Only; display the Text
+        if self._Server.Donator:
+            self._Server_Donator()
 
-            image = image.resize(size=(self._banner_limit_size_x, self._banner_limit_size_y), resample= Image.Resampling.BICUBIC)
+        self._Server_Description()
+        self._Server_Host()
+        self._flush_text()
+
+        layer = self.banner_image.copy()
+        _static_layers_lock.acquire()
+        _static_layers[self._Server.InstanceName] = (inputs, layer)
+        _static_layers.move_to_end(self._Server.InstanceName)
+        while len(_static_layers) > STATIC_LAYER_LIMIT:
+            _static_layers.popitem(last=False)
+        _static_layers_lock.release()
+        return self.banner_image
 
-            if image.mode != 'RGBA':
-                image = image.convert(mode= 'RGBA')
-            return image
+    def _validate_image(self, path, blur:int=0) -> Image.Image:
+        """Returns the normalized (and blurred) background from the Background asset store."""
+        try:
+            return load_background(path, blur)
         except:
             #We are reverting all changes to default values due to failure.
             self._logger.error(f'We Failed to find the Existing Image Path, resetting {self._Server.InstanceName} background path to default.')
             self._Server.background_banner_path = self._Server.default_background_banner_path
             self._DBBanner.background_path = self._Server.default_background_banner_path 
-            return self._validate_image(path= self._Server.default_background_banner_path)
-
-    def _blur_background(self, blur_power:int=2):
-        """Blurs the Background Image with GaussianBlur"""
-        self.banner_image = self.banner_image.filter(ImageFilter.GaussianBlur(blur_power))
-        return 
+            return self._validate_image(path= self._Server.default_background_banner_path, blur= blur)
 
-    def _word_wrap(self, text:str, text_font:ImageFont.ImageFont, text_size:int, limit:int, find_char:str, truncate:bool=True):
+    def _word_wrap(self, text:str, text_font:str, text_size:int, limit:int, find_char:str, truncate:bool=True):
         """Custom Word Wrap. \n
-        Returns a `list` when `truncate` is `False`"""
-        #No need to word wrap if the length is less than our cutoff.
-        if ImageFont.truetype(text_font, text_size).getlength(text) <= limit:
-            return text
-
-        #What if we don't find the char?
-        if text.find(find_char) == -1:
-            cur_text = ''
-            for char in text:
-                #If our text is now greater than our limit; lets send a shortened version and add `...`
-                if ImageFont.truetype(text_font, text_size).getlength(cur_text) >= limit:
-                    return cur_text[:-2] + "..."
-                cur_text = cur_text + char
-
-        split_test_str = text.split(find_char)
-        temp_list = []
-        temp_str = ''
-        for i in range(0,len(split_test_str)):
-            cur_str = temp_str
-            temp_str += split_test_str[i] + find_char
-            if ImageFont.truetype(text_font, text_size).getlength(temp_str) < limit:
-                continue
-            
-            elif truncate == True:
-                #Removes the extra char at the end when we truncate.
-                return cur_str[:(len(cur_str)-1)]
-
-            elif truncate == False:
-                temp_list.append(cur_str)
-                temp_str = ''
-
-        return temp_list
+        Returns a single line ending in `...` when cut off; otherwise a `list` of lines when `truncate` is `False`"""
+        lines = wrap_text(text, text_font, text_size, limit, find_char, max_lines= 1 if truncate else None)
+        if truncate == True:
+            return lines[0]
+        return lines
 
     def _color_gradient(self):
         """Adjusted the RGB values for Player Limit Display."""
         min_rgb = ImageColor.getrgb(self._font_Player_Limit_color_min)
         max_rgb = ImageColor.getrgb(self._font_Player_Limit_color_max)
         final_rgb = [0,0,0]
-        players_online = random.randint(0,8)
-        if int(self.user_count[0]) == 0:
+        players_online = int(self.user_count[0])
+        player_limit = int(self.user_count[1])
+        if players_online == 0 or player_limit == 0:
             return min_rgb
 
+        # Blends from the min color at 0 players to the max color at the Player Limit.
+        ratio = min(1, players_online / player_limit)
         for color in range(0,len(min_rgb)):
-            temp_rgb = min_rgb[color] - max_rgb[color]
-            temp_rgb/= int(self.user_count[0])
-            temp_rgb*= players_online
-            temp_rgb += min_rgb[color]
-            final_rgb[color] = int(temp_rgb)
+            final_rgb[color] = int(min_rgb[color] + (max_rgb[color] - min_rgb[color]) * ratio)
         return tuple(final_rgb)
 
     def _round_corners(self):
         """Rounds the corners of the Background Image."""
         image = Image.new('RGBA', [self._banner_limit_size_x, self._banner_limit_size_y])
-        image_draw = ImageDraw.Draw(image)
-        image_draw.rounded_rectangle([(0,0),(self._banner_limit_size_x, self._banner_limit_size_y)], radius=40, fill=(0,0,0))
-        image.paste(self.banner_image, (0,0), mask= image)
+        image.paste(self.banner_image, (0,0), mask= _corner_mask())
         self.banner_image = image
  
     def _draw_text(self, xy:tuple, text:str, font:ImageFont.ImageFont, fill=None, drop_shadow_fill=None, drop_shadow_blur=1):
+        """Queues the text and its drop shadow; see `_flush_text()`."""
         if type(drop_shadow_fill) == str:
             drop_shadow_fill = ImageColor.getrgb(drop_shadow_fill)
         
@@ -210,16 +485,45 @@ class Banner_Generator():
         if type(fill) == str:
             fill = ImageColor.getrgb(fill)
 
-        image_size = font.getbbox(text= text)
-        shadow = Image.new('RGBA', [int(image_size[2] + self._font_drop_shadow_size[0]) , int(image_size[3] + self._font_drop_shadow_size[1])])
-        shadow_draw = ImageDraw.Draw(shadow)
-        shadow_draw.text(xy= self._font_drop_shadow_size, text= text, fill= drop_shadow_fill, font= font)
-        shadow = shadow.filter(ImageFilter.GaussianBlur(drop_shadow_blur))
-
-        shadow_draw = ImageDraw.Draw(shadow)
-        shadow_draw.text(xy=(0,0), text= text, fill= fill, font= font)
-
-        self.banner_image.paste(shadow, xy, mask= shadow)
+        self._text_queue.append((xy, text, font, fill, drop_shadow_fill, drop_shadow_blur))
+
+    def _flush_text(self):
+        """Draws all the queued text onto the Banner Image. \n
+        Every drop shadow goes on one layer that is blurred once (per blur amount), then all the text is drawn over it in a single pass.
+        The layer only covers the area the queued text does."""
+        if len(self._text_queue) == 0:
+            return
+
+        shadow_x, shadow_y = self._font_drop_shadow_size
+        margin = 3 * max(entry[5] for entry in self._text_queue) + 1
+        left, top, right, bottom = self._banner_limit_size_x, self._banner_limit_size_y, 0, 0
+        for (x,y), text, font, *_ in self._text_queue:
+            box = font.getbbox(text= text)
+            left, top = min(left, x + box[0]), min(top, y + box[1])
+            right, bottom = max(right, x + box[2] + shadow_x), max(bottom, y + box[3] + shadow_y)
+
+        left, top = max(0, int(left - margin)), max(0, int(top - margin))
+        right, bottom = min(self._banner_limit_size_x, int(right + margin)), min(self._banner_limit_size_y, int(bottom + margin))
+        if right <= left or bottom <= top:
+            self._text_queue = []
+            return
+
+        layer = None
+        for blur in sorted(set(entry[5] for entry in self._text_queue)):
+            shadow = Image.new('RGBA', [right - left, bottom - top])
+            shadow_draw = ImageDraw.Draw(shadow)
+            for (x,y), text, font, fill, drop_shadow_fill, drop_shadow_blur in self._text_queue:
+                if drop_shadow_blur == blur:
+                    shadow_draw.text(xy= (x - left + shadow_x, y - top + shadow_y), text= text, fill= drop_shadow_fill, font= font)
+            shadow = shadow.filter(ImageFilter.GaussianBlur(blur))
+            layer = shadow if layer == None else Image.alpha_composite(layer, shadow)
+
+        layer_draw = ImageDraw.Draw(layer)
+        for (x,y), text, font, fill, *_ in self._text_queue:
+            layer_draw.text(xy= (x - left, y - top), text= text, fill= fill, font= font)
+
+        self.banner_image.paste(layer, (left, top), mask= layer)
+        self._text_queue = []
 
     def _shadow_box(self):
         """Draws the Shadowbox for Players and Status on the right side of the banner."""
@@ -244,7 +548,7 @@ class Banner_Generator():
     def _Server_Host(self):
         self._font_Host_y = self._font_Header_text_height + self._font_Body_text_height + 5
         if self._Server.Host not in [None, '', 'None']:
-            text = 'Host: ' + self._Server.Host #offset = int(ImageFont.truetype(self._font, self._font_Host_size).getlength(text)/2)
+            text = 'Host: ' + self._Server.Host #offset = int(text_length(self._font, self._font_Host_size, text)/2)
     
             x,y = (25, self._font_Host_y)
             self._draw_text((x,y), text, self._font_Host, self._font_Host_color)
@@ -259,7 +563,7 @@ class Banner_Generator():
             text = 'Whitelist Open'
             color = self._font_Whitelist_color_open
 
-        offset = ImageFont.truetype(self._font, self._font_Whitelist_size).getlength(text)
+        offset = text_length(self._font, self._font_Whitelist_size, text)
         x,y = (int(self._center_align_Body - (offset / 2)), self._font_Whitelist_y)
         self._draw_text((x,y), text= text, font= self._font_Whitelist, fill= color, drop_shadow_fill= shadow_color)
     
@@ -270,7 +574,7 @@ class Banner_Generator():
         text = '[Donator Only]'
         color = self._font_Donator_color
         shadow_color = '#3498db'
-        offset = ImageFont.truetype(self._font, self._font_Donator_size).getlength(text)
+        offset = text_length(self._font, self._font_Donator_size, text)
         x,y = (int(self._center_align_Body - (offset / 2)), self._font_Donator_y)
         self._draw_text((x,y), text= text, font= self._font_Donator, fill= color, drop_shadow_fill= shadow_color)
         
@@ -298,8 +602,8 @@ class Banner_Generator():
             #This will change depending on the player limit of the server.
             self.user_count = self._Server.getUsersOnline()
             user_count_text = f'{self.user_count[0]} / {self.user_count[1]}'
-            text_length = ImageFont.truetype(self._font, self._font_Status_size).getlength(text + user_count_text)
-            padding = int((self._banner_shadow_box[0] - text_length) / 2)
+            status_length = text_length(self._font, self._font_Status_size, text + user_count_text)
+            padding = int((self._banner_shadow_box[0] - status_length) / 2)
 
             y = 0
             x = int(self._banner_shadow_box_x + padding + self._font_Status_text_length_Online)
@@ -309,15 +613,33 @@ class Banner_Generator():
         self._draw_text((x,y), text, self._font_Status, fill)
 
     def _Server_Players_Online(self):
+        """Lists the Players Online; with their Player Head beside their name when one is cached."""
         index = 0
+        head_size = int(self._font_Player_Online_text_height * 0.8)
+        head_gap = 6
+        heads = self._Server.getHeads() if hasattr(self._Server, 'getHeads') else {}
         if self._Server.ADS_Running != 0:
             y = self._font_Status_text_height
-            for entry in self._Server.getUserList():
+            for user_id, entry in self._Server.getUsers().items():
                 if index > 8:
                     return
                 index += 1
-                center_align = int((self._banner_shadow_box[0] - (ImageFont.truetype(self._font, self._font_Player_Online_size).getlength(entry))) / 2)
+                head = None
+                if user_id in heads:
+                    try:
+                        head = _head_image(heads[user_id], head_size)
+                    except Exception as e:
+                        self._logger.warning(f'Unable to use the Player Head for {entry}: {e}')
+
+                head_width = head_size + head_gap if head != None else 0
+                entry = wrap_text(entry, self._font, self._font_Player_Online_size, self._banner_shadow_box[0] - 20 - head_width, max_lines= 1)[0]
+                width = text_length(self._font, self._font_Player_Online_size, entry) + head_width
+
+                center_align = int((self._banner_shadow_box[0] - width) / 2)
                 x = int(self._banner_shadow_box_x + center_align)
+                if head != None:
+                    self.banner_image.paste(head, (x, int(y + (self._font_Player_Online_text_height - head_size) / 2) + 2), mask= head)
+                    x += head_size + head_gap
                 self._draw_text((x,y), entry, self._font_Player_Online, self._font_Player_Online_color)
                 y += self._font_Player_Online_text_height
   
@@ -104,4 +104,6 @@ class Setup:
             print(f'Unable to Start Gatekeeper, PIP Version is {pip.__version__}, we require PIP Version >= 22.1')
 
 
-Start = Setup()
+# Guarded so worker processes (eg. the Banner Render pool) can import this module without starting another bot.
+if __name__ == '__main__':
+    Start = Setup()
@@ -0,0 +1,87 @@
+'''
+   Copyright (C) 2021-2022 Katelynn Cadwallader.
+
+   This file is part of Gatekeeper, the AMP Minecraft Discord Bot.
+
+   Gatekeeper is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 3, or (at your option)
+   any later version.
+
+   Gatekeeper is distributed in the hope that it will be useful, but WITHOUT
+   ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+   or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public
+   License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with Gatekeeper; see the file COPYING.  If not, write to the Free
+   Software Foundation, 51 Franklin Street - Fifth Floor, Boston, MA
+   02110-1301, USA. 
+'''
+from __future__ import annotations
+import importlib.util
+import pathlib
+import sys
+import types
+
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+
+class _Dispatcher():
+    def queue(self, amp_server, message, **kwargs) -> bool:
+        return True
+
+
+@pytest.fixture
+def relay(monkeypatch):
+    """Loads `utils_chat` without the AMP/DB handlers, which need a live AMP panel and tokens.py."""
+    for name in ('AMP_Handler', 'DB', 'utils', 'utils_spool'):
+        monkeypatch.setitem(sys.modules, name, types.ModuleType(name))
+
+    spec = importlib.util.spec_from_file_location('_utils_chat_under_test', ROOT.joinpath('utils_chat.py'))
+    utils_chat = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(utils_chat)
+
+    graph = utils_chat.RelayGraph.__new__(utils_chat.RelayGraph)
+    graph.chat = _Dispatcher()
+    graph.echo_ttl = 30
+    graph._echoes = {}
+    return graph
+
+
+SERVER = types.SimpleNamespace(InstanceID='instance')
+
+
+@pytest.mark.parametrize('contents', [
+    'say "[Discord] (Lobby) (Mod) <Steve> ok"',
+    '[Discord] <Steve>: ok',
+    '[c/ffffff:<Steve> ok]',
+    '[Discord](Lobby) (Mod) [Steve]: ok',
+    '[Discord] <Steve>: ok[/color]',
+])
+def test_echo_is_detected_once(relay, contents):
+    relay.send(SERVER, 'ok', author='Steve')
+    assert relay.is_echo(SERVER, contents, 'Server')
+    assert not relay.is_echo(SERVER, contents, 'Server')
+
+
+def test_echo_matches_source_and_contents(relay):
+    relay.send(SERVER, 'Hello  World', author='Steve')
+    assert relay.is_echo(SERVER, 'hello world', 'steve')
+
+
+def test_unrelated_chat_with_same_substring_passes(relay):
+    relay.send(SERVER, 'ok', author='Steve')
+    assert not relay.is_echo(SERVER, 'ok cool, see you tomorrow', 'Alex')
+    assert not relay.is_echo(SERVER, 'a broken pickaxe', 'Alex')
+    assert not relay.is_echo(SERVER, 'ok', 'Alex')
+    assert not relay.is_echo(SERVER, '<Alex> ok', 'Server')
+    # The real echo is still remembered.
+    assert relay.is_echo(SERVER, '<Steve> ok', 'Server')
+
+
+def test_echoes_are_per_instance(relay):
+    relay.send(SERVER, 'ok', author='Steve')
+    assert not relay.is_echo(types.SimpleNamespace(InstanceID='other'), '<Steve> ok', 'Server')
@@ -0,0 +1,163 @@
+'''
+   Copyright (C) 2021-2022 Katelynn Cadwallader.
+
+   This file is part of Gatekeeper, the AMP Minecraft Discord Bot.
+
+   Gatekeeper is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 3, or (at your option)
+   any later version.
+
+   Gatekeeper is distributed in the hope that it will be useful, but WITHOUT
+   ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+   or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public
+   License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with Gatekeeper; see the file COPYING.  If not, write to the Free
+   Software Foundation, 51 Franklin Street - Fifth Floor, Boston, MA
+   02110-1301, USA. 
+'''
+from __future__ import annotations
+import asyncio
+import json
+import pathlib
+import sys
+from typing import Union
+
+from aiohttp import web
+
+sys.path.insert(0, pathlib.Path(__file__).resolve().parents[1].as_posix())
+import utils_heads  # noqa: E402
+
+HEAD = b'\x89PNG\r\n\x1a\n head'
+ETAG = '"v1"'
+FOUND = '069a79f4-44e9-4726-a5be-fca90e38aaf5'
+MISSING = '00000000-0000-0000-0000-000000000000'
+
+
+class HeadServer():
+    """Local stand in for the head service; `404`s for `MISSING`, `304`s when the `ETag` still matches and can hold requests open."""
+
+    def __init__(self):
+        self.requests: list[tuple[str, Union[str, None]]] = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def handler(self, request: web.Request) -> web.Response:
+        uuid = request.match_info['uuid']
+        self.requests.append((uuid, request.headers.get('If-None-Match')))
+        await self.release.wait()
+
+        if uuid == utils_heads.PlayerHeadCache.normalize(MISSING):
+            return web.Response(status=404)
+        if request.headers.get('If-None-Match') == ETAG:
+            return web.Response(status=304)
+        return web.Response(body=HEAD, content_type='image/png', headers={'ETag': ETAG})
+
+    async def __aenter__(self) -> str:
+        app = web.Application()
+        app.router.add_get('/avatar/{uuid}/{size}', self.handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f'http://127.0.0.1:{port}/avatar/{{uuid}}/{{size}}'
+
+    async def __aexit__(self, *args):
+        await self.runner.cleanup()
+
+
+async def _settle(cache: utils_heads.PlayerHeadCache):
+    """Waits for every background fetch and the index save."""
+    for _ in range(200):
+        await asyncio.sleep(0.01)
+        if not cache.stats()['fetching'] and not cache._saving:
+            return
+    raise AssertionError('Player Head fetch did not finish.')
+
+
+def test_found_head_is_cached(tmp_path):
+    async def main():
+        server = HeadServer()
+        async with server as url:
+            cache = utils_heads.PlayerHeadCache(base_url=url, path=tmp_path.as_posix(), save_delay=0)
+            assert cache.head(FOUND) == None
+            await _settle(cache)
+
+            assert cache.head(FOUND) == HEAD
+            await _settle(cache)
+            assert len(server.requests) == 1
+
+        uuid = cache.normalize(FOUND)
+        assert tmp_path.joinpath(f'{uuid}.png').read_bytes() == HEAD
+        assert json.loads(tmp_path.joinpath('index.json').read_text())[uuid]['head'] == True
+
+    asyncio.run(main())
+
+
+def test_not_modified_keeps_the_cached_head(tmp_path):
+    async def main():
+        server = HeadServer()
+        async with server as url:
+            cache = utils_heads.PlayerHeadCache(base_url=url, path=tmp_path.as_posix(), save_delay=0)
+            cache.head(FOUND)
+            await _settle(cache)
+            fetched = cache._entries[cache.normalize(FOUND)]['fetched']
+
+            # Every lookup is now stale, so the next one revalidates.
+            cache.ttl = -1
+            assert cache.head(FOUND) == HEAD
+            await _settle(cache)
+
+            assert server.requests[-1] == (cache.normalize(FOUND), ETAG)
+            assert cache.head(FOUND) == HEAD
+            assert cache._entries[cache.normalize(FOUND)]['fetched'] > fetched
+            await _settle(cache)
+
+    asyncio.run(main())
+
+
+def test_missing_head_is_stored_as_negative(tmp_path):
+    async def main():
+        server = HeadServer()
+        async with server as url:
+            cache = utils_heads.PlayerHeadCache(base_url=url, path=tmp_path.as_posix(), save_delay=0)
+            assert cache.avatar_url(MISSING) == cache.url(cache.normalize(MISSING))
+            await _settle(cache)
+
+            assert cache.head(MISSING) == None
+            assert cache.avatar_url(MISSING) == None
+            await _settle(cache)
+            assert len(server.requests) == 1
+
+        uuid = cache.normalize(MISSING)
+        assert not tmp_path.joinpath(f'{uuid}.png').exists()
+        assert json.loads(tmp_path.joinpath('index.json').read_text())[uuid]['head'] == False
+
+    asyncio.run(main())
+
+
+def test_fallback_while_fetch_is_in_flight(tmp_path):
+    async def main():
+        server = HeadServer()
+        server.release.clear()
+        async with server as url:
+            cache = utils_heads.PlayerHeadCache(base_url=url, path=tmp_path.as_posix(), save_delay=0)
+            assert cache.head(FOUND) == None
+            while not len(server.requests):
+                await asyncio.sleep(0.01)
+
+            # Nothing waits on the slow fetch and it is only requested once.
+            assert cache.head(FOUND) == None
+            assert cache.avatar_url(FOUND) == cache.url(cache.normalize(FOUND))
+            assert cache.stats()['fetching'] == 1
+
+            server.release.set()
+            await _settle(cache)
+            assert cache.head(FOUND) == HEAD
+            assert len(server.requests) == 1
+            await _settle(cache)
+
+    asyncio.run(main())
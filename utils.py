@@ -37,6 +37,7 @@ import asyncio
 
 import DB
 import AMP_Handler
+import utils_executor
 
 # GLOBAL VARS# DO NOT EDIT THESE! ONLY READ THEM
 __AMP_Handler = AMP_Handler.getAMPHandler()
@@ -530,8 +531,13 @@ class botUtils():
         if online_only == False:
             return amp_server
 
-        if amp_server.Running and amp_server._ADScheck():
-            return amp_server
+        # `_ADScheck()` is an AMP API call; commands that follow it up with more AMP calls defer before calling this.
+        if amp_server.Running:
+            try:
+                if await utils_executor.getCommandExecutor().run(amp_server._ADScheck, name='Server Check', timeout=10):
+                    return amp_server
+            except Exception as e:
+                self.logger.error(f'Failed to check if {amp_server.InstanceName} is Running: {e}')
 
         await context.send(f'Well this is awkward, it appears the **{amp_server.FriendlyName if amp_server.FriendlyName != None else amp_server.InstanceName}** is `Offline`.', ephemeral=True, delete_after=self._client.Message_Timeout)
         return False
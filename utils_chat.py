@@ -0,0 +1,435 @@
+'''
+   Copyright (C) 2021-2022 Katelynn Cadwallader.
+
+   This file is part of Gatekeeper, the AMP Minecraft Discord Bot.
+
+   Gatekeeper is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 3, or (at your option)
+   any later version.
+
+   Gatekeeper is distributed in the hope that it will be useful, but WITHOUT
+   ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+   or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public
+   License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with Gatekeeper; see the file COPYING.  If not, write to the Free
+   Software Foundation, 51 Franklin Street - Fifth Floor, Boston, MA
+   02110-1301, USA. 
+'''
+from __future__ import annotations
+import logging
+import asyncio
+import hashlib
+import re
+import time
+from collections import deque, OrderedDict
+from typing import TYPE_CHECKING, Union
+
+import discord
+
+import AMP_Handler
+import DB
+import utils
+import utils_spool
+
+if TYPE_CHECKING:
+    from AMP import AMPInstance
+
+
+class ChatDispatcher():
+    """Per Instance outbound Discord -> Game chat queues.\n
+    Each Instance gets its own worker task that sends queued messages off the event loop, batching bursts through `AMPInstance.Chat_Messages()`
+    so modules that support it (eg. Minecraft's `tellraw`) send several messages as one console command.\n
+    With the `Message_Spool` setting enabled, messages wait in the `MessageSpool` and are only removed once they were sent to the Instance.\n
+    A batch that fails to send is retried with backoff and only dropped after `MAX_ATTEMPTS`."""
+    MAX_ATTEMPTS = 5
+    # Max seconds to back off while the Instance keeps failing.
+    MAX_BACKOFF = 60
+
+    def __init__(self, flood_limit: tuple[int, float] = (5, 10), batch_delay: float = 0.25, max_batch: int = 10):
+        """`flood_limit` - (Messages, Seconds) allowed per Discord user per Instance.\n
+        `batch_delay` - Seconds to wait for more messages before sending a batch.\n
+        `max_batch` - Max messages sent in one batch."""
+        self.logger = logging.getLogger()
+        self.AMPHandler = AMP_Handler.getAMPHandler()
+        self.flood_limit = flood_limit
+        self.batch_delay = batch_delay
+        self.max_batch = max_batch
+
+        # Keeps memory bounded during long outages when the spool is disabled.
+        limit = DB.getDBHandler().DBConfig.GetSetting('Message_Spool_Limit')
+        self.limit = limit if isinstance(limit, int) and limit > 0 else 10000
+
+        self._pending: dict[str, deque[dict]] = {}
+        self._instances: dict[str, AMPInstance] = {}
+        self._workers: dict[str, asyncio.Task] = {}
+        # Ordered by last message; users idle for longer than the flood window are pruned from the front.
+        self._user_history: OrderedDict[tuple[str, int], deque[float]] = OrderedDict()
+
+    def _flooding(self, amp_server: AMPInstance, user_id: int) -> bool:
+        """Returns `True` if the Discord user has sent too many messages to the Instance recently."""
+        messages, seconds = self.flood_limit
+        now = time.monotonic()
+        while len(self._user_history):
+            key, oldest = next(iter(self._user_history.items()))
+            if len(oldest) and now - oldest[-1] < seconds:
+                break
+            self._user_history.popitem(last=False)
+
+        key = (amp_server.InstanceID, user_id)
+        history = self._user_history.setdefault(key, deque(maxlen=messages))
+        self._user_history.move_to_end(key)
+        if len(history) >= messages and now - history[0] < seconds:
+            return True
+
+        history.append(now)
+        return False
+
+    def queue(self, amp_server: AMPInstance, message: str, author: Union[str, None] = None, author_prefix: Union[str, None] = None, server_prefix: Union[str, None] = None, user_id: Union[int, None] = None) -> bool:
+        """Queues a Chat Message for the Instance, returns `False` if the Discord user is being flood limited.\n
+        `user_id` - Discord user ID the message came from; relayed messages leave this as `None` and are not flood limited."""
+        if user_id != None and self._flooding(amp_server, user_id):
+            self.logger.warning(f'Flood limited {author} sending Chat Messages to {amp_server.FriendlyName}.')
+            return False
+
+        entry = {'message': message, 'author': author, 'author_prefix': author_prefix, 'server_prefix': server_prefix}
+        self._instances[amp_server.InstanceID] = amp_server
+        pending = self._pending.setdefault(amp_server.InstanceID, deque(maxlen=self.limit))
+
+        spool = utils_spool.getMessageSpool()
+        if spool != None:
+            # Keeps SQLite off the event loop; the worker's next `load()` writes anything still buffered.
+            if spool.push(f'chat:{amp_server.InstanceID}', entry, flush=False):
+                asyncio.get_running_loop().run_in_executor(None, spool.flush)
+        else:
+            pending.append(dict(entry, ids=[]))
+
+        self._start_worker(amp_server)
+        return True
+
+    def _start_worker(self, amp_server: AMPInstance):
+        worker = self._workers.get(amp_server.InstanceID)
+        if worker == None or worker.done():
+            self._workers[amp_server.InstanceID] = asyncio.create_task(self._worker(amp_server.InstanceID), name=f'Chat Dispatcher {amp_server.FriendlyName}')
+
+    def replay(self):
+        """Starts a worker for every Instance with messages left in the spool, eg. from before a restart."""
+        spool = utils_spool.getMessageSpool()
+        if spool == None:
+            return
+
+        for queue in spool.queues('chat:'):
+            amp_server = self.AMPHandler.AMP_Instances.get(queue.split(':', 1)[1])
+            if amp_server == None:
+                continue
+
+            self.logger.info(f'Replaying spooled Chat Messages for {amp_server.FriendlyName}.')
+            self._instances[amp_server.InstanceID] = amp_server
+            self._pending.setdefault(amp_server.InstanceID, deque(maxlen=self.limit))
+            self._start_worker(amp_server)
+
+    def pending(self) -> int:
+        """Returns the number of queued messages across every Instance."""
+        spool = utils_spool.getMessageSpool()
+        if spool != None:
+            return spool.count()
+        return sum(len(pending) for pending in self._pending.values())
+
+    async def _ack(self, batch: list[dict]):
+        ids = [id for entry in batch for id in entry['ids']]
+        spool = utils_spool.getMessageSpool()
+        if spool != None and len(ids):
+            await asyncio.to_thread(spool.ack, ids)
+
+    async def _worker(self, instance_id: str):
+        pending = self._pending[instance_id]
+        backoff = 1
+        while (1):
+            # Give a burst of messages a moment to arrive so they go out together.
+            await asyncio.sleep(self.batch_delay)
+
+            spool = utils_spool.getMessageSpool()
+            if not len(pending) and spool != None:
+                for id, entry in await asyncio.to_thread(spool.load, f'chat:{instance_id}', self.max_batch):
+                    pending.append(dict(entry, ids=[id]))
+
+            if not len(pending):
+                break
+
+            batch = []
+            while len(pending) and len(batch) < self.max_batch:
+                batch.append(pending.popleft())
+
+            amp_server = self._instances[instance_id]
+            try:
+                await asyncio.to_thread(amp_server.Chat_Messages, [{key: value for key, value in entry.items() if key not in ['ids', 'attempts']} for entry in batch])
+
+            except Exception as e:
+                attempts = max(entry.get('attempts', 0) for entry in batch) + 1
+                if attempts >= self.MAX_ATTEMPTS:
+                    self.logger.error(f'Dropped {len(batch)} Chat Messages for {amp_server.FriendlyName} after {attempts} failed attempts: {e}')
+                    await self._ack(batch)
+                    continue
+
+                # Keep the batch at the front of the queue (and in the spool) and try again later.
+                self.logger.warning(f'Failed to send {len(batch)} Chat Messages to {amp_server.FriendlyName}, retrying in {backoff} seconds: {e}')
+                for entry in reversed(batch):
+                    entry['attempts'] = attempts
+                    pending.appendleft(entry)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.MAX_BACKOFF)
+                continue
+
+            backoff = 1
+            await self._ack(batch)
+
+
+class AuthorResolver():
+    """Resolves and caches who wrote an In-Game Chat Message for relaying to Discord.
+
+    Entries are keyed by `(Module, IGN)` and hold `{'name', 'avatar', 'author_prefix', 'db_user_id', 'uuid'}`.
+    Lookups that need an external service (eg. Mojang) run in the background; until they finish the author is shown with the fallback identity."""
+
+    def __init__(self, client: discord.Client, max_entries: int = 1024, ttl: float = 3600, negative_ttl: float = 600):
+        """`ttl` - Seconds a resolved identity is kept.\n
+        `negative_ttl` - Seconds an identity that could not be resolved is kept before trying again."""
+        self._client = client
+        self.logger = logging.getLogger()
+        self.DB = DB.getDBHandler().DB
+        self.bPerms = utils.get_botPerms()
+
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self._cache: OrderedDict[tuple[str, str], dict] = OrderedDict()
+        self._resolving: set[tuple[str, str]] = set()
+
+    def _key(self, amp_server: AMPInstance, ign: str) -> tuple[str, str]:
+        return (type(amp_server).__name__, ign.lower())
+
+    def _store(self, key: tuple[str, str], entry: dict, ttl: float):
+        entry['expires'] = time.monotonic() + ttl
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def invalidate(self, ign: Union[str, None] = None):
+        """Removes the cached identity for the IGN from every Module, or everything if `None`."""
+        if ign == None:
+            return self._cache.clear()
+
+        for key in [key for key in self._cache if key[1] == ign.lower()]:
+            self._cache.pop(key)
+
+    async def resolve(self, amp_server: AMPInstance, ign: str) -> dict:
+        """Returns the identity for the In-Game Name; never waits on external HTTP."""
+        key = self._key(amp_server, ign)
+        entry = self._cache.get(key)
+        if entry != None and entry['expires'] > time.monotonic():
+            self._cache.move_to_end(key)
+            return entry
+
+        entry = await self._resolve_local(amp_server, ign)
+        if entry['avatar'] != None:
+            self._store(key, entry, self.ttl)
+            return entry
+
+        # Cache the fallback until the background lookup replaces it.
+        self._store(key, entry, self.negative_ttl)
+        if key not in self._resolving:
+            self._resolving.add(key)
+            asyncio.create_task(self._resolve_external(key, amp_server, ign, dict(entry)))
+        return entry
+
+    async def _resolve_local(self, amp_server: AMPInstance, ign: str) -> dict:
+        """Uses the Database, Bot Permissions and Discord's cache only."""
+        entry = {'name': ign, 'avatar': None, 'author_prefix': None, 'db_user_id': None, 'uuid': None}
+
+        db_author: None | DB.DBUser = self.DB.GetUser(ign)
+        if db_author == None:
+            return entry
+
+        entry['db_user_id'] = db_author.ID
+        entry['uuid'] = db_author.MC_UUID
+        entry['author_prefix'] = await self.bPerms.get_role_prefix(db_author.DiscordID)
+
+        # With a DB User the module can build the identity without any lookups.
+        identity = amp_server.get_IGN_Avatar(db_user=db_author)
+        if identity and identity[0]:
+            self.logger.dev('Using AMP Server Information')
+            entry['name'], entry['avatar'] = identity
+            return entry
+
+        if db_author.DiscordID not in [None, 'None']:
+            discord_user = self._client.get_user(int(db_author.DiscordID))
+            if discord_user != None:
+                self.logger.dev('Using Discord Server Information')
+                entry['name'], entry['avatar'] = discord_user.name, discord_user.display_avatar.url
+        return entry
+
+    async def _resolve_external(self, key: tuple[str, str], amp_server: AMPInstance, ign: str, entry: dict):
+        """Asks the module to resolve the IGN (eg. Mojang UUID lookup) off the event loop."""
+        try:
+            identity = await asyncio.to_thread(amp_server.get_IGN_Avatar, user=ign)
+            if identity and identity[0]:
+                self.logger.dev('Using Message Information')
+                entry['name'], entry['avatar'] = identity
+                self._store(key, entry, self.ttl)
+
+        except Exception as e:
+            self.logger.error(f'Failed to resolve the In-Game Name {ign} for {amp_server.FriendlyName}: {e}')
+
+        finally:
+            self._resolving.discard(key)
+
+
+class RelayGraph():
+    """Cross Server chat relay for AMP Instances sharing a Discord Chat Channel.
+
+    The sibling map is rebuilt only when `AMPHandler.Channel_Index_Version` changes. Relays fan out through the `ChatDispatcher` so every
+    sibling sends concurrently, repeated messages are dropped by ID and anything we send into a server is fingerprinted so its echo isn't relayed back."""
+
+    _AUTHOR_TAG = re.compile(r'[<\[](?P<author>[^<>\[\]]+)[>\]]:?\s')
+    _TRAILER = re.compile(r'\s*(\[/\w+\]|[\]"])$')
+
+    def __init__(self, seen_limit: int = 1024, echo_ttl: float = 30):
+        """`seen_limit` - Number of recent message IDs remembered for de-duplication.\n
+        `echo_ttl` - Seconds a fingerprint of a message we sent into a server is remembered."""
+        self.logger = logging.getLogger()
+        self.AMPHandler = AMP_Handler.getAMPHandler()
+        self.chat = getChatDispatcher()
+        self.seen_limit = seen_limit
+        self.echo_ttl = echo_ttl
+
+        self._version = None
+        self._siblings: dict[str, list[AMPInstance]] = {}
+        self._seen: OrderedDict[str, None] = OrderedDict()
+        self._echoes: dict[str, deque[tuple[float, str, str]]] = {}
+
+    def _rebuild(self):
+        """Rebuilds `{InstanceID: [AMPInstance]}` of every other Instance using the same Discord Chat Channel."""
+        self._version = self.AMPHandler.Channel_Index_Version
+        self._siblings = {}
+        for routes in list(self.AMPHandler.Channel_Index.values()):
+            chat_servers = [amp_server for amp_server, role in routes if role == 'chat']
+            for amp_server in chat_servers:
+                self._siblings.setdefault(amp_server.InstanceID, []).extend([server for server in chat_servers if server.InstanceID != amp_server.InstanceID])
+        self.logger.dev(f'Rebuilt the Chat Relay Graph, version {self._version}')
+
+    def siblings(self, amp_server: AMPInstance) -> list[AMPInstance]:
+        """Returns the other AMP Instances sharing this Instance's Discord Chat Channel."""
+        if self._version != self.AMPHandler.Channel_Index_Version:
+            self._rebuild()
+        return self._siblings.get(amp_server.InstanceID, [])
+
+    def message_id(self, amp_server: AMPInstance, entry: dict) -> str:
+        """Builds an ID for a Console Chat entry, which has none of its own."""
+        return hashlib.sha1(f"{amp_server.InstanceID}|{entry.get('Timestamp')}|{entry.get('Source')}|{entry.get('Contents')}".encode()).hexdigest()
+
+    def seen(self, message_id: Union[str, int]) -> bool:
+        """Returns `True` if the message ID was already handled; otherwise remembers it."""
+        message_id = str(message_id)
+        if message_id in self._seen:
+            return True
+
+        self._seen[message_id] = None
+        while len(self._seen) > self.seen_limit:
+            self._seen.popitem(last=False)
+        return False
+
+    def _fingerprint(self, text: Union[str, None]) -> str:
+        if text == None:
+            return ''
+        return ' '.join(str(text).split()).lower()
+
+    def _candidates(self, contents: str, source: Union[str, None] = None) -> list[tuple[str, str]]:
+        """Splits a Console Chat entry into possible `(author, message)` fingerprints.\n
+        Modules wrap our messages differently (eg. `<author> message`, `[author]: message` or `[c/ffffff:<author> message]`), so every author tag is tried."""
+        contents = self._fingerprint(contents)
+        candidates = [(self._fingerprint(source), contents)]
+        for match in self._AUTHOR_TAG.finditer(contents):
+            body = contents[match.end():]
+            candidates.append((match.group('author').strip(), body))
+            # Trailing closing bracket, quote or markup tag left over from the module's formatting.
+            trailer = self._TRAILER.search(body)
+            if trailer != None:
+                candidates.append((match.group('author').strip(), body[:trailer.start()]))
+        return candidates
+
+    def send(self, amp_server: AMPInstance, message: str, author: Union[str, None] = None, author_prefix: Union[str, None] = None, server_prefix: Union[str, None] = None, user_id: Union[int, None] = None) -> bool:
+        """Queues a Chat Message for the Instance through the `ChatDispatcher` and remembers its `(author, message)` fingerprint."""
+        if not self.chat.queue(amp_server, message, author=author, author_prefix=author_prefix, server_prefix=server_prefix, user_id=user_id):
+            return False
+
+        fingerprint = self._fingerprint(message)
+        if len(fingerprint):
+            self._echoes.setdefault(amp_server.InstanceID, deque(maxlen=64)).append((time.monotonic() + self.echo_ttl, self._fingerprint(author), fingerprint))
+        return True
+
+    def is_echo(self, amp_server: AMPInstance, contents: str, source: Union[str, None] = None) -> bool:
+        """Returns `True` if the Console Chat entry is a message we recently sent into this server; each fingerprint only matches once.\n
+        The chat body has to equal the message we sent and the author has to match the one we sent it as, so a player typing the same words isn't swallowed."""
+        echoes = self._echoes.get(amp_server.InstanceID)
+        if not echoes:
+            return False
+
+        now = time.monotonic()
+        while len(echoes) and echoes[0][0] < now:
+            echoes.popleft()
+
+        candidates = self._candidates(contents, source)
+        for echo in echoes:
+            for author, message in candidates:
+                if message == echo[2] and (not len(echo[1]) or author == echo[1]):
+                    echoes.remove(echo)
+                    return True
+        return False
+
+    def relay(self, amp_server: AMPInstance, message: str, author: Union[str, None] = None, author_prefix: Union[str, None] = None) -> int:
+        """Relays a Chat Message from the Instance to every sibling Instance, returns how many it was sent to."""
+        count = 0
+        for server in self.siblings(amp_server):
+            self.logger.dev(f'Sending the Mesage from {amp_server.FriendlyName} to Other Server: {server.FriendlyName}')
+            if self.send(server, message, author=author, author_prefix=author_prefix, server_prefix=amp_server.Discord_Chat_Prefix):
+                count += 1
+        return count
+
+
+# Used to maintain a "Global" ChatDispatcher() object.
+Chat_Dispatcher = None
+
+
+def getChatDispatcher() -> ChatDispatcher:
+    """Returns the Global ChatDispatcher() object; otherwise creates it."""
+    global Chat_Dispatcher
+    if Chat_Dispatcher == None:
+        Chat_Dispatcher = ChatDispatcher()
+    return Chat_Dispatcher
+
+
+# Used to maintain a "Global" AuthorResolver() object.
+Author_Resolver = None
+
+
+def getAuthorResolver(client: discord.Client = None) -> AuthorResolver:
+    """Returns the Global AuthorResolver() object; otherwise creates it."""
+    global Author_Resolver
+    if Author_Resolver == None:
+        Author_Resolver = AuthorResolver(client)
+    return Author_Resolver
+
+
+# Used to maintain a "Global" RelayGraph() object.
+Relay_Graph = None
+
+
+def getRelayGraph() -> RelayGraph:
+    """Returns the Global RelayGraph() object; otherwise creates it."""
+    global Relay_Graph
+    if Relay_Graph == None:
+        Relay_Graph = RelayGraph()
+    return Relay_Graph
@@ -1,12 +1,12 @@
 
+import io
 import logging
 
-from discord import ButtonStyle, Interaction, Message
+from discord import ButtonStyle, File, Interaction, Message
 from discord.ui import Button
 from typing import TYPE_CHECKING
 
-from utils_ui import banner_file_handler
-from modules import banner_creator as BC
+import utils_render
 
 from utils_dev.banner_editor.ui.modal import Copy_To_Modal
 from utils_dev.banner_editor.edited_banner import Edited_DB_Banner
@@ -39,8 +39,13 @@ class Save_Banner_Button(Button):
     async def callback(self, interaction: Interaction):
         """This is called when a button is interacted with."""
         saved_banner = self._edited_db_banner.save_db()
+        # Lets the Banner Groups showing this Server refresh without waiting on the next update loop.
+        self._amp_server.AMPHandler.notify_state_change(self._amp_server, 'banner')
         await interaction.response.defer()
-        file = banner_file_handler(BC.Banner_Generator(self._amp_server, saved_banner)._image_())
+        self.view.preview.cancel()
+        # The only full size render of the edit session.
+        render_pool = utils_render.getBannerRenderPool()
+        file = File(fp=io.BytesIO(await render_pool.render(self._amp_server, saved_banner)), filename=render_pool.filename())
         await self._banner_message.edit(content='**Banner Settings have been saved.**', attachments=[file], view=None)
 
 
@@ -56,10 +61,10 @@ class Reset_Banner_Button(Button):
 
     async def callback(self, interaction: Interaction):
         """This is called when a button is interacted with."""
-        saved_banner = self._edited_db_banner.reset_db()
+        self._edited_db_banner.reset_db()
         await interaction.response.defer()
-        file = banner_file_handler(BC.Banner_Generator(self._amp_server, saved_banner)._image_())
-        await self._banner_message.edit(content='**Banner Settings have been reset.**', attachments=[file])
+        await self._banner_message.edit(content='**Banner Settings have been reset.**')
+        self.view.preview.request()
 
 
 class Cancel_Banner_Button(Button):
@@ -73,6 +78,7 @@ class Cancel_Banner_Button(Button):
     async def callback(self, interaction: Interaction):
         """This is called when a button is interacted with."""
         await interaction.response.defer()
+        self.view.preview.cancel()
         await self._banner_message.edit(content='**Banner Settings Editor has been Cancelled.**', attachments=[], view=None)
 
 
@@ -89,6 +95,7 @@ class Copy_To_All_Banner_Button(Button):
 
     async def callback(self, interaction: Interaction):
         await interaction.response.defer()
+        self.view.preview.cancel()
         self._edited_db_banner.save_db()
         await self._banner_message.edit(content=f'Copying settings...', attachments=[], view=None)
 
@@ -98,5 +105,6 @@ class Copy_To_All_Banner_Button(Button):
 
             self._edited_db_banner.ServerID = self._amp_handler.DB.GetServer(InstanceID=instanceid).ID
             Edited_DB_Banner(db_banner=self._edited_db_banner).save_db()
+            self._amp_handler.notify_state_change(object, 'banner')
 
         await self._banner_message.edit(content=f'Copied **{self._amp_server.InstanceName}** Banner settings to all other Server Banners.', attachments=[], view=None)
@@ -31,4 +31,6 @@ class Copy_To_Select(Select):
         if db_server != None:
             self._edited_banner.ServerID = db_server.ID
         Edited_DB_Banner(db_banner=self._edited_banner).save_db()
+        if self.values[0] in self._amp_handler.AMP_Instances:
+            self._amp_handler.notify_state_change(self._amp_handler.AMP_Instances[self.values[0]], 'banner')
         await interaction.edit_original_response(content=f'All finished.')
@@ -11,9 +11,6 @@ import AMP_Handler
 from utils_dev.banner_editor.ui.textinput import Copy_To_TextInput, Banner_Color_Input, Banner_Blur_Input
 from utils_dev.banner_editor.ui.view2 import Copy_To_View
 
-from utils_ui import banner_file_handler
-import modules.banner_creator as BC
-
 if TYPE_CHECKING:
     from AMP import AMPInstance
     from utils_dev.banner_editor.edited_banner import Edited_DB_Banner
@@ -70,14 +67,13 @@ class Banner_Modal(Modal):
         # Depending on the Selection made; changes the validation code and the reply.
         if self._input_type == 'int':
             if await self._int_code_input.callback() == False:
-                await interaction.response.send_message(f'Please provide a Number only. {self._int_code_input.value}', ephemeral=True)
+                return await interaction.response.send_message(f'Please provide a Number only. {self._int_code_input.value}', ephemeral=True)
 
         if self._input_type == 'color':
             if await self._color_code_input.callback() == False:
-                await interaction.response.send_message(content=f'Please provide a proper Hex color Code. {self._color_code_input._value}', ephemeral=True)
+                return await interaction.response.send_message(content=f'Please provide a proper Hex color Code. {self._color_code_input._value}', ephemeral=True)
 
-        # Regardless we defer the interaction; because we only care if it fails as seen above.\
-        if self._banner_view._first_interaction:
-            await interaction.response.defer()
-        # Then we send the updated Banner object to the View.
-        await self._banner_message.edit(attachments=[banner_file_handler(BC.Banner_Generator(self._amp_server, self._edited_db_banner)._image_())], view=self._banner_view)
+        # We defer the interaction; because we only care if it fails as seen above.
+        await interaction.response.defer()
+        # Then the View's preview picks up the updated Banner object once the edits settle.
+        self._banner_view.preview.request()
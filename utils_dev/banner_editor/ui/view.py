@@ -7,6 +7,7 @@ from discord import Message, Interaction
 import logging
 
 from typing import TYPE_CHECKING
+import utils_render
 from utils_dev.banner_editor.edited_banner import Edited_DB_Banner
 from utils_dev.banner_editor.ui.select import Banner_Editor_Select
 from utils_dev.banner_editor.ui.button import Save_Banner_Button, Reset_Banner_Button, Cancel_Banner_Button, Copy_To_All_Banner_Button, Copy_To_Banner_Button
@@ -29,6 +30,8 @@ class Banner_Editor_View(View):
         self._amp_handler: AMPHandler = amp_handler
         self._first_interaction = Interaction
         self._first_interaction_bool: bool = True
+        # Edits only update a debounced, reduced size preview; the full size Banner is rendered on Save.
+        self.preview: utils_render.BannerPreview = utils_render.BannerPreview(banner_message=banner_message, amp_server=amp_server, db_banner=self._edited_db_banner, view=self)
 
         self._banner_editor_select = Banner_Editor_Select(custom_id='banner_editor', edited_db_banner=self._edited_db_banner, banner_message=self._banner_message, view=self, amp_server=self._amp_server)
         super().__init__(timeout=timeout)
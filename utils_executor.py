@@ -0,0 +1,197 @@
+'''
+   Copyright (C) 2021-2022 Katelynn Cadwallader.
+
+   This file is part of Gatekeeper, the AMP Minecraft Discord Bot.
+
+   Gatekeeper is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 3, or (at your option)
+   any later version.
+
+   Gatekeeper is distributed in the hope that it will be useful, but WITHOUT
+   ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+   or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public
+   License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with Gatekeeper; see the file COPYING.  If not, write to the Free
+   Software Foundation, 51 Franklin Street - Fifth Floor, Boston, MA
+   02110-1301, USA. 
+
+'''
+from __future__ import annotations
+import logging
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Union
+
+import discord
+from discord.ext import commands
+
+if TYPE_CHECKING:
+    from AMP import AMPInstance
+
+# Returned by `CommandExecutor.execute()` when the call failed or timed out; AMP calls can legitimately return `False` or `None`.
+FAILED = object()
+
+
+class FanOutResult():
+    """Outcome of `CommandExecutor.fan_out()`; each list holds `(AMPInstance, value)`.\n
+    `succeeded` values are what the call returned, `failed` values are the exception and `timed_out` values are `None`."""
+
+    def __init__(self):
+        self.succeeded: list[tuple[AMPInstance, Any]] = []
+        self.failed: list[tuple[AMPInstance, Exception]] = []
+        self.timed_out: list[tuple[AMPInstance, None]] = []
+
+    def names(self, outcome: str) -> list[str]:
+        """Returns the display names of the Instances in `outcome`, eg. `names('succeeded')`."""
+        return [amp_server.FriendlyName if amp_server.FriendlyName != None else amp_server.InstanceName for amp_server, _ in getattr(self, outcome)]
+
+
+class CommandExecutor():
+    """Runs blocking AMP API calls for commands and UI components on a bounded thread pool, off the event loop.\n
+    `execute()` defers the interaction first so Discord's 3 second deadline is never missed, waits on the call with a timeout and reports failures back to the user.
+    Every call records how long it waited for a free thread and how long it ran, see `metrics()`."""
+
+    def __init__(self, max_workers: int = 8, timeout: float = 30):
+        """`max_workers` - Threads available to AMP calls; extra calls wait in the pool queue.\n
+        `timeout` - Default seconds to wait on a call before reporting it as timed out."""
+        self.logger = logging.getLogger()
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='AMP Command')
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        # {name: {'calls', 'errors', 'timeouts', 'wait', 'max_wait', 'run', 'max_run'}}
+        self._metrics: dict[str, dict[str, Union[int, float]]] = {}
+
+    def _record(self, name: str, **values):
+        self._lock.acquire()
+        metric = self._metrics.setdefault(name, {'calls': 0, 'errors': 0, 'timeouts': 0, 'wait': 0.0, 'max_wait': 0.0, 'run': 0.0, 'max_run': 0.0})
+        for key, value in values.items():
+            metric[key] += value
+            if key in ('wait', 'run'):
+                metric['max_' + key] = max(metric['max_' + key], value)
+        self._lock.release()
+
+    def _call(self, name: str, submitted: float, func: Callable, args: tuple, kwargs: dict):
+        """Runs inside the pool; times the queue wait separately from the call itself."""
+        started = time.perf_counter()
+        self._lock.acquire()
+        self._queued -= 1
+        self._active += 1
+        self._lock.release()
+
+        error = 0
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            error = 1
+            raise
+        finally:
+            self._lock.acquire()
+            self._active -= 1
+            self._lock.release()
+            self._record(name, calls=1, errors=error, wait=started - submitted, run=time.perf_counter() - started)
+
+    async def run(self, func: Callable, *args, name: Union[str, None] = None, timeout: Union[float, None] = None, **kwargs) -> Any:
+        """Runs `func(*args, **kwargs)` on the pool and returns its result.\n
+        Raises `asyncio.TimeoutError` after `timeout` seconds; the call itself keeps running in its thread since threads cannot be cancelled."""
+        name = name if name != None else getattr(func, '__qualname__', str(func))
+        self._lock.acquire()
+        self._queued += 1
+        self._lock.release()
+
+        future = asyncio.get_running_loop().run_in_executor(self._pool, functools.partial(self._call, name, time.perf_counter(), func, args, kwargs))
+        # Consumes the exception of calls that finish after we stopped waiting on them.
+        future.add_done_callback(lambda future: future.cancelled() or future.exception())
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=timeout if timeout != None else self.timeout)
+        except asyncio.TimeoutError:
+            self._record(name, timeouts=1)
+            self.logger.warning(f'Command Executor call `{name}` is taking longer than {timeout if timeout != None else self.timeout} seconds.')
+            raise
+
+    async def defer(self, target: Union[commands.Context, discord.Interaction], ephemeral: bool = True):
+        """Defers the Context or Interaction if it has not been responded to yet."""
+        try:
+            if isinstance(target, discord.Interaction):
+                if not target.response.is_done():
+                    await target.response.defer(ephemeral=ephemeral, thinking=True)
+
+            elif target.interaction == None or not target.interaction.response.is_done():
+                await target.defer(ephemeral=ephemeral)
+
+        except discord.HTTPException as e:
+            self.logger.warning(f'Command Executor failed to defer the interaction: {e}')
+
+    async def execute(self, target: Union[commands.Context, discord.Interaction], func: Callable, *args, name: Union[str, None] = None, timeout: Union[float, None] = None, ephemeral: bool = True, **kwargs) -> Any:
+        """Defers `target`, runs `func(*args, **kwargs)` on the pool and returns its result.\n
+        On a timeout or exception the user is told and `FAILED` is returned."""
+        name = name if name != None else getattr(func, '__qualname__', str(func))
+        await self.defer(target, ephemeral)
+
+        try:
+            return await self.run(func, *args, name=name, timeout=timeout, **kwargs)
+        except asyncio.TimeoutError:
+            content = f'**{name}** is taking longer than expected; it will keep running in the background.'
+        except Exception as e:
+            self.logger.error(f'Command Executor call `{name}` failed: {e}')
+            content = f'**{name}** failed, please check the logs.'
+
+        try:
+            if isinstance(target, discord.Interaction):
+                await target.followup.send(content, ephemeral=ephemeral)
+            else:
+                await target.send(content, ephemeral=ephemeral)
+        except discord.HTTPException as e:
+            self.logger.warning(f'Command Executor failed to report `{name}`: {e}')
+        return FAILED
+
+    async def fan_out(self, instances: Iterable[AMPInstance], func: Callable[[AMPInstance], Any], name: str, concurrency: Union[int, None] = None, timeout: Union[float, None] = None) -> FanOutResult:
+        """Runs `func(amp_server)` for every Instance at once, at most `concurrency` at a time, each with its own `timeout`.\n
+        One slow or failing Instance never holds up or fails the rest; see the returned `FanOutResult`."""
+        result = FanOutResult()
+        semaphore = asyncio.Semaphore(concurrency if concurrency != None else self.max_workers)
+
+        async def call(amp_server: AMPInstance):
+            async with semaphore:
+                try:
+                    result.succeeded.append((amp_server, await self.run(func, amp_server, name=name, timeout=timeout)))
+                except asyncio.TimeoutError:
+                    result.timed_out.append((amp_server, None))
+                except Exception as e:
+                    self.logger.error(f'Command Executor call `{name}` failed for {amp_server.FriendlyName}: {e}')
+                    result.failed.append((amp_server, e))
+
+        await asyncio.gather(*[call(amp_server) for amp_server in instances])
+        return result
+
+    def metrics(self) -> dict[str, dict[str, Union[int, float]]]:
+        """Returns a copy of the per call metrics; `wait` and `run` are the totals in seconds."""
+        self._lock.acquire()
+        metrics = {name: dict(metric) for name, metric in self._metrics.items()}
+        self._lock.release()
+        return metrics
+
+    def pending(self) -> tuple[int, int]:
+        """Returns `(queued, active)` calls."""
+        return self._queued, self._active
+
+
+# Used to maintain a "Global" CommandExecutor() object.
+Command_Executor = None
+
+
+def getCommandExecutor() -> CommandExecutor:
+    """Returns the Global CommandExecutor() object; otherwise creates it."""
+    global Command_Executor
+    if Command_Executor == None:
+        Command_Executor = CommandExecutor()
+    return Command_Executor
@@ -0,0 +1,297 @@
+'''
+   Copyright (C) 2021-2022 Katelynn Cadwallader.
+
+   This file is part of Gatekeeper, the AMP Minecraft Discord Bot.
+
+   Gatekeeper is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 3, or (at your option)
+   any later version.
+
+   Gatekeeper is distributed in the hope that it will be useful, but WITHOUT
+   ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+   or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public
+   License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with Gatekeeper; see the file COPYING.  If not, write to the Free
+   Software Foundation, 51 Franklin Street - Fifth Floor, Boston, MA
+   02110-1301, USA. 
+'''
+from __future__ import annotations
+import logging
+import asyncio
+import json
+import os
+import pathlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Union
+
+import aiohttp
+
+import DB
+
+UUID_REGEX = re.compile(r'^[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}$')
+
+
+class PlayerHeadCache():
+    """Local, size bounded cache of Minecraft player heads keyed by UUID; shared by the Banners and the Chat webhook avatars.\n
+    Heads are fetched in the background with conditional requests (`ETag`/`Last-Modified`) once they are older than `ttl`,
+    so nothing that asks for a head ever waits on the remote server. Heads are kept in memory and under `path` on disk, the least recently used go first.\n
+    Disk writes run off the event loop and the index is saved at most once per `save_delay` seconds."""
+
+    def __init__(self, base_url: str = 'https://mc-heads.net/avatar/{uuid}/{size}', path: str = 'resources/head_cache', size: int = 64,
+                 ttl: float = 86400, negative_ttl: float = 3600, max_bytes: int = 8 * 1024 * 1024, max_entries: int = 4096, concurrency: int = 4, timeout: float = 10, save_delay: float = 5):
+        """`base_url` - Head image URL; `{uuid}` and `{size}` are filled in.\n
+        `ttl` - Seconds before a head is revalidated.\n
+        `negative_ttl` - Seconds a UUID the server had no head for is left alone.\n
+        `max_bytes` - Total size of the heads kept.\n
+        `max_entries` - UUIDs remembered, including the ones without a head.\n
+        `save_delay` - Seconds to gather fetches before the index is written."""
+        self.logger = logging.getLogger()
+        self.base_url = base_url
+        self.path = pathlib.Path(path)
+        self.size = size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.save_delay = save_delay
+
+        self._lock = threading.Lock()
+        # Keeps the head files and the index from being written by two threads at once.
+        self._disk_lock = threading.Lock()
+        # `_saving` while an index save is scheduled or running, `_dirty` while entries changed since the last save started.
+        self._saving = False
+        self._dirty = False
+        # uuid -> {'data': bytes | None, 'etag', 'last_modified', 'fetched'}; `data` is `None` when the server had no head for it.
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._bytes = 0
+        self._fetching: set[str] = set()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        # Fetches requested from other threads (eg. the Command Executor) are handed to this loop.
+        try:
+            self._loop: Union[asyncio.AbstractEventLoop, None] = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+        self._load()
+
+    @staticmethod
+    def normalize(uuid: str) -> Union[str, None]:
+        """Returns the UUID lowercase without dashes, or `None` if it isn't one."""
+        if uuid == None or not UUID_REGEX.match(str(uuid)):
+            return None
+        return str(uuid).replace('-', '').lower()
+
+    def url(self, uuid: str) -> str:
+        return self.base_url.format(uuid=uuid, size=self.size)
+
+    def _load(self):
+        """Loads the heads saved by a previous run."""
+        index = self.path.joinpath('index.json')
+        if not index.exists():
+            return
+
+        try:
+            entries = json.loads(index.read_text())
+        except (OSError, ValueError) as e:
+            self.logger.warning(f'Discarding the unreadable Player Head index: {e}')
+            return
+
+        for uuid, entry in sorted(entries.items(), key=lambda item: item[1].get('used', 0)):
+            try:
+                entry['data'] = self.path.joinpath(f'{uuid}.png').read_bytes() if entry.pop('head', False) else None
+            except OSError:
+                continue
+            entry.pop('used', None)
+            self._entries[uuid] = entry
+            self._bytes += len(entry['data'] or b'')
+        self.logger.dev(f'Loaded {len(self._entries)} cached Player Heads.')
+
+    def _save_index(self):
+        """Writes the index of cached heads; blocking, call it off the event loop."""
+        self._lock.acquire()
+        index = {}
+        for used, (uuid, entry) in enumerate(self._entries.items()):
+            index[uuid] = {'etag': entry.get('etag'), 'last_modified': entry.get('last_modified'), 'fetched': entry['fetched'], 'head': entry['data'] != None, 'used': used}
+        self._lock.release()
+
+        self._disk_lock.acquire()
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            temp = self.path.joinpath('index.json.tmp')
+            temp.write_text(json.dumps(index))
+            os.replace(temp, self.path.joinpath('index.json'))
+        except OSError as e:
+            self.logger.warning(f'Unable to save the Player Head index: {e}')
+        finally:
+            self._disk_lock.release()
+
+    async def _save_later(self):
+        """Saves the index once `save_delay` seconds have passed, so a burst of fetches is only written once.\n
+        Saves again if anything changed while it was writing; `_saving` is only cleared once the index on disk is current."""
+        try:
+            while self._dirty:
+                await asyncio.sleep(self.save_delay)
+                self._dirty = False
+                await asyncio.to_thread(self._save_index)
+        finally:
+            self._saving = False
+
+    def _store(self, uuid: str, entry: dict) -> list[str]:
+        """Updates the in memory entry, returns the UUIDs evicted to make room for it."""
+        evicted = []
+        self._lock.acquire()
+        previous = self._entries.pop(uuid, None)
+        if previous != None:
+            self._bytes -= len(previous['data'] or b'')
+        self._entries[uuid] = entry
+        self._bytes += len(entry['data'] or b'')
+
+        while (self._bytes > self.max_bytes or len(self._entries) > self.max_entries) and len(self._entries) > 1:
+            old_uuid, old = self._entries.popitem(last=False)
+            self._bytes -= len(old['data'] or b'')
+            evicted.append(old_uuid)
+        self._lock.release()
+        return evicted
+
+    def _write(self, uuid: Union[str, None], data: Union[bytes, None], evicted: list[str]):
+        """Writes (or removes) the head file for `uuid` and removes the evicted ones; blocking, call it off the event loop."""
+        self._disk_lock.acquire()
+        try:
+            if uuid != None:
+                if data != None:
+                    self.path.mkdir(parents=True, exist_ok=True)
+                    self.path.joinpath(f'{uuid}.png').write_bytes(data)
+                else:
+                    self.path.joinpath(f'{uuid}.png').unlink(missing_ok=True)
+
+            for old_uuid in evicted:
+                self.path.joinpath(f'{old_uuid}.png').unlink(missing_ok=True)
+        except OSError as e:
+            self.logger.warning(f'Unable to save the Player Head for {uuid}: {e}')
+        finally:
+            self._disk_lock.release()
+
+    async def _persist(self, uuid: str, entry: dict, write: bool = True):
+        """Stores the entry, writes its file off the event loop and schedules an index save.\n
+        `write` - `False` when only the entry's metadata changed, eg. after a `304`."""
+        evicted = self._store(uuid, entry)
+        if write or len(evicted):
+            await asyncio.to_thread(self._write, uuid if write else None, entry['data'], evicted)
+
+        self._dirty = True
+        if not self._saving:
+            self._saving = True
+            asyncio.get_running_loop().create_task(self._save_later())
+
+    def _lookup(self, uuid: str) -> Union[dict, None]:
+        """Returns the entry, marking it as recently used; schedules a fetch when it is missing or stale."""
+        self._lock.acquire()
+        entry = self._entries.get(uuid)
+        if entry != None:
+            self._entries.move_to_end(uuid)
+        self._lock.release()
+
+        if entry == None or entry['fetched'] + (self.ttl if entry['data'] != None else self.negative_ttl) < time.time():
+            self._schedule(uuid)
+        return entry
+
+    def _schedule(self, uuid: str):
+        """Starts a background fetch; safe to call from any thread."""
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            if self._loop == None:
+                return
+            return self._loop.call_soon_threadsafe(self._schedule, uuid)
+
+        if uuid in self._fetching:
+            return
+        self._fetching.add(uuid)
+        self._loop.create_task(self._fetch(uuid))
+
+    async def _fetch(self, uuid: str):
+        entry = self._entries.get(uuid)
+        headers = {}
+        if entry != None and entry['data'] != None:
+            if entry.get('etag') != None:
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified') != None:
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            async with self._semaphore:
+                async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout)) as session:
+                    async with session.get(self.url(uuid), headers=headers) as response:
+                        if response.status == 304 and entry != None:
+                            await self._persist(uuid, dict(entry, fetched=time.time()), write=False)
+
+                        elif response.status == 200:
+                            await self._persist(uuid, {'data': await response.read(), 'etag': response.headers.get('ETag'),
+                                                       'last_modified': response.headers.get('Last-Modified'), 'fetched': time.time()})
+
+                        elif response.status in [400, 404]:
+                            await self._persist(uuid, {'data': None, 'etag': None, 'last_modified': None, 'fetched': time.time()})
+
+                        else:
+                            self.logger.warning(f'Player Head fetch for {uuid} returned {response.status}.')
+
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            self.logger.warning(f'Failed to fetch the Player Head for {uuid}: {e}')
+
+        finally:
+            self._fetching.discard(uuid)
+
+    def head(self, uuid: str) -> Union[bytes, None]:
+        """Returns the cached head image, or `None` if we don't have one (yet); never waits on the network."""
+        uuid = self.normalize(uuid)
+        if uuid == None:
+            return None
+
+        entry = self._lookup(uuid)
+        return entry['data'] if entry != None else None
+
+    def heads(self, uuids: list[str]) -> dict[str, bytes]:
+        """Returns `{uuid: image}` for every UUID we have a head for; as given, not normalized."""
+        heads = {}
+        for uuid in uuids:
+            data = self.head(uuid)
+            if data != None:
+                heads[uuid] = data
+        return heads
+
+    def avatar_url(self, uuid: str) -> Union[str, None]:
+        """Returns the head URL for use as a Discord avatar, or `None` if the server is known not to have a head for the UUID. \n
+        Unknown UUIDs get the URL straight away; the head is fetched in the background so later lookups know whether it exists."""
+        uuid = self.normalize(uuid)
+        if uuid == None:
+            return None
+
+        entry = self._lookup(uuid)
+        if entry != None and entry['data'] == None:
+            return None
+        return self.url(uuid)
+
+    def stats(self) -> dict:
+        return {'heads': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes, 'fetching': len(self._fetching)}
+
+
+# Used to maintain a "Global" PlayerHeadCache() object.
+Player_Head_Cache = None
+
+
+def getPlayerHeadCache() -> PlayerHeadCache:
+    """Returns the Global PlayerHeadCache() object; otherwise creates it."""
+    global Player_Head_Cache
+    if Player_Head_Cache == None:
+        DBConfig = DB.getDBHandler().DBConfig
+        base_url = DBConfig.GetSetting('Player_Head_URL')
+        max_size = DBConfig.GetSetting('Player_Head_Cache_Size')
+        Player_Head_Cache = PlayerHeadCache(base_url=base_url if base_url not in [None, ''] else 'https://mc-heads.net/avatar/{uuid}/{size}',
+                                            max_bytes=(max_size if isinstance(max_size, int) else 8) * 1024 * 1024)
+    return Player_Head_Cache
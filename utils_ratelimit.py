@@ -0,0 +1,195 @@
+'''
+   Copyright (C) 2021-2022 Katelynn Cadwallader.
+
+   This file is part of Gatekeeper, the AMP Minecraft Discord Bot.
+
+   Gatekeeper is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 3, or (at your option)
+   any later version.
+
+   Gatekeeper is distributed in the hope that it will be useful, but WITHOUT
+   ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+   or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public
+   License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with Gatekeeper; see the file COPYING.  If not, write to the Free
+   Software Foundation, 51 Franklin Street - Fifth Floor, Boston, MA
+   02110-1301, USA. 
+'''
+from __future__ import annotations
+import logging
+import asyncio
+import time
+from collections import deque
+from typing import Union
+
+
+class RESTBudget():
+    """Shares the bot's Discord REST request budget between all bot originated traffic.\n
+    Callers `await acquire(priority, channel_id)` before a request; requests are granted highest priority first,
+    round robin across channels inside the same priority, and each channel is held to Discord's per channel message limits."""
+    CHAT = 0
+    CONSOLE = 1
+    BANNER = 2
+    CLEANUP = 3
+    PRIORITY_NAMES = {CHAT: 'Chat', CONSOLE: 'Console', BANNER: 'Banner', CLEANUP: 'Cleanup'}
+
+    def __init__(self, rate: float = 40, channel_limit: tuple[int, float] = (5, 5), window: float = 60):
+        """`rate` - Requests per second, Discord allows 50 globally; the rest is left for command replies.\n
+        `channel_limit` - (Requests, Seconds) allowed per channel.\n
+        `window` - Seconds of history used for the usage stats."""
+        self.logger = logging.getLogger()
+        self.rate = rate
+        self.channel_limit = channel_limit
+        self.window = window
+
+        self._tokens = rate
+        self._last_refill = time.monotonic()
+        # {priority: {channel_id: deque[Future]}}, dict order is the round robin order.
+        self._waiters: dict[int, dict[Union[int, None], deque[asyncio.Future]]] = {priority: {} for priority in self.PRIORITY_NAMES}
+        self._channel_grants: dict[Union[int, None], deque[float]] = {}
+        # (granted at, priority, channel_id) over the last `window` seconds.
+        self._grants: deque[tuple[float, int, Union[int, None]]] = deque()
+        self._wakeup = None
+        self._dispatcher = None
+
+    async def acquire(self, priority: int, channel_id: Union[int, None] = None):
+        """Waits until the request is allowed to be sent."""
+        if self._dispatcher == None or self._dispatcher.done():
+            self._wakeup = asyncio.Event()
+            self._dispatcher = asyncio.create_task(self._dispatch(), name='REST Budget Dispatcher')
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].setdefault(channel_id, deque()).append(future)
+        self._wakeup.set()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if not future.done():
+                future.cancel()
+            raise
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.rate, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _channel_wait(self, channel_id: Union[int, None], now: float) -> float:
+        """Seconds until the channel may send again."""
+        if channel_id == None:
+            return 0
+        grants = self._channel_grants.get(channel_id)
+        requests, seconds = self.channel_limit
+        if grants == None or len(grants) < requests:
+            return 0
+        return max(0, grants[-requests] + seconds - now)
+
+    def _next_waiter(self) -> tuple[Union[asyncio.Future, None], float]:
+        """Returns the next Future to grant, or `None` and how long until a channel is free."""
+        now = time.monotonic()
+        soonest = None
+        for priority in sorted(self._waiters):
+            channels = self._waiters[priority]
+            for channel_id in list(channels):
+                waiters = channels[channel_id]
+                while len(waiters) and waiters[0].done():
+                    waiters.popleft()
+
+                if not len(waiters):
+                    channels.pop(channel_id)
+                    continue
+
+                wait = self._channel_wait(channel_id, now)
+                if wait > 0:
+                    soonest = wait if soonest == None else min(soonest, wait)
+                    continue
+
+                # Move the channel to the back so the next grant in this priority goes to another channel.
+                channels[channel_id] = channels.pop(channel_id)
+                if channel_id != None:
+                    self._channel_grants.setdefault(channel_id, deque(maxlen=self.channel_limit[0])).append(now)
+                self._grants.append((now, priority, channel_id))
+                return waiters.popleft(), 0
+        return None, soonest
+
+    async def _dispatch(self):
+        while (1):
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                continue
+
+            future, wait = self._next_waiter()
+            if future != None:
+                self._tokens -= 1
+                future.set_result(True)
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def _trim(self):
+        cutoff = time.monotonic() - self.window
+        while len(self._grants) and self._grants[0][0] < cutoff:
+            self._grants.popleft()
+
+    def usage(self) -> dict[str, float]:
+        """Returns requests per second granted to each priority over the last `window` seconds."""
+        self._trim()
+        usage = {name: 0 for name in self.PRIORITY_NAMES.values()}
+        for _, priority, _ in self._grants:
+            usage[self.PRIORITY_NAMES[priority]] += 1 / self.window
+        return usage
+
+    def spare(self) -> float:
+        """Returns the requests per second left unused over the last `window` seconds."""
+        self._trim()
+        return max(0, self.rate - (len(self._grants) / self.window))
+
+    def pending(self) -> int:
+        return sum(len(waiters) for channels in self._waiters.values() for waiters in channels.values())
+
+    def channel_spare(self, channel_id: int, exclude: Union[int, None] = None) -> float:
+        """Returns the requests per second left under `channel_limit` for the channel over the last `window` seconds.\n
+        `exclude` - Priority whose grants are not counted, eg. `BANNER` when sizing the Banner refresh itself."""
+        self._trim()
+        requests, seconds = self.channel_limit
+        used = sum(1 for _, priority, channel in self._grants if channel == channel_id and priority != exclude)
+        return max(0, requests / seconds - used / self.window)
+
+    def banner_interval(self, channels: dict[int, int], minimum: int = 60, maximum: int = 900, share: float = 0.25) -> int:
+        """Returns how many seconds between Banner refreshes so each channel's Banner edits only use `share` of what Chat and Console
+        left of its `channel_limit`, and all of them only `share` of the spare global budget.\n
+        `channels` - {Discord Channel ID: Banner messages in it}."""
+        interval = minimum
+        total = 0
+        for channel_id, num_messages in channels.items():
+            if num_messages <= 0:
+                continue
+            total += num_messages
+            spare = self.channel_spare(channel_id, exclude=self.BANNER) * share
+            if spare <= 0:
+                return maximum
+            interval = max(interval, num_messages / spare)
+
+        spare = self.spare() * share
+        if spare <= 0:
+            return maximum
+        return int(min(maximum, max(interval, total / spare)))
+
+
+# Used to maintain a "Global" RESTBudget() object.
+REST_Budget = None
+
+
+def getRESTBudget() -> RESTBudget:
+    """Returns the Global RESTBudget() object; otherwise creates it."""
+    global REST_Budget
+    if REST_Budget == None:
+        REST_Budget = RESTBudget()
+    return REST_Budget
@@ -0,0 +1,201 @@
+'''
+   Copyright (C) 2021-2022 Katelynn Cadwallader.
+
+   This file is part of Gatekeeper, the AMP Minecraft Discord Bot.
+
+   Gatekeeper is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 3, or (at your option)
+   any later version.
+
+   Gatekeeper is distributed in the hope that it will be useful, but WITHOUT
+   ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+   or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public
+   License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with Gatekeeper; see the file COPYING.  If not, write to the Free
+   Software Foundation, 51 Franklin Street - Fifth Floor, Boston, MA
+   02110-1301, USA. 
+
+'''
+from __future__ import annotations
+import logging
+import asyncio
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Union
+
+import discord
+
+import DB
+import utils_executor
+import utils_heads
+import modules.banner_creator as BC
+
+if TYPE_CHECKING:
+    from AMP import AMPInstance
+    from discord.ui import View
+
+# Seconds the Banner Editor waits for edits to stop before rendering a preview.
+PREVIEW_DEBOUNCE = 0.75
+
+
+class BannerRenderPool():
+    """Renders Banners in worker processes so PIL's resizing, blurring and PNG encoding never run on the event loop or hold the GIL.\n
+    The AMP data a Banner needs is snapshotted on the Command Executor's threads, then every Banner of a group renders in parallel across cores.
+    With `Banner_Render_Workers` set to `0` Banners render on the Command Executor's threads instead.
+    Banners are encoded with `encoding`, see `BC.BANNER_ENCODINGS`."""
+
+    def __init__(self, workers: int = 2, encoding: str = 'png'):
+        self.logger = logging.getLogger()
+        self.workers = workers
+        self.encoding = encoding if encoding in BC.BANNER_ENCODINGS else 'png'
+        self.executor = utils_executor.getCommandExecutor()
+        self.heads = utils_heads.getPlayerHeadCache()
+        self._pool: Union[ProcessPoolExecutor, None] = None
+
+    def _get_pool(self) -> Union[ProcessPoolExecutor, None]:
+        if self.workers <= 0:
+            return None
+
+        if self._pool == None:
+            # `spawn` so the workers do not inherit the bot's threads and locks; they only import `banner_creator`.
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'))
+            self.logger.dev(f'Started {self.workers} Banner Render worker processes.')
+        return self._pool
+
+    async def snapshot(self, amp_server: AMPInstance, db_banner: DB.DBBanner) -> tuple[BC.Banner_Server_Snapshot, BC.Banner_Settings_Snapshot]:
+        """Copies everything the Banner needs out of the AMPInstance and DBBanner."""
+        server = await self.executor.run(BC.Banner_Server_Snapshot, amp_server, name='Banner Snapshot')
+        # Only heads already cached are used; missing ones are fetched in the background for the next render.
+        server._heads = self.heads.heads(list(server.getUsers().keys()))
+        return server, BC.Banner_Settings_Snapshot(db_banner)
+
+    def filename(self) -> str:
+        """The attachment filename matching the current encoding."""
+        return BC.banner_filename(self.encoding)
+
+    async def _run(self, name: str, func, *args):
+        pool = self._get_pool()
+        if pool != None:
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool, func, *args)
+            except BrokenProcessPool:
+                self.logger.error('A Banner Render worker process died; restarting the pool.')
+                self._pool = None
+
+        return await self.executor.run(func, *args, name=name)
+
+    async def render(self, amp_server: AMPInstance, db_banner: DB.DBBanner) -> bytes:
+        """Returns the Banner for the Server encoded with `self.encoding`."""
+        server, banner = await self.snapshot(amp_server, db_banner)
+        return await self._run('Banner Render', BC.render_banner, server, banner, self.encoding)
+
+    async def render_atlas_group(self, banners: list[tuple[AMPInstance, DB.DBBanner]], size: int) -> list[Union[bytes, None]]:
+        """Stacks up to `size` Banners per image, see `BC.render_atlas()`; every atlas renders at once. \n
+        A Banner whose snapshot fails is left out of its atlas; an atlas that fails to render, or has no Banners left, is `None`."""
+        chunks = [banners[index:index + size] for index in range(0, len(banners), size)]
+
+        async def _atlas(chunk: list[tuple[AMPInstance, DB.DBBanner]]) -> Union[bytes, None]:
+            results = await asyncio.gather(*[self.snapshot(amp_server, db_banner) for amp_server, db_banner in chunk], return_exceptions=True)
+            snapshots = []
+            for (amp_server, _), result in zip(chunk, results):
+                if isinstance(result, Exception):
+                    self.logger.error(f'Failed to snapshot the Banner for {amp_server.FriendlyName}, leaving it out of its atlas: {result}')
+                else:
+                    snapshots.append(result)
+
+            if not len(snapshots):
+                return None
+            return await self._run('Banner Atlas Render', BC.render_atlas, snapshots, self.encoding)
+
+        results = await asyncio.gather(*[_atlas(chunk) for chunk in chunks], return_exceptions=True)
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                self.logger.error(f'Failed to render the Banner atlas for {", ".join(amp_server.FriendlyName for amp_server, _ in chunk)}: {result}')
+        return [None if isinstance(result, Exception) else result for result in results]
+
+    async def preview(self, amp_server: AMPInstance, db_banner: DB.DBBanner) -> bytes:
+        """Returns a reduced size preview of the Banner, see `BC.render_preview()`."""
+        server, banner = await self.snapshot(amp_server, db_banner)
+        return await self._run('Banner Preview', BC.render_preview, server, banner)
+
+    async def benchmark(self, amp_server: AMPInstance, db_banner: DB.DBBanner) -> list[tuple[str, float, int]]:
+        """Encodes the Server's Banner with every encoding; see `BC.benchmark_encodings()`."""
+        server, banner = await self.snapshot(amp_server, db_banner)
+        return await self._run('Banner Encoding Benchmark', BC.benchmark_encodings, server, banner)
+
+    async def render_group(self, banners: list[tuple[AMPInstance, DB.DBBanner]]) -> list[Union[bytes, None]]:
+        """Renders every `(AMPInstance, DBBanner)` at once; a Banner that fails to render is `None`."""
+        results = await asyncio.gather(*[self.render(amp_server, db_banner) for amp_server, db_banner in banners], return_exceptions=True)
+        for (amp_server, _), result in zip(banners, results):
+            if isinstance(result, Exception):
+                self.logger.error(f'Failed to render the Banner for {amp_server.FriendlyName}: {result}')
+        return [None if isinstance(result, Exception) else result for result in results]
+
+    def shutdown(self):
+        if self._pool != None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+class BannerPreview():
+    """Live preview for a Banner Editor message.\n
+    Every edit calls `request()`; the preview only renders once edits have stopped for `PREVIEW_DEBOUNCE` seconds, renders never overlap
+    and an edit made while one is rendering is picked up right after. Renders run on the Banner Render pool, never on the event loop."""
+
+    def __init__(self, banner_message: discord.Message, amp_server: AMPInstance, db_banner: DB.DBBanner, view: Union[View, None] = None):
+        self.logger = logging.getLogger()
+        self._banner_message = banner_message
+        self._amp_server = amp_server
+        self._db_banner = db_banner
+        self._view = view
+        self._dirty = False
+        self._task: Union[asyncio.Task, None] = None
+
+    def request(self):
+        """Schedules a preview of the Banner's current settings."""
+        self._dirty = True
+        if self._task == None or self._task.done():
+            self._task = asyncio.create_task(self._preview())
+
+    def cancel(self):
+        """Drops any pending preview; used before the full size Banner is sent."""
+        self._dirty = False
+        if self._task != None and not self._task.done():
+            self._task.cancel()
+
+    async def _preview(self):
+        while self._dirty:
+            self._dirty = False
+            await asyncio.sleep(PREVIEW_DEBOUNCE)
+            # Another edit came in while we waited; wait for that one to settle instead.
+            if self._dirty:
+                continue
+
+            try:
+                banner_bytes = await getBannerRenderPool().preview(self._amp_server, self._db_banner)
+                file = discord.File(fp=io.BytesIO(banner_bytes), filename=BC.banner_filename(BC.PREVIEW_ENCODING))
+                if self._view != None:
+                    await self._banner_message.edit(attachments=[file], view=self._view)
+                else:
+                    await self._banner_message.edit(attachments=[file])
+            except Exception as e:
+                self.logger.error(f'Failed to update the Banner Editor preview for {self._amp_server.FriendlyName}: {e}')
+
+
+# Used to maintain a "Global" BannerRenderPool() object.
+Banner_Render_Pool = None
+
+
+def getBannerRenderPool() -> BannerRenderPool:
+    """Returns the Global BannerRenderPool() object; otherwise creates it."""
+    global Banner_Render_Pool
+    if Banner_Render_Pool == None:
+        DBConfig = DB.getDBHandler().DBConfig
+        workers = DBConfig.GetSetting('Banner_Render_Workers')
+        Banner_Render_Pool = BannerRenderPool(workers=workers if isinstance(workers, int) else 2, encoding=DBConfig.GetSetting('Banner_Encoding'))
+    return Banner_Render_Pool
@@ -0,0 +1,137 @@
+'''
+   Copyright (C) 2021-2022 Katelynn Cadwallader.
+
+   This file is part of Gatekeeper, the AMP Minecraft Discord Bot.
+
+   Gatekeeper is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 3, or (at your option)
+   any later version.
+
+   Gatekeeper is distributed in the hope that it will be useful, but WITHOUT
+   ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+   or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public
+   License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with Gatekeeper; see the file COPYING.  If not, write to the Free
+   Software Foundation, 51 Franklin Street - Fifth Floor, Boston, MA
+   02110-1301, USA. 
+'''
+from __future__ import annotations
+import logging
+import json
+import sqlite3
+import threading
+from typing import Union
+
+import DB
+
+
+class MessageSpool():
+    """Durable outbound message spool, stored in its own SQLite file so it never contends with `discordBot.db`.\n
+    Messages are grouped by `queue` (eg. `webhook:<channel id>` or `chat:<InstanceID>`), written in batches and only removed once `ack()`'d
+    after they were delivered, so a crash or Discord outage replays them in order on the next start."""
+
+    def __init__(self, path: str = 'spool.db', limit: int = 10000, batch_size: int = 50):
+        """`limit` - Max messages kept, the oldest are dropped past this.\n
+        `batch_size` - Buffered messages are written once this many are waiting or the next time the spool is read."""
+        self.logger = logging.getLogger()
+        self.limit = limit
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._buffer: list[tuple[str, str]] = []
+        # Highest row ID handed out per queue; so rows waiting on an `ack()` are not loaded twice.
+        self._loaded: dict[str, int] = {}
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("""create table if not exists Spool (
+                        ID integer primary key autoincrement,
+                        Queue text not null,
+                        Payload text not null
+                        )""")
+        self._db.execute("create index if not exists SpoolQueue on Spool(Queue, ID)")
+        self._db.commit()
+
+    def push(self, queue: str, payload: dict, flush: bool = True) -> bool:
+        """Adds a message to the end of the queue, the write is batched. Returns `True` once `batch_size` messages are buffered.\n
+        `flush` - Set to `False` on the event loop and call `flush()` from a thread instead; otherwise a full buffer is written here."""
+        self._lock.acquire()
+        self._buffer.append((queue, json.dumps(payload)))
+        full = len(self._buffer) >= self.batch_size
+        self._lock.release()
+
+        if flush and full:
+            self.flush()
+        return full
+
+    def flush(self):
+        """Writes any buffered messages and trims the spool down to `limit`."""
+        self._lock.acquire()
+        try:
+            if not len(self._buffer):
+                return
+
+            self._db.executemany("insert into Spool(Queue, Payload) values(?, ?)", self._buffer)
+            self._buffer = []
+
+            (count,) = self._db.execute("select count(ID) from Spool").fetchone()
+            if count > self.limit:
+                self.logger.warning(f'Message Spool is over its limit of {self.limit} messages, dropping the oldest {count - self.limit}.')
+                self._db.execute("delete from Spool where ID in (select ID from Spool order by ID limit ?)", (count - self.limit,))
+            self._db.commit()
+        finally:
+            self._lock.release()
+
+    def load(self, queue: str, limit: int = 50) -> list[tuple[int, dict]]:
+        """Returns up to `limit` `(ID, payload)` from the queue that have not been handed out yet, oldest first."""
+        self.flush()
+        self._lock.acquire()
+        rows = self._db.execute("select ID, Payload from Spool where Queue=? and ID>? order by ID limit ?", (queue, self._loaded.get(queue, 0), limit)).fetchall()
+        if len(rows):
+            self._loaded[queue] = rows[-1][0]
+        self._lock.release()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def ack(self, ids: list[int]):
+        """Removes delivered messages from the spool."""
+        if not len(ids):
+            return
+
+        self._lock.acquire()
+        self._db.executemany("delete from Spool where ID=?", [(id,) for id in ids])
+        self._db.commit()
+        self._lock.release()
+
+    def queues(self, prefix: str = '') -> list[str]:
+        """Returns every queue with messages waiting, eg. for replaying after a restart."""
+        self.flush()
+        self._lock.acquire()
+        rows = self._db.execute("select distinct Queue from Spool where Queue like ?", (prefix + '%',)).fetchall()
+        self._lock.release()
+        return [row[0] for row in rows]
+
+    def count(self) -> int:
+        self.flush()
+        self._lock.acquire()
+        (count,) = self._db.execute("select count(ID) from Spool").fetchone()
+        self._lock.release()
+        return count
+
+
+# Used to maintain a "Global" MessageSpool() object.
+Message_Spool = None
+
+
+def getMessageSpool() -> Union[MessageSpool, None]:
+    """Returns the Global MessageSpool() object if the `Message_Spool` setting is enabled; otherwise `None`."""
+    global Message_Spool
+    DBConfig = DB.getDBHandler().DBConfig
+    if not DBConfig.GetSetting('Message_Spool'):
+        return None
+
+    if Message_Spool == None:
+        limit = DBConfig.GetSetting('Message_Spool_Limit')
+        Message_Spool = MessageSpool(limit=limit if isinstance(limit, int) and limit > 0 else 10000)
+    return Message_Spool
@@ -14,6 +14,8 @@ import DB
 import AMP_Handler
 import modules.banner_creator as BC
 import utils
+import utils_executor
+import utils_render
 
 
 class ServerButton(Button):
@@ -41,8 +43,9 @@ class ServerButton(Button):
         self._interaction = interaction
         self.label = self.callback_label
         self.disabled = self.callback_disabled
-        self._function()
+        # Respond before calling AMP; the edit acknowledges the interaction well inside Discord's deadline.
         await interaction.response.edit_message(view=self._view)
+        await utils_executor.getCommandExecutor().execute(interaction, self._function, name=f'Server {self._label}')
         await asyncio.sleep(30)
         await self.reset()
 
@@ -86,11 +89,11 @@ class StatusView(View):
         self.stop()
 
 
-def banner_file_handler(image: Image.Image):
-    with io.BytesIO() as image_binary:
-        image.save(image_binary, 'PNG')
-        image_binary.seek(0)
-        return discord.File(fp=image_binary, filename='image.png')
+def banner_file_handler(image: Image.Image, encoding: str = None):
+    """Encodes the Banner Image with `encoding`, defaults to the `Banner_Encoding` setting."""
+    if encoding == None:
+        encoding = DB.getDBHandler().DBConfig.GetSetting('Banner_Encoding')
+    return discord.File(fp=io.BytesIO(BC.encode_banner(image, encoding)), filename=BC.banner_filename(encoding))
 
 
 class Edited_DB_Banner():
@@ -102,8 +105,12 @@ class Edited_DB_Banner():
         self.invalid_keys = ['_db', 'ServerID', 'background_path']
         self.reset_db()
 
+    @property
+    def _attr_list(self) -> dict:
+        return self._db_banner._attr_list
+
     def save_db(self):
-        for key in self._db_banner.attr_list:
+        for key in self._db_banner._attr_list:
             if key in self.invalid_keys:
                 continue
 
@@ -113,7 +120,7 @@ class Edited_DB_Banner():
         return self._db_banner
 
     def reset_db(self):
-        for key in self._db_banner.attr_list:
+        for key in self._db_banner._attr_list:
             if key in self.invalid_keys:
                 continue
             setattr(self, key, getattr(self._db_banner, key))
@@ -130,6 +137,8 @@ class Banner_Editor_View(View):
         self._amp_server = amp_server
         self._first_interaction = discord.Interaction
         self._first_interaction_bool = True
+        # Edits only update a debounced, reduced size preview; the full size Banner is rendered on Save.
+        self.preview = utils_render.BannerPreview(banner_message=banner_message, amp_server=amp_server, db_banner=self._edited_db_banner, view=self)
 
         self._banner_editor_select = Banner_Editor_Select(custom_id='banner_editor', edited_db_banner=self._edited_db_banner, banner_message=self._banner_message, view=self, amp_server=self._amp_server)
         super().__init__(timeout=timeout)
@@ -215,16 +224,16 @@ class Banner_Modal(Modal):
         # Depending on the Selection made; changes the validation code and the reply.
         if self._input_type == 'int':
             if await self._int_code_input.callback() == False:
-                await interaction.response.send_message(f'Please provide a Number only. {self._int_code_input.value}', ephemeral=True, delete_after=self._client.Message_Timeout)
+                return await interaction.response.send_message(f'Please provide a Number only. {self._int_code_input.value}', ephemeral=True)
 
         if self._input_type == 'color':
             if await self._color_code_input.callback() == False:
-                await interaction.response.send_message(content=f'Please provide a proper Hex color Code. {self._color_code_input._value}', ephemeral=True, delete_after=self._client.Message_Timeout)
+                return await interaction.response.send_message(content=f'Please provide a proper Hex color Code. {self._color_code_input._value}', ephemeral=True)
 
-        # Regardless we defer the interaction; because we only care if it fails as seen above.
+        # We defer the interaction; because we only care if it fails as seen above.
         await interaction.response.defer()
-        # Then we send the updated Banner object to the View.
-        await self._banner_message.edit(attachments=[banner_file_handler(BC.Banner_Generator(self._amp_server, self._edited_db_banner)._image_())], view=self._banner_view)
+        # Then the View's preview picks up the updated Banner object once the edits settle.
+        self._banner_view.preview.request()
 
 
 class Banner_Color_Input(TextInput):
@@ -282,8 +291,13 @@ class Save_Banner_Button(Button):
     async def callback(self, interaction: discord.Interaction):
         """This is called when a button is interacted with."""
         saved_banner = self._edited_db_banner.save_db()
+        # Lets the Banner Groups showing this Server refresh without waiting on the next update loop.
+        AMP_Handler.getAMPHandler().notify_state_change(self._amp_server, 'banner')
         await interaction.response.defer()
-        file = banner_file_handler(BC.Banner_Generator(self._amp_server, saved_banner)._image_())
+        self.view.preview.cancel()
+        # The only full size render of the edit session.
+        render_pool = utils_render.getBannerRenderPool()
+        file = discord.File(fp=io.BytesIO(await render_pool.render(self._amp_server, saved_banner)), filename=render_pool.filename())
         await self._banner_message.edit(content='**Banner Settings have been saved.**', attachments=[file], view=None)
 
 
@@ -299,10 +313,10 @@ class Reset_Banner_Button(Button):
 
     async def callback(self, interaction: discord.Interaction):
         """This is called when a button is interacted with."""
-        saved_banner = self._edited_db_banner.reset_db()
+        self._edited_db_banner.reset_db()
         await interaction.response.defer()
-        file = banner_file_handler(BC.Banner_Generator(self._amp_server, saved_banner)._image_())
-        await self._banner_message.edit(content='**Banner Settings have been reset.**', attachments=[file])
+        await self._banner_message.edit(content='**Banner Settings have been reset.**')
+        self.view.preview.request()
 
 
 class Cancel_Banner_Button(Button):
@@ -316,6 +330,7 @@ class Cancel_Banner_Button(Button):
     async def callback(self, interaction: discord.Interaction):
         """This is called when a button is interacted with."""
         await interaction.response.defer()
+        self.view.preview.cancel()
         await self._banner_message.edit(content='**Banner Settings Editor has been Cancelled.**', attachments=[], view=None)
 
 
@@ -0,0 +1,312 @@
+'''
+   Copyright (C) 2021-2022 Katelynn Cadwallader.
+
+   This file is part of Gatekeeper, the AMP Minecraft Discord Bot.
+
+   Gatekeeper is free software; you can redistribute it and/or modify
+   it under the terms of the GNU General Public License as published by
+   the Free Software Foundation; either version 3, or (at your option)
+   any later version.
+
+   Gatekeeper is distributed in the hope that it will be useful, but WITHOUT
+   ANY WARRANTY; without even the implied warranty of MERCHANTABILITY
+   or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public
+   License for more details.
+
+   You should have received a copy of the GNU General Public License
+   along with Gatekeeper; see the file COPYING.  If not, write to the Free
+   Software Foundation, 51 Franklin Street - Fifth Floor, Boston, MA
+   02110-1301, USA. 
+'''
+from __future__ import annotations
+import logging
+import asyncio
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Union
+
+import aiohttp
+import discord
+
+import AMP_Handler
+import DB
+import utils_ratelimit
+import utils_spool
+
+if TYPE_CHECKING:
+    from AMP import AMPInstance
+
+
+class WebhookRegistry():
+    """Caches the Webhooks used for Console, Chat and Event delivery.\n
+    Keyed by `(InstanceID, Channel ID, kind)`; a Webhook is only looked up again after `NotFound`/`Forbidden` or when the Instance's channel changes."""
+    # kind: Webhook name suffix, eg. `Minecraft Console`
+    WEBHOOK_NAMES = {'console': 'Console', 'chat': 'Chat', 'event': 'Events'}
+
+    def __init__(self):
+        self.logger = logging.getLogger()
+        self._webhooks: dict[tuple[str, int, str], discord.Webhook] = {}
+        self._locks: dict[tuple[str, int, str], asyncio.Lock] = {}
+
+    def _webhook_name(self, amp_server: AMPInstance, kind: str) -> str:
+        return f'{amp_server.FriendlyName} {self.WEBHOOK_NAMES[kind]}'
+
+    async def get_webhook(self, channel: discord.TextChannel, amp_server: AMPInstance, kind: str) -> discord.Webhook:
+        """Returns the cached Webhook for the Instance/Channel/kind; otherwise finds, moves or creates one."""
+        key = (amp_server.InstanceID, channel.id, kind)
+        webhook = self._webhooks.get(key)
+        if webhook != None:
+            return webhook
+
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+
+        # Only one lookup per key; anyone else waiting gets the cached result.
+        async with self._locks[key]:
+            webhook = self._webhooks.get(key)
+            if webhook != None:
+                return webhook
+
+            webhook = await self._resolve(channel, amp_server, kind)
+            self._webhooks[key] = webhook
+            return webhook
+
+    async def _resolve(self, channel: discord.TextChannel, amp_server: AMPInstance, kind: str) -> discord.Webhook:
+        """Finds our Webhook in the channel, moves the Webhook from a previous channel or creates a new one."""
+        name = self._webhook_name(amp_server, kind)
+
+        # If the Instance had a Webhook for a different channel; it was reassigned.
+        old_webhook = None
+        for key in list(self._webhooks):
+            if key[0] == amp_server.InstanceID and key[2] == kind and key[1] != channel.id:
+                old_webhook = self._webhooks.pop(key)
+                self._locks.pop(key, None)
+
+        webhook_list = await channel.webhooks()
+        self.logger.debug(f'*AMP {kind.title()} Message* webhooks {webhook_list}')
+        for webhook in webhook_list:
+            if webhook.name == name:
+                self.logger.dev(f'*AMP {kind.title()} Message* found an old webhook, reusing it for {amp_server.FriendlyName} // ID: {webhook.id} // Channel: {webhook.channel_id}')
+                return webhook
+
+        if old_webhook != None:
+            try:
+                webhook = await old_webhook.edit(channel=channel) or old_webhook
+                self.logger.dev(f'**Editing {kind.title()} Webhook for {amp_server.FriendlyName} // ID: {webhook.id} // Channel: {webhook.channel_id}')
+                return webhook
+            except (discord.NotFound, discord.Forbidden):
+                pass
+
+        self.logger.dev(f'*AMP {kind.title()} Message* creating a new webhook for {amp_server.FriendlyName}')
+        return await channel.create_webhook(name=name)
+
+    def invalidate(self, instance_id: Union[str, None] = None, channel_id: Union[int, None] = None, kind: Union[str, None] = None):
+        """Removes every cached Webhook matching the provided values, `None` matches anything."""
+        for key in list(self._webhooks):
+            if instance_id != None and key[0] != instance_id:
+                continue
+            if channel_id != None and key[1] != channel_id:
+                continue
+            if kind != None and key[2] != kind:
+                continue
+            self._webhooks.pop(key)
+            self._locks.pop(key, None)
+
+    async def send(self, channel: discord.TextChannel, amp_server: AMPInstance, kind: str, **kwargs):
+        """Sends through the cached Webhook, re-resolving it once if Discord says it's gone or we lost access to it."""
+        webhook = await self.get_webhook(channel, amp_server, kind)
+        try:
+            return await webhook.send(**kwargs)
+
+        except (discord.NotFound, discord.Forbidden) as e:
+            self.logger.warning(f'*AMP {kind.title()} Message* webhook for {amp_server.FriendlyName} is no longer valid ({type(e).__name__}), looking it up again.')
+            self.invalidate(amp_server.InstanceID, channel.id, kind)
+            webhook = await self.get_webhook(channel, amp_server, kind)
+            return await webhook.send(**kwargs)
+
+
+class WebhookDelivery():
+    """Per channel delivery workers for Console, Chat and Event messages.\n
+    Each channel gets its own worker task so a busy channel never delays another. Consecutive messages from the same Instance/kind/username are
+    joined into one Webhook message up to Discord's 2000 character limit, and sends are paced to stay inside Discord's Webhook rate limits.\n
+    With the `Message_Spool` setting enabled, messages wait in the `MessageSpool` instead of memory and are only removed after Discord accepted them."""
+    MESSAGE_LIMIT = 2000
+    # (Requests, Seconds) Discord allows 5 requests per 2 seconds per Webhook and 30 Webhook messages per minute per channel.
+    RATE_LIMITS = [(5, 2), (30, 60)]
+    # Max seconds to back off while Discord is unreachable.
+    MAX_BACKOFF = 60
+
+    def __init__(self, client: discord.Client = None):
+        self._client = client
+        self.logger = logging.getLogger()
+        self.AMPHandler = AMP_Handler.getAMPHandler()
+        self.registry = getWebhookRegistry()
+        self.budget = utils_ratelimit.getRESTBudget()
+
+        # Keeps memory bounded during long outages when the spool is disabled.
+        limit = DB.getDBHandler().DBConfig.GetSetting('Message_Spool_Limit')
+        self.limit = limit if isinstance(limit, int) and limit > 0 else 10000
+
+        self._pending: dict[int, deque[dict]] = {}
+        self._workers: dict[int, asyncio.Task] = {}
+        self._sent: dict[int, deque[float]] = {}
+
+    def _start_worker(self, channel_id: int):
+        worker = self._workers.get(channel_id)
+        if worker == None or worker.done():
+            self._workers[channel_id] = asyncio.create_task(self._worker(channel_id), name=f'Webhook Delivery {channel_id}')
+
+    def queue(self, channel: discord.TextChannel, amp_server: AMPInstance, kind: str, content: str, username: str, avatar_url: Union[str, None] = None):
+        """Queues a message for the channel and starts the channel worker if it isn't running."""
+        if channel.id not in self._pending:
+            self._pending[channel.id] = deque(maxlen=self.limit)
+
+        content = content[:self.MESSAGE_LIMIT]
+        avatar_url = str(avatar_url) if avatar_url != None else None
+
+        spool = utils_spool.getMessageSpool()
+        if spool != None:
+            # Keeps SQLite off the event loop; the worker's next `load()` writes anything still buffered.
+            if spool.push(f'webhook:{channel.id}', {'instance_id': amp_server.InstanceID, 'kind': kind, 'content': content, 'username': username, 'avatar_url': avatar_url}, flush=False):
+                asyncio.get_running_loop().run_in_executor(None, spool.flush)
+        else:
+            self._pending[channel.id].append({'channel': channel, 'amp_server': amp_server, 'kind': kind, 'content': content, 'username': username, 'avatar_url': avatar_url, 'ids': []})
+
+        self._start_worker(channel.id)
+
+    def replay(self):
+        """Starts a worker for every channel with messages left in the spool, eg. from before a restart."""
+        spool = utils_spool.getMessageSpool()
+        if spool == None:
+            return
+
+        for queue in spool.queues('webhook:'):
+            channel_id = int(queue.split(':')[1])
+            self._pending.setdefault(channel_id, deque(maxlen=self.limit))
+            self.logger.info(f'Replaying spooled messages for channel {channel_id}.')
+            self._start_worker(channel_id)
+
+    def pending(self) -> int:
+        """Returns the number of queued messages across every channel."""
+        spool = utils_spool.getMessageSpool()
+        if spool != None:
+            return spool.count()
+        return sum(len(pending) for pending in self._pending.values())
+
+    async def _load(self, channel_id: int, pending: deque[dict]):
+        """Moves the next batch of spooled messages for the channel into memory."""
+        spool = utils_spool.getMessageSpool()
+        if spool == None:
+            return
+
+        channel = self._client.get_channel(channel_id) if self._client != None else None
+        dropped = []
+        for id, payload in await asyncio.to_thread(spool.load, f'webhook:{channel_id}'):
+            amp_server = self.AMPHandler.AMP_Instances.get(payload['instance_id'])
+            if channel == None or amp_server == None:
+                dropped.append(id)
+                continue
+            pending.append({'channel': channel, 'amp_server': amp_server, 'kind': payload['kind'], 'content': payload['content'], 'username': payload['username'], 'avatar_url': payload['avatar_url'], 'ids': [id]})
+
+        if len(dropped):
+            self.logger.warning(f'Dropped {len(dropped)} spooled messages for channel {channel_id}, the channel or Instance no longer exists.')
+            await asyncio.to_thread(spool.ack, dropped)
+
+    async def _ack(self, message: dict):
+        spool = utils_spool.getMessageSpool()
+        if spool != None and len(message['ids']):
+            await asyncio.to_thread(spool.ack, message['ids'])
+
+    def _coalesce(self, pending: deque[dict]) -> dict:
+        """Pops the next message and joins any following messages with the same sender into it."""
+        message = pending.popleft()
+        while len(pending):
+            entry = pending[0]
+            if (entry['amp_server'], entry['kind'], entry['username'], entry['avatar_url']) != (message['amp_server'], message['kind'], message['username'], message['avatar_url']):
+                break
+
+            if len(message['content']) + len(entry['content']) + 1 > self.MESSAGE_LIMIT:
+                break
+
+            message['content'] = message['content'] + '\n' + entry['content']
+            message['ids'] = message['ids'] + entry['ids']
+            pending.popleft()
+        return message
+
+    def _pace(self, channel_id: int) -> float:
+        """Returns how many seconds the channel must wait before its next send."""
+        sent = self._sent.setdefault(channel_id, deque(maxlen=self.RATE_LIMITS[-1][0]))
+        now = time.monotonic()
+        wait = 0
+        for requests, seconds in self.RATE_LIMITS:
+            if len(sent) >= requests:
+                wait = max(wait, sent[-requests] + seconds - now)
+        return wait
+
+    async def _worker(self, channel_id: int):
+        pending = self._pending[channel_id]
+        backoff = 1
+        while (1):
+            if not len(pending):
+                await self._load(channel_id, pending)
+                if not len(pending):
+                    break
+
+            wait = self._pace(channel_id)
+            if wait > 0:
+                # Anything queued while we wait gets joined into the next send.
+                await asyncio.sleep(wait)
+                if len(pending) < 2:
+                    await self._load(channel_id, pending)
+
+            message = self._coalesce(pending)
+            try:
+                await self.budget.acquire(self.budget.CHAT if message['kind'] == 'chat' else self.budget.CONSOLE, channel_id)
+                self._sent[channel_id].append(time.monotonic())
+                await self.registry.send(message['channel'], message['amp_server'], message['kind'], content=message['content'], username=message['username'], avatar_url=message['avatar_url'])
+                await self._ack(message)
+                backoff = 1
+
+            except (discord.DiscordServerError, aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                # Discord is having a bad day; keep the message and try again later.
+                self.logger.warning(f'*AMP {message["kind"].title()} Message* failed to reach Discord for channel {channel_id}, retrying in {backoff} seconds: {e}')
+                pending.appendleft(message)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.MAX_BACKOFF)
+
+            except discord.HTTPException as e:
+                if e.status == 429:
+                    self.logger.warning(f'*AMP {message["kind"].title()} Message* rate limited in channel {channel_id}, retrying in {self.RATE_LIMITS[0][1]} seconds.')
+                    pending.appendleft(message)
+                    await asyncio.sleep(self.RATE_LIMITS[0][1])
+                    continue
+                self.logger.error(f'*AMP {message["kind"].title()} Message* failed to send to channel {channel_id}: {e}')
+                await self._ack(message)
+
+            except Exception as e:
+                self.logger.error(f'*AMP {message["kind"].title()} Message* failed to send to channel {channel_id}: {e}')
+                await self._ack(message)
+
+
+# Used to maintain a "Global" WebhookRegistry() object.
+Webhook_Registry = None
+
+
+def getWebhookRegistry() -> WebhookRegistry:
+    """Returns the Global WebhookRegistry() object; otherwise creates it."""
+    global Webhook_Registry
+    if Webhook_Registry == None:
+        Webhook_Registry = WebhookRegistry()
+    return Webhook_Registry
+
+
+# Used to maintain a "Global" WebhookDelivery() object.
+Webhook_Delivery = None
+
+
+def getWebhookDelivery(client: discord.Client = None) -> WebhookDelivery:
+    """Returns the Global WebhookDelivery() object; otherwise creates it."""
+    global Webhook_Delivery
+    if Webhook_Delivery == None:
+        Webhook_Delivery = WebhookDelivery(client)
+    return Webhook_Delivery